@@ -5,34 +5,1213 @@ Instalador não oficial para compilações pré-compiladas do wxWidgets,
 baseado em um manifest.json com a lista de pacotes.
 """
 
-import argparse
+# Só módulos leves aqui: 'awx --version' e 'awx list-installed' são chamados
+# a todo momento por prompts e scripts de build. Rede, compressão, tar,
+# hashing e o argparse são importados dentro das funções que os usam.
+import errno
+import os
+import re
+import stat
 import sys
 import json
-import tarfile
-import shutil
+import time
+import threading
+from collections import deque, namedtuple
+from contextvars import ContextVar
 from pathlib import Path
-from urllib.request import urlretrieve
-from urllib.error import URLError
 
 VERSION = "1.0.0"
 DEFAULT_BASE_URL = "http://wxwidgets.com.br:8899/wxwidgets"
 DEFAULT_INSTALL_DIR = Path.home() / ".local" / "wxwidgets"
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME")
+                         or Path.home() / ".cache") / "awx"
+DEFAULT_CACHE_MAX_SIZE = "10G"
 MANIFEST_FILENAME = "manifest.json"
+MANIFEST_TTL = 60  # segundos em que o manifest em cache é usado sem revalidar
+MANIFEST_TIMEOUT = 10  # segundos; depois disso, vale a cópia em cache ou a embutida
+STREAM_CHUNK_SIZE = 1024 * 1024
+DEFAULT_CONNECTIONS = 4
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+MIRROR_STATS_FILENAME = "mirrors.json"  # vazão observada por espelho, no cache
+MIRROR_PROBE_SIZE = 256 * 1024  # bytes pedidos ao medir um espelho
+MIRROR_PROBE_TIMEOUT = 5  # segundos
+MIRROR_STATS_TTL = 24 * 3600  # estatísticas mais novas dispensam nova medição
+MIRROR_RETRY_AFTER = 600  # segundos em que um espelho que falhou fica por último
+STATE_SAVE_INTERVAL = 1.0  # segundos entre gravações do estado do download
+DEFAULT_LOCKFILE = "awx.lock"
+DEFAULT_DOWNLOAD_JOBS = 3
+DEFAULT_EXTRACT_JOBS = 2
+PLATFORMS = ("linux", "windows", "android")
+COMPONENT_ROLES = ("script", "install_dir", "source_dir")  # ordem dentro do pacote
+DEFAULT_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+EXTRACT_MAX_PENDING = 256 * 1024 * 1024  # bytes lidos e ainda não gravados
+EXTRACT_INLINE_SIZE = 64 * 1024 * 1024   # arquivos maiores são gravados em blocos
+STATE_DIRNAME = ".awx"  # dados do awx dentro de install_dir
+STATE_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    key TEXT PRIMARY KEY,          -- plataforma/versão/variante
+    name TEXT NOT NULL,            -- nome do .tar.gz
+    sha256 TEXT,
+    entry TEXT NOT NULL,           -- entrada do manifest (JSON)
+    components TEXT NOT NULL,      -- {papel: nome} dos componentes instalados (JSON)
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    base_url TEXT,
+    installed_at REAL NOT NULL,
+    last_used REAL                 -- última resolução (install, prefix); ver LAST_USE_RESOLUTION
+);
+CREATE TABLE IF NOT EXISTS files (
+    package TEXT NOT NULL,
+    path TEXT NOT NULL,            -- relativo a install_dir
+    kind TEXT NOT NULL,            -- f: arquivo, l: link, d: diretório
+    size INTEGER NOT NULL,
+    mtime REAL,
+    sha256 TEXT,                   -- calculado na extração; ver 'awx verify'
+    PRIMARY KEY (package, path)
+) WITHOUT ROWID;
+"""
+LAST_USE_RESOLUTION = 3600  # segundos: last_used só é regravado depois disso
+DEDUP_MODES = ("hardlink", "reflink")
+FICLONE = 0x40049409  # ioctl do Linux para reflink (btrfs, XFS, ...)
+VERIFY_MMAP_MIN_SIZE = 256 * 1024  # arquivos menores são lidos com read()
+DEFAULT_SERVE_PORT = 8899
+DEFAULT_PACK_DIR = "wxwidgets-packages"
+DEFAULT_PACK_JOBS = 2
+DEFAULT_PACK_SPECS = tuple(
+    (version, os_name)
+    for version in ("3.2.4", "3.3.1")
+    for os_name in ("linux", "windows", "linux-cmake", "android-arm64-v8a")
+)
+PACK_BLOCK_SIZE = 8 * 1024 * 1024  # bytes descomprimidos por membro gzip
+PACK_LEVEL = 6
+HTTP_TIMEOUT = 60  # segundos sem receber nada antes de desistir de uma conexão
+EVENT_INTERVAL = 0.25  # segundos entre eventos de progresso
+PROGRESS_INTERVAL = 0.1  # segundos entre redesenhos da barra de progresso
+
+
+class AWXError(Exception):
+    """Falha em uma operação da API assíncrona (install_async, remove_async...)."""
+
+
+class AWXEvent(namedtuple("AWXEvent", "kind package done total message",
+                          defaults=(None, None, None, None))):
+    """
+    Evento de progresso da API assíncrona, entregue a on_event na thread
+    do event loop. kind é um de:
+
+      resolved   pacote encontrado no manifest (message: nome do arquivo)
+      waiting    esperando outro processo instalar ou baixar o mesmo pacote
+      download   done/total bytes baixados
+      extract    done arquivos extraídos
+      installed  message: caminho da instalação
+      removed    message: caminho removido
+      message    aviso ou erro que o CLI imprimiria (message)
+    """
+    __slots__ = ()
+
+
+# Destino das mensagens de AWXInstaller._say: None imprime; a API
+# assíncrona troca por um callback de eventos (vale também nas threads
+# iniciadas com asyncio.to_thread, que copiam o contexto)
+_event_sink = ContextVar("awx_event_sink", default=None)
+
+
+def _parse_size(text) -> int:
+    """Converte tamanhos como '512M', '20G' ou '1048576' em bytes."""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    value = str(text).strip().upper().removesuffix("B").removesuffix("I")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def _size_argument(text) -> int:
+    """type= do argparse para tamanhos: valor inválido vira erro de uso, não traceback."""
+    try:
+        return _parse_size(text)
+    except (ValueError, OverflowError):
+        import argparse
+
+        raise argparse.ArgumentTypeError(
+            f"tamanho inválido: {text!r} (use, por exemplo, 512M ou 20G)") from None
+
+
+def _format_size(size) -> str:
+    """Formata bytes no estilo de 'du -h' (ex: 384M, 1.2G)."""
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" or size >= 10 else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+def _parse_package_name(name):
+    """
+    Extrai (plataforma, versão, variante) do nome de um pacote do manifest,
+    ex: 'linux-cmake-wx-3.3.1.tar.gz' -> ('linux', '3.3.1', 'cmake').
+    Retorna None para nomes fora da convenção.
+    """
+    stem = name.removesuffix(".tar.gz")
+    if stem.startswith("linux-cmake-wx-"):
+        return "linux", stem.removeprefix("linux-cmake-wx-"), "cmake"
+    if stem.startswith("linux-wx-"):
+        return "linux", stem.removeprefix("linux-wx-"), None
+    if stem.startswith("windows-wx-"):
+        return "windows", stem.removeprefix("windows-wx-"), None
+    if stem.startswith("android-"):
+        # android-<abi>-<versão>, ou android-<abi>-wx-<versão>
+        rest = stem.removeprefix("android-")
+        if "-wx-" in rest:
+            abi, version = rest.split("-wx-", 1)
+        else:
+            abi, _, version = rest.rpartition("-")
+        if abi and version:
+            return "android", version, abi
+    return None
+
+
+def _package_key(platform, version, variant):
+    """Chave do índice do manifest para (plataforma, versão, variante)."""
+    return f"{platform}/{version}/{variant or ''}"
+
+
+def _mirror_of(url):
+    """Espelho (URL base) de uma URL de arquivo."""
+    return url.rsplit("/", 1)[0]
+
+
+def _default_install_dir_name(platform, version, variant):
+    """Nome usual do diretório de instalação, para quando não há manifest nem registro."""
+    if platform == "linux":
+        if variant == "cmake":
+            return f"linux-cmake-wx-{version}"
+        return f"linux-wx-{version}"
+    if platform == "windows":
+        return f"windows-wx-{version}"
+    if platform == "android":
+        abi = variant or "arm64-v8a"
+        return f"android-{abi}-wx-{version}"
+    return None
+
+
+def _build_manifest_index(manifest):
+    """Mapeia a chave de cada pacote para a sua posição em manifest['packages']."""
+    index = {}
+    for position, pkg in enumerate(manifest.get("packages", [])):
+        parsed = _parse_package_name(pkg.get("name", ""))
+        if parsed is not None:
+            index.setdefault(_package_key(*parsed), position)
+    return index
+
+
+class _ProgressReader:
+    """
+    Envolve a resposta HTTP como um arquivo somente leitura, contando os
+    bytes lidos para alimentar a barra de progresso e, opcionalmente,
+    atualizando um hash com eles. O tarfile lê em pedaços pequenos
+    (cabeçalhos de 512 bytes), então o progresso é chamado no máximo a
+    cada PROGRESS_INTERVAL, além de ao atingir o total.
+    """
+
+    def __init__(self, raw, total, progress, digest=None):
+        self.raw = raw
+        self.total = total
+        self.progress = progress
+        self.digest = digest
+        self.downloaded = 0
+        self.last_report = 0.0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        if data:
+            self.downloaded += len(data)
+            if self.digest is not None:
+                self.digest.update(data)
+            if (self.downloaded == self.total
+                    or time.monotonic() - self.last_report >= PROGRESS_INTERVAL):
+                self.report()
+        return data
+
+    def report(self):
+        """Chama progress agora, fora do intervalo (ex: no fim do fluxo)."""
+        self.last_report = time.monotonic()
+        self.progress(self.downloaded, self.total)
+
+    def drain(self):
+        """Consome o restante do fluxo (ex: blocos de preenchimento do tar)."""
+        while self.read(STREAM_CHUNK_SIZE):
+            pass
+        self.report()
+
+
+class _HashingReader:
+    """Lê um arquivo calculando o sha256 do que foi lido."""
+
+    def __init__(self, raw):
+        import hashlib
+
+        self.raw = raw
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.digest.update(data)
+        return data
+
+
+class _ParallelGzipReader:
+    """
+    Leitor de um .tar.gz com vários membros gzip concatenados (o formato
+    gerado pelo pigz/'awx pack'). Cada membro é descomprimido
+    independentemente em um pool de threads (o zlib libera o GIL) e o
+    resultado é entregue em ordem, como um arquivo de leitura sequencial.
+
+    offsets são as posições, no arquivo comprimido, onde cada membro começa.
+    """
+
+    def __init__(self, path, offsets, workers):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.path = Path(path)
+        bounds = list(offsets) + [self.path.stat().st_size]
+        self.ranges = deque(zip(bounds, bounds[1:]))
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lookahead = max(2, workers * 2)
+        self.pending = deque()
+        self.buffer = memoryview(b"")
+
+    def _decompress(self, start, end):
+        import tarfile
+        import zlib
+
+        with self.path.open("rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        inflater = zlib.decompressobj(wbits=31)
+        out = inflater.decompress(data)
+        if not inflater.eof or inflater.unused_data:
+            raise tarfile.ReadError(f"membro gzip inválido em {start}-{end}")
+        return out
+
+    def _fill(self):
+        while self.ranges and len(self.pending) < self.lookahead:
+            start, end = self.ranges.popleft()
+            self.pending.append(self.pool.submit(self._decompress, start, end))
+
+    def read(self, size=-1):
+        chunks = []
+        wanted = size if size >= 0 else sys.maxsize
+        while wanted > 0:
+            if not self.buffer:
+                self._fill()
+                if not self.pending:
+                    break
+                self.buffer = memoryview(self.pending.popleft().result())
+                continue
+            chunk = self.buffer[:wanted]
+            self.buffer = self.buffer[len(chunk):]
+            chunks.append(chunk)
+            wanted -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        for future in self.pending:
+            future.cancel()
+        self.pool.shutdown(wait=True)
+
+
+class _DedupStore:
+    """
+    Armazém de arquivos por conteúdo (install_dir/.awx/store). Arquivos
+    iguais de instalações diferentes passam a ser hardlinks de uma única
+    cópia, ou reflinks dela em sistemas de arquivos que suportam (btrfs,
+    XFS): cada instalação tem o seu inode, mas os blocos são compartilhados.
+
+    O nome de cada cópia inclui sha256 e permissões, já que hardlinks
+    compartilham o modo do arquivo. O modo escolhido fica gravado no próprio
+    armazém e vale para as instalações seguintes.
+    """
+
+    def __init__(self, root, mode=None):
+        self.root = Path(root)
+        mode_file = self.root / ".mode"
+        if mode is None:
+            try:
+                mode = mode_file.read_text(encoding="utf-8").strip()
+            except FileNotFoundError:
+                mode = "hardlink"
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"modo de deduplicação inválido: {mode}")
+        self.mode = mode
+        self.files = 0
+        self.saved = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.mode == "reflink":
+            self._probe_reflink()
+        mode_file.write_text(self.mode + "\n", encoding="utf-8")
+
+    def _probe_reflink(self):
+        probe = self.root / ".probe"
+        probe.write_bytes(b"awx")
+        try:
+            _reflink(probe, Path(f"{probe}.clone"))
+        except OSError as e:
+            raise OSError(e.errno, f"reflink não suportado em {self.root}: {e.strerror}") from None
+        finally:
+            for path in (probe, Path(f"{probe}.clone")):
+                path.unlink(missing_ok=True)
+
+    def blob(self, sha256, mode):
+        return self.root / sha256[:2] / f"{sha256}-{stat.S_IMODE(mode):o}"
+
+    def adopt(self, path, sha256):
+        """
+        Substitui path pela cópia do armazém; se ainda não houver cópia,
+        path passa a ser a cópia. Retorna os bytes economizados.
+        """
+        path = Path(path)
+        st = path.lstat()
+        if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+            return 0
+        blob = self.blob(sha256, st.st_mode)
+        blob.parent.mkdir(exist_ok=True)
+        if self.mode == "hardlink":
+            try:
+                os.link(path, blob)
+                return 0
+            except FileExistsError:
+                pass
+            if os.path.samefile(path, blob):
+                return 0
+        elif not blob.exists():
+            tmp = Path(f"{blob}.{threading.get_ident()}.tmp")
+            _reflink(path, tmp)
+            os.replace(tmp, blob)
+            return 0
+
+        tmp = path.with_name(f".{path.name}.awx-dedup")
+        try:
+            if self.mode == "hardlink":
+                os.link(blob, tmp)
+            else:
+                _reflink(blob, tmp)
+                os.utime(tmp, (st.st_atime, st.st_mtime))
+        except OSError as e:
+            if e.errno == errno.EMLINK:  # limite de hardlinks do inode
+                return 0
+            raise
+        os.replace(tmp, path)
+        with self._lock:
+            self.files += 1
+            self.saved += st.st_size
+        return st.st_size
+
+    def inodes(self):
+        """(dispositivo, inode) de cada cópia, para pular arquivos já deduplicados."""
+        found = set()
+        for blob in self.root.glob("??/*"):
+            st = blob.stat()
+            found.add((st.st_dev, st.st_ino))
+        return found
+
+    def prune(self):
+        """
+        Remove cópias que nenhuma instalação usa mais (um único link).
+        Com reflinks não há como saber, e nada é removido.
+        """
+        if self.mode != "hardlink":
+            return 0, 0
+        count = freed = 0
+        for blob in self.root.glob("??/*"):
+            st = blob.stat()
+            if st.st_nlink == 1:
+                blob.unlink()
+                count += 1
+                freed += st.st_size
+        return count, freed
+
+
+def _reflink(src, dst):
+    """Cria dst compartilhando os blocos de src (ioctl FICLONE)."""
+    import fcntl
+    import shutil
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.unlink(dst)
+            raise
+    shutil.copymode(src, dst)
+
+
+def _tree_usage(path, seen):
+    """
+    Tamanho lógico (soma dos tamanhos) e físico (blocos alocados) de uma
+    árvore. Como no du, um inode já contado em seen não é contado de novo.
+    """
+    logical = physical = 0
+    for root, dirs, files in os.walk(path):
+        for name in files + dirs:
+            st = os.lstat(os.path.join(root, name))
+            if not stat.S_ISDIR(st.st_mode):
+                logical += st.st_size
+            key = (st.st_dev, st.st_ino)
+            if key not in seen:
+                seen.add(key)
+                physical += st.st_blocks * 512
+    return logical, physical
+
+
+def _hash_mapped(path):
+    """
+    sha256 de um arquivo. Arquivos a partir de VERIFY_MMAP_MIN_SIZE são
+    lidos por mmap, sem cópias para o Python, e o hashlib libera o GIL
+    durante o cálculo: várias threads usam vários núcleos.
+    """
+    import hashlib
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < VERIFY_MMAP_MIN_SIZE:
+            return hashlib.sha256(f.read()).hexdigest()
+        import mmap
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def _purge_tree(root, workers=DEFAULT_EXTRACT_WORKERS):
+    """
+    Apaga uma árvore como shutil.rmtree, mas com as subárvores do segundo
+    nível (include/wx, lib/..., src/...) divididas entre threads: unlink
+    libera o GIL, e em árvores de dezenas de milhares de arquivos o tempo
+    é quase todo de unlink.
+    """
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+
+    subtrees = [root]
+    for _ in range(2):
+        subtrees = [entry.path for path in subtrees for entry in os.scandir(path)
+                    if entry.is_dir(follow_symlinks=False)]
+    if len(subtrees) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda path: shutil.rmtree(path, ignore_errors=True), subtrees))
+    # O que sobrou: arquivos dos dois primeiros níveis e os próprios diretórios
+    shutil.rmtree(root)
+
+
+class _ParallelExtractor:
+    """
+    Extrai um tar lido em fluxo separando a descompressão da escrita em
+    disco: a thread atual lê e descomprime os membros em ordem, enquanto um
+    pool de threads cria os arquivos e ajusta permissões e mtime.
+
+    Diretórios são criados na hora (e recebem permissões e mtime no final,
+    dos mais profundos para os mais rasos); links simbólicos e hardlinks são
+    criados depois que todos os arquivos foram gravados. Com store, cada
+    arquivo gravado é entregue ao _DedupStore.
+    """
+
+    def __init__(self, dest, workers=DEFAULT_EXTRACT_WORKERS, on_member=None,
+                 select=None, expected=None, store=None, hashes=None):
+        self.dest = Path(dest)
+        self.workers = max(1, workers)
+        self.on_member = on_member
+        # select(member) -> bool escolhe os membros extraídos; expected
+        # mapeia nome -> sha256 para conferir o conteúdo de cada arquivo
+        self.select = select
+        self.expected = expected
+        self.store = store
+        # hashes: dict preenchido com caminho (relativo a dest) -> sha256 de
+        # cada arquivo gravado, para o registro da instalação ('awx verify')
+        self.hashes = hashes
+        self.files = 0
+        self.bytes = 0
+        self._pending_bytes = 0
+        self._cond = threading.Condition()
+        self._known_dirs = set()
+
+    def extract(self, fileobj, compressed=True):
+        """
+        Extrai o tar lido de fileobj (um .tar.gz, ou um tar já descomprimido
+        com compressed=False). Retorna (arquivos, bytes) gravados.
+        """
+        import gzip
+        import tarfile
+        from concurrent.futures import ThreadPoolExecutor
+
+        directories = []
+        links = []
+        futures = deque()
+        if compressed:
+            # O GzipFile descomprime com buffer próprio (e aceita gzip
+            # multi-membro); o modo 'r|gz' do tarfile recopia o buffer
+            # descomprimido a cada leitura de cabeçalho.
+            fileobj = gzip.GzipFile(fileobj=fileobj, mode="rb")
+        # Com um único núcleo, o pool só acrescentaria trocas de contexto
+        pool = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        with tarfile.open(fileobj=fileobj, mode="r|") as tar:
+            try:
+                for member in tar:
+                    if self.select is not None and not self.select(member):
+                        continue
+                    if self.on_member is not None:
+                        self.on_member(member)
+                    target = self._target(member)
+
+                    if member.isdir():
+                        self._makedirs(target)
+                        directories.append((target, member))
+                    elif member.isfile():
+                        self._makedirs(target.parent)
+                        source = tar.extractfile(member)
+                        if pool is None or member.size > EXTRACT_INLINE_SIZE:
+                            self._write_inline(source, target, member)
+                        else:
+                            data = source.read()
+                            self._reserve(len(data))
+                            futures.append(pool.submit(self._write, target, data, member))
+                        self.files += 1
+                        self.bytes += member.size
+                    elif member.issym() or member.islnk():
+                        links.append((target, member))
+                    else:
+                        # FIFOs e dispositivos: delega ao tarfile
+                        self._makedirs(target.parent)
+                        tar.extract(member, path=self.dest)
+
+                    # Propaga erros de escrita sem esperar o fim do arquivo
+                    while futures and futures[0].done():
+                        futures.popleft().result()
+            finally:
+                try:
+                    for future in futures:
+                        future.result()
+                finally:
+                    if pool is not None:
+                        pool.shutdown()
+
+        for target, member in links:
+            self._makedirs(target.parent)
+            if target.is_symlink() or target.exists():
+                target.unlink()
+            if member.issym():
+                os.symlink(member.linkname, target)
+            else:
+                os.link(self._target(member, member.linkname), target)
+
+        for target, member in sorted(directories, key=lambda d: len(d[0].parts), reverse=True):
+            os.chmod(target, member.mode)
+            os.utime(target, (member.mtime, member.mtime))
+
+        return self.files, self.bytes
+
+    def _target(self, member, name=None):
+        """Caminho de destino de um membro, recusando nomes fora de dest."""
+        import tarfile
+
+        name = name or member.name
+        target = self.dest / name
+        if os.path.isabs(name) or ".." in Path(name).parts:
+            raise tarfile.ExtractError(f"caminho inseguro no arquivo: {name}")
+        return target
+
+    def _makedirs(self, path):
+        if path not in self._known_dirs:
+            path.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(path)
+
+    def _reserve(self, size):
+        """Limita a memória ocupada por dados lidos e ainda não gravados."""
+        with self._cond:
+            while self._pending_bytes and self._pending_bytes + size > EXTRACT_MAX_PENDING:
+                self._cond.wait()
+            self._pending_bytes += size
+
+    def _check(self, member, digest):
+        import tarfile
+
+        expected = self.expected.get(member.name) if self.expected else None
+        if expected and digest.hexdigest() != expected:
+            raise tarfile.ExtractError(f"sha256 não confere: {member.name}")
+
+    def _create(self, target):
+        # Nunca grava por cima de um arquivo existente: ele pode ser um
+        # hardlink do armazém, compartilhado com outras instalações.
+        if self.store is not None and os.path.lexists(target):
+            os.unlink(target)
+        return open(target, "wb")
+
+    def _hashing(self):
+        return bool(self.expected) or self.store is not None or self.hashes is not None
+
+    def _finish(self, target, member, digest):
+        os.chmod(target, member.mode)
+        os.utime(target, (member.mtime, member.mtime))
+        if self.hashes is not None:
+            self.hashes[target.relative_to(self.dest).as_posix()] = digest.hexdigest()
+        if self.store is not None:
+            self.store.adopt(target, digest.hexdigest())
+
+    def _write(self, target, data, member):
+        import hashlib
+
+        try:
+            digest = None
+            if self._hashing():
+                digest = hashlib.sha256(data)
+                self._check(member, digest)
+            with self._create(target) as f:
+                f.write(data)
+            self._finish(target, member, digest)
+        finally:
+            with self._cond:
+                self._pending_bytes -= len(data)
+                self._cond.notify_all()
+
+    def _write_inline(self, source, target, member):
+        """Grava o arquivo na thread atual, em blocos."""
+        import shutil
+
+        hashing = self._hashing()
+        reader = _HashingReader(source) if hashing else source
+        with self._create(target) as f:
+            shutil.copyfileobj(reader, f, STREAM_CHUNK_SIZE)
+        digest = reader.digest if hashing else None
+        if digest is not None:
+            self._check(member, digest)
+        self._finish(target, member, digest)
+
+
+class _FileLock:
+    """
+    Lock exclusivo entre processos (flock) em um arquivo '.lock'. Vale
+    também entre threads, que abrem o arquivo cada uma. Se o lock estiver
+    ocupado, mostra waiting_message e espera.
+    """
+
+    def __init__(self, path, waiting_message=None):
+        self.path = Path(path)
+        self.waiting_message = waiting_message
+        self.fd = None
+
+    def __enter__(self):
+        import fcntl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._notify_waiting()
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    async def acquire_async(self, interval=0.1):
+        """
+        __enter__ para a API assíncrona: espera o lock sem ocupar uma
+        thread, tentando de novo a cada interval segundos, e pode ser
+        cancelado. Libera-se com __exit__, como no 'with'.
+        """
+        import asyncio
+        import fcntl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        waiting = False
+        try:
+            while True:
+                try:
+                    fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return self
+                except BlockingIOError:
+                    if not waiting:
+                        self._notify_waiting()
+                        waiting = True
+                    await asyncio.sleep(interval)
+        except BaseException:
+            os.close(self.fd)
+            self.fd = None
+            raise
+
+    def _notify_waiting(self):
+        sink = _event_sink.get()
+        if sink is not None:
+            sink(AWXEvent("waiting", message=self.waiting_message))
+        elif self.waiting_message:
+            print(self.waiting_message)
+
+    def __exit__(self, *exc):
+        import fcntl
+
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+
+
+class _CacheFill:
+    """
+    Um arquivo sendo baixado do upstream para o cache por 'awx serve',
+    lido ao mesmo tempo por vários clientes: cada leitor espera os bytes
+    que ainda não chegaram. O arquivo só entra no cache depois de conferido
+    o sha256.
+    """
+
+    def __init__(self):
+        self.path = None  # '.fill' durante o download; o arquivo do cache depois
+        self.total = None
+        self.size = 0
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def set_total(self, total):
+        with self.cond:
+            self.total = total
+            self.cond.notify_all()
+
+    def advance(self, count):
+        with self.cond:
+            self.size += count
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            if error is None:
+                self.total = self.size
+            self.cond.notify_all()
+
+    def wait_total(self):
+        """Tamanho total, assim que o upstream o informar (None em caso de erro)."""
+        with self.cond:
+            while self.total is None and not self.done:
+                self.cond.wait()
+            return None if self.error else self.total
+
+    def wait(self, offset):
+        """Espera haver bytes além de offset; retorna quantos já chegaram."""
+        with self.cond:
+            while self.size <= offset and not self.done:
+                self.cond.wait()
+            if self.error is not None:
+                raise OSError(f"download do upstream falhou: {self.error}")
+            return self.size
+
+
+def _peak_rss():
+    """Pico de memória residente do processo, em bytes (None se indisponível)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB; macOS, em bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Phase:
+    """Uma fase em andamento de _Timings; add() soma bytes e arquivos processados."""
+
+    __slots__ = ("timings", "name", "label", "start", "bytes", "files")
+
+    def __init__(self, timings, name, label):
+        self.timings = timings
+        self.name = name
+        self.label = label
+        self.bytes = 0
+        self.files = 0
+
+    def add(self, bytes=0, files=0):
+        self.bytes += bytes
+        self.files += files
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timings.record(self, time.perf_counter(), failed=exc_type is not None)
+        return False
+
+
+class _NoPhase:
+    """Fase usada quando a medição está desligada: não faz nada."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, bytes=0, files=0):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+class _Timings:
+    """
+    Fases medidas em uma execução (--timings, --trace-json): início e
+    duração, bytes, arquivos e o pico de memória do processo ao final de
+    cada uma. Fases de threads diferentes (sync) podem se sobrepor.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def phase(self, name, label=None):
+        return _Phase(self, name, label)
+
+    def record(self, phase, end, failed=False):
+        thread = threading.current_thread()
+        entry = {
+            "name": phase.name,
+            "label": phase.label,
+            "start": phase.start - self.origin,
+            "duration": end - phase.start,
+            "bytes": phase.bytes,
+            "files": phase.files,
+            "peak_rss": _peak_rss(),
+            "failed": failed,
+            "thread": thread.native_id,
+            "thread_name": thread.name,
+        }
+        with self._lock:
+            self.phases.append(entry)
+
+    @staticmethod
+    def _rates(entry):
+        seconds = max(entry["duration"], 1e-9)
+        mb_per_s = entry["bytes"] / seconds / 1e6 if entry["bytes"] else None
+        files_per_s = entry["files"] / seconds if entry["files"] else None
+        return mb_per_s, files_per_s
+
+    def report(self, out=None):
+        """Resumo legível das fases, em stderr (stdout fica para a saída do comando)."""
+        out = out or sys.stderr
+        wall = time.perf_counter() - self.origin
+        peak = _peak_rss()
+        print(f"\nTempos: {wall:.2f}s no total"
+              + (f", RSS pico {_format_size(peak)}" if peak else ""), file=out)
+        print(f"  {'fase':<10} {'item':<30} {'tempo':>9} {'bytes':>8} {'arquivos':>8} "
+              f"{'MB/s':>8} {'arquivos/s':>10} {'RSS pico':>8}", file=out)
+        for entry in sorted(self.phases, key=lambda e: e["start"]):
+            mb_per_s, files_per_s = self._rates(entry)
+            duration = entry["duration"]
+            elapsed = f"{duration * 1000:.1f}ms" if duration < 1 else f"{duration:.2f}s"
+            label = (entry["label"] or "")[:30]
+            print(f"  {entry['name']:<10} {label:<30} {elapsed:>9} "
+                  f"{_format_size(entry['bytes']) if entry['bytes'] else '':>8} "
+                  f"{entry['files'] or '':>8} "
+                  f"{f'{mb_per_s:.1f}' if mb_per_s else '':>8} "
+                  f"{f'{files_per_s:.0f}' if files_per_s else '':>10} "
+                  f"{_format_size(entry['peak_rss']) if entry['peak_rss'] else '':>8}"
+                  + ("  (falhou)" if entry["failed"] else ""), file=out)
+
+    def write_trace(self, path, argv):
+        """
+        Grava as fases no formato de trace do Chrome (chrome://tracing,
+        Perfetto): eventos "X" com bytes, arquivos e taxas em args, mais
+        um resumo da execução em otherData. path "-" escreve em stdout.
+        """
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for entry in sorted(self.phases, key=lambda e: e["start"]):
+            mb_per_s, files_per_s = self._rates(entry)
+            threads[entry["thread"]] = entry["thread_name"]
+            args = {
+                "label": entry["label"],
+                "bytes": entry["bytes"],
+                "files": entry["files"],
+                "mb_per_s": round(mb_per_s, 3) if mb_per_s else None,
+                "files_per_s": round(files_per_s, 1) if files_per_s else None,
+                "peak_rss": entry["peak_rss"],
+                "failed": entry["failed"] or None,
+            }
+            events.append({
+                "name": entry["name"],
+                "cat": "awx",
+                "ph": "X",
+                "ts": round(entry["start"] * 1e6, 1),
+                "dur": round(entry["duration"] * 1e6, 1),
+                "pid": pid,
+                "tid": entry["thread"],
+                "args": {key: value for key, value in args.items() if value is not None},
+            })
+        for tid, name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": name}})
+        trace = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "awx": VERSION,
+                "argv": list(argv),
+                "wall_seconds": round(time.perf_counter() - self.origin, 6),
+                "peak_rss": _peak_rss(),
+            },
+        }
+        if path == "-":
+            json.dump(trace, sys.stdout, indent=1)
+            print()
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, indent=1)
+
+
+def _loop_emitter(on_event):
+    """
+    Callback para _event_sink que entrega cada AWXEvent a on_event na
+    thread do event loop em execução, venha ele do loop ou de uma thread
+    (asyncio.to_thread). Guarda em .last a última mensagem, usada no texto
+    do AWXError.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    loop_thread = threading.get_ident()
+
+    def emit(event):
+        if event.kind == "message":
+            emit.last = event.message
+        if on_event is None:
+            return
+        if threading.get_ident() == loop_thread:
+            on_event(event)
+        else:
+            loop.call_soon_threadsafe(on_event, event)
+    emit.last = None
+    return emit
+
+
+async def _run_in_thread(func, *args, cancel=None):
+    """
+    asyncio.to_thread que, se a tarefa for cancelada, sinaliza cancel (um
+    threading.Event, se informado) e espera func terminar antes de
+    propagar o cancelamento: quem chama pode limpar arquivos e staging sem
+    disputá-los com a thread.
+    """
+    import asyncio
+
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if cancel is not None:
+            cancel.set()
+        await asyncio.wait([future])
+        if not future.cancelled():
+            future.exception()  # já tratado: o que vale é o cancelamento
+        raise
+
+
+async def _http_get_async(url, headers=None, redirects=5):
+    """
+    GET em HTTP/1.1 sobre asyncio, sem dependências: conecta, envia o
+    pedido e lê o cabeçalho da resposta, seguindo redirecionamentos.
+    Retorna (status, cabeçalhos em minúsculas, reader, writer); o corpo se
+    lê com _http_body_async, e quem chama fecha writer.
+    """
+    import asyncio
+    from urllib.parse import urljoin, urlsplit
+
+    for _ in range(redirects + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise AWXError(f"URL não suportada: {url}")
+        ssl_context = None
+        if parts.scheme == "https":
+            import ssl
+            ssl_context = ssl.create_default_context()
+        port = parts.port or (443 if ssl_context else 80)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port, ssl=ssl_context), HTTP_TIMEOUT)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        lines = [f"GET {target} HTTP/1.1", f"Host: {parts.netloc}",
+                 f"User-Agent: awx/{VERSION}", "Accept-Encoding: identity",
+                 "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        try:
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), HTTP_TIMEOUT)
+            fields = status_line.decode("latin-1").split(None, 2)
+            if len(fields) < 2 or not fields[1].isdigit():
+                raise AWXError(f"resposta HTTP inválida de {parts.netloc}")
+            status = int(fields[1])
+            response_headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), HTTP_TIMEOUT)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+        except BaseException:
+            writer.close()
+            raise
+        if status in (301, 302, 303, 307, 308) and "location" in response_headers:
+            writer.close()
+            url = urljoin(url, response_headers["location"])
+            continue
+        return status, response_headers, reader, writer
+    raise AWXError(f"redirecionamentos demais a partir de {url}")
+
+
+async def _http_body_async(reader, headers, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Gera os blocos do corpo de uma resposta de _http_get_async
+    (Content-Length, chunked ou até o fim da conexão). Uma conexão que
+    termina antes do Content-Length levanta AWXError.
+    """
+    import asyncio
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            line = await asyncio.wait_for(reader.readline(), HTTP_TIMEOUT)
+            size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                return
+            yield await asyncio.wait_for(reader.readexactly(size), HTTP_TIMEOUT)
+            await asyncio.wait_for(reader.readline(), HTTP_TIMEOUT)
+    length = headers.get("content-length")
+    remaining = int(length) if length is not None else None
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        chunk = await asyncio.wait_for(reader.read(size), HTTP_TIMEOUT)
+        if not chunk:
+            if remaining:
+                raise AWXError(f"conexão encerrada faltando {remaining} bytes")
+            return
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+
+
+class _BatchProgress:
+    """
+    Uma única linha de progresso para várias instalações simultâneas:
+    bytes baixados no total e quantos pacotes estão em cada etapa.
+    """
+
+    def __init__(self, labels):
+        self.lock = threading.Lock()
+        self.bytes = {label: (0, 0) for label in labels}
+        self.status = {label: "aguardando" for label in labels}
+        self.last_draw = 0.0
+
+    def reporter(self, label):
+        """Retorna um callback progress(baixados, total) para um pacote."""
+        def report(downloaded, total):
+            with self.lock:
+                self.bytes[label] = (downloaded, total)
+                self._draw()
+        return report
+
+    def set_status(self, label, status):
+        with self.lock:
+            self.status[label] = status
+            self._draw(force=True)
+
+    def finish(self):
+        with self.lock:
+            self._draw(force=True)
+            print()
+
+    def _draw(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_draw < PROGRESS_INTERVAL:
+            return
+        self.last_draw = now
+
+        downloaded = sum(done for done, _ in self.bytes.values())
+        total = sum(size for _, size in self.bytes.values())
+        percent = min(downloaded * 100 / total, 100) if total > 0 else 0
+        bar_length = 30
+        filled = int(bar_length * percent / 100)
+        bar = '=' * filled + '-' * (bar_length - filled)
+
+        states = list(self.status.values())
+        finished = sum(1 for st in states if st in ("ok", "erro"))
+        print(f"\r[{bar}] {_format_size(downloaded)}/{_format_size(total)} "
+              f"| baixando: {states.count('baixando')} "
+              f"| extraindo: {states.count('extraindo')} "
+              f"| concluídos: {finished}/{len(states)} "
+              f"| falhas: {states.count('erro')}  ", end='', flush=True)
 
 
 class AWXInstaller:
-    def __init__(self, base_url=DEFAULT_BASE_URL, install_dir=DEFAULT_INSTALL_DIR, debug=False):
+    def __init__(self, base_url=DEFAULT_BASE_URL, install_dir=DEFAULT_INSTALL_DIR, debug=False,
+                 connections=DEFAULT_CONNECTIONS, cache_dir=DEFAULT_CACHE_DIR,
+                 cache_max_size=DEFAULT_CACHE_MAX_SIZE, dedup=None, mirrors=None,
+                 timings=None):
         self.base_url = base_url
+        # base_url é o primeiro espelho; a ordem de uso vem das estatísticas
+        self.mirrors = [base_url] + [m.rstrip("/") for m in mirrors or []
+                                     if m.rstrip("/") != base_url]
+        self._mirror_stats = None  # carregadas sob demanda
+        self._mirror_lock = threading.Lock()
         self.install_dir = Path(install_dir).expanduser()
         self.debug = debug
+        self.connections = max(1, int(connections))
+        self.extract_workers = DEFAULT_EXTRACT_WORKERS
+        # cache_dir=None desativa o cache de arquivos
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        self.cache_max_size = _parse_size(cache_max_size)
+        # dedup=None: usa o armazém só se ele já existir ('awx dedup')
+        self.store_dir = self.install_dir / STATE_DIRNAME / "store"
+        self.dedup_mode = dedup
+        # Instalações removidas esperam aqui pelo 'awx gc'
+        self.trash_dir = self.install_dir / STATE_DIRNAME / "trash"
         self._manifest = None  # carregado sob demanda
+        self._manifest_lock = threading.Lock()  # 'awx serve' revalida de várias threads
+        self._manifest_index = {}  # chave de _package_key -> posição em 'packages'
+        # _Timings de --timings/--trace-json; None desliga a medição
+        self.timings = timings
 
-        if not self.debug:
-            self.install_dir.mkdir(parents=True, exist_ok=True)
-        else:
+        # install_dir só é criado quando algo é instalado: comandos de
+        # leitura não tocam no sistema de arquivos
+        if self.debug:
             print(f"[DEBUG] Modo de simulação ativado - nenhuma ação será executada")
             print(f"[DEBUG] Diretório de instalação: {self.install_dir}")
 
+    def _say(self, message, event=None):
+        """
+        Imprime message ou, dentro da API assíncrona, entrega event (por
+        padrão, um evento "message" com o texto, sem as quebras de linha
+        das pontas; mensagens em branco não viram evento).
+        """
+        sink = _event_sink.get()
+        if sink is None:
+            print(message)
+        elif event is not None:
+            sink(event)
+        elif message.strip():
+            # Quebras de linha e linhas em branco só servem ao terminal
+            sink(AWXEvent("message", message=message.strip("\n")))
+
+    def _phase(self, name, label=None):
+        """
+        Mede um trecho com self.timings ('with self._phase(...) as phase');
+        com a medição desligada, devolve uma fase que não faz nada.
+        """
+        if self.timings is None:
+            return _NO_PHASE
+        return self.timings.phase(name, label)
+
     # ---------------------------
     # Manifest
     # ---------------------------
@@ -40,32 +1219,145 @@ class AWXInstaller:
         """Retorna o caminho local do manifest (ao lado do script)."""
         return Path(__file__).resolve().with_name(MANIFEST_FILENAME)
 
+    def _manifest_cache_path(self) -> Path | None:
+        """Cópia local do manifest remoto (uma por base_url), no cache."""
+        if self.cache_dir is None:
+            return None
+        key = re.sub(r"[^A-Za-z0-9.-]+", "_", self.base_url).strip("_")
+        return self.cache_dir / "manifests" / f"{key}.json"
+
+    def _fetch_manifest(self):
+        """
+        Baixa o manifest de base_url. A cópia em cache é usada direto por
+        MANIFEST_TTL segundos e, depois disso, revalidada com
+        If-None-Match/If-Modified-Since: sem mudanças, custa um 304.
+
+        Retorna {"manifest", "index", "etag", "last_modified", "checked_at"}
+        ou None se o servidor não responder (em MANIFEST_TIMEOUT segundos)
+        e não houver cópia.
+        """
+        cached = self._read_manifest_cache()
+        if cached and time.time() - cached.get("checked_at", 0) < MANIFEST_TTL:
+            return cached
+
+        from http.client import HTTPException
+        from urllib.error import HTTPError, URLError
+        from urllib.request import Request, urlopen
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        # Sem resposta de base_url, tenta os outros espelhos em ordem
+        error = None
+        for mirror in self.mirrors:
+            url = f"{mirror}/{MANIFEST_FILENAME}"
+            # Validadores só valem no servidor que os gerou
+            same_source = cached and cached.get("source", self.base_url) == mirror
+            try:
+                request = Request(url, headers=headers if same_source else {})
+                with urlopen(request, timeout=MANIFEST_TIMEOUT) as response:
+                    manifest = json.loads(response.read())
+                    record = {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "source": mirror,
+                        "manifest": manifest,
+                        "index": _build_manifest_index(manifest),
+                    }
+                break
+            except HTTPError as e:
+                if e.code == 304 and cached:
+                    record = cached
+                    break
+                error = e
+            except (URLError, HTTPException, OSError, ValueError) as e:
+                error = e
+        else:
+            return self._stale_manifest(cached, error)
+
+        self._write_manifest_cache(record)
+        return record
+
+    def _read_manifest_cache(self):
+        cache_path = self._manifest_cache_path()
+        if cache_path is None or not cache_path.exists():
+            return None
+        try:
+            with cache_path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest_cache(self, record):
+        """Grava o manifest recém-validado no cache (checked_at = agora)."""
+        record["checked_at"] = time.time()
+        cache_path = self._manifest_cache_path()
+        if cache_path is not None and not self.debug:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = Path(f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(record, f, separators=(",", ":"))
+            tmp.replace(cache_path)
+
+    def _stale_manifest(self, cached, error):
+        """Sem acesso ao servidor: usa a última cópia do manifest, se houver."""
+        if self.debug:
+            print(f"[DEBUG] Não foi possível baixar o manifest: {error}")
+        if not cached:
+            return None
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(cached.get("checked_at", 0)))
+        self._say(f"Aviso: manifest não atualizado ({error}); usando cópia de {when}")
+        return cached
+
     def _load_manifest(self):
-        """Carrega o manifest.json local apenas uma vez."""
+        """
+        Carrega o manifest apenas uma vez: do servidor (com cache local) ou,
+        se não houver como, o manifest.json ao lado do script.
+        """
         if self._manifest is not None:
             return self._manifest
 
+        if self.debug:
+            self._say(f"[DEBUG] Carregaria manifest de: {self.base_url}/{MANIFEST_FILENAME}")
+            cache_path = self._manifest_cache_path()
+            if cache_path is not None:
+                self._say(f"[DEBUG]   → Cópia local: {cache_path}")
+
+        with self._phase("manifest", self.base_url):
+            record = self._fetch_manifest()
+            if record is not None:
+                self._manifest = record["manifest"]
+                self._manifest_index = record["index"]
+                return self._manifest
+            return self._load_local_manifest()
+
+    def _load_local_manifest(self):
+        """Último recurso: o manifest.json ao lado do script."""
         manifest_path = self._manifest_path()
         if self.debug:
-            print(f"[DEBUG] Carregaria manifest de: {manifest_path}")
+            self._say(f"[DEBUG] Carregaria manifest de: {manifest_path}")
 
         if not manifest_path.exists():
-            print(f"Erro: manifest não encontrado em {manifest_path}")
+            self._say(f"Erro: manifest não encontrado em {self.base_url} nem em {manifest_path}")
             self._manifest = None
             return None
 
         try:
             with manifest_path.open("r", encoding="utf-8") as f:
                 self._manifest = json.load(f)
+            self._manifest_index = _build_manifest_index(self._manifest)
         except Exception as e:
-            print(f"Erro ao ler manifest: {e}")
+            self._say(f"Erro ao ler manifest: {e}")
             self._manifest = None
 
         return self._manifest
 
     def _find_package(self, platform: str, version: str, variant: str | None):
         """
-        Localiza, no manifest, o pacote correspondente a (platform, version, variant).
+        Localiza, no manifest, o pacote correspondente a (platform, version, variant),
+        pelo índice montado quando o manifest é carregado.
 
         Retorna um dict com:
           - package (entrada do manifest)
@@ -79,354 +1371,3348 @@ class AWXInstaller:
         if manifest is None:
             return None
 
-        packages = manifest.get("packages", [])
+        if platform == "linux":
+            if variant not in (None, "cmake"):
+                self._say(
+                    f"Variante inválida para linux: {variant}. Use 'cmake' ou deixe em branco.")
+                return None
+        elif platform == "android":
+            if not variant:
+                self._say("Para android é necessário informar a ABI (ex: arm64-v8a).")
+                return None
+        elif platform == "windows":
+            variant = None
+        else:
+            self._say(f"Plataforma inválida: {platform}")
+            return None
+
+        with self._phase("resolve", f"{platform} {version} {variant or ''}".rstrip()):
+            position = self._manifest_index.get(_package_key(platform, version, variant))
+            if position is None:
+                self._say(
+                    f"Pacote não encontrado no manifest para: plataforma={platform}, versão={version}, variante={variant}")
+                return None
+
+            pkg = manifest["packages"][position]
+            name = pkg["name"]
+            components = pkg.get("components", {})
+            install_dir_name = components.get("install_dir")
+            script_name = components.get("script")
+            source_dir_name = components.get("source_dir")
+
+            # Fallback: se não tiver install_dir no manifest, deduzir do nome
+            if not install_dir_name:
+                install_dir_name = name.replace(".tar.gz", "")
+
+            return {
+                "package": pkg,
+                "archive_name": name,
+                "install_dir_name": install_dir_name,
+                "script_name": script_name,
+                "source_dir_name": source_dir_name,
+            }
+
+    # ---------------------------
+    # Listagens
+    # ---------------------------
+    def list_available(self):
+        manifest = self._load_manifest()
+        if manifest is None:
+            # Fallback antigo, caso não haja manifest
+            print("Compilações disponíveis (fallback):")
+            print("\nLinux:")
+            print("  - linux 3.2.4")
+            print("  - linux 3.3.1")
+            print("  - linux-cmake 3.2.4")
+            print("  - linux-cmake 3.3.1")
+            print("\nWindows:")          # ← tem windows aqui
+            print("  - windows 3.2.4")
+            print("  - windows 3.3.1")
+            print("\nAndroid:")
+            print("  - android 3.2.4 arm64-v8a")
+            print("  - android 3.3.1 arm64-v8a")
+            return
+
+        linux = []
+        windows = []
+        android = []
+
+        for key in self._manifest_index:
+            platform, version, variant = key.split("/")
+            item = f"{platform} {version} {variant}".rstrip()
+            if platform == "linux":
+                linux.append(item)
+            elif platform == "windows":
+                windows.append(item)
+            else:
+                android.append(item)
+
+        print("Compilações disponíveis:")
+        if linux:
+            print("\nLinux:")
+            for item in sorted(linux):
+                print(f"  - {item}")
+        if windows:
+            print("\nWindows:")
+            for item in sorted(windows):
+                print(f"  - {item}")
+        if android:
+            print("\nAndroid:")
+            for item in sorted(android):
+                print(f"  - {item}")
+
+    def list_installed(self, sizes=False):
+        """
+        Lista compilações instaladas localmente. Com sizes=True mostra também
+        o tamanho lógico e o físico (blocos em disco, contando uma única vez
+        os arquivos compartilhados pelo armazém de deduplicação).
+        """
+        if self.debug:
+            print(f"[DEBUG] Listaria instalações em: {self.install_dir}")
+            print(f"[DEBUG] Verificaria existência do diretório")
+            if self.install_dir.exists():
+                print(f"[DEBUG]   → Diretório existe")
+                print(f"[DEBUG] Iteraria sobre subdiretórios")
+                for item in self._installed_entries():
+                    if item.is_dir():
+                        print(f"[DEBUG]   → Encontrado: {item.name}")
+            else:
+                print(f"[DEBUG]   → Diretório não existe")
+            return
+
+        if not self.install_dir.exists():
+            print("Nenhuma compilação instalada")
+            return
+
+        records = None if sizes else self._installed_records()
+        if records is not None:
+            self._list_recorded(records)
+            return
+
+        installed = self._installed_entries()
+        if not installed:
+            print("Nenhuma compilação instalada")
+            return
+
+        print("Compilações instaladas:")
+        seen = set()
+        total_logical = total_physical = 0
+        for item in installed:
+            if not item.is_dir():
+                continue
+            if not sizes:
+                print(f"  - {item.name}")
+                continue
+            logical, physical = _tree_usage(item, seen)
+            total_logical += logical
+            total_physical += physical
+            print(f"  - {item.name:<36} lógico {_format_size(logical):>6}  "
+                  f"físico {_format_size(physical):>6}")
+        if sizes:
+            if self.store_dir.is_dir():
+                # Cópias no armazém que nenhuma instalação usa mais
+                total_physical += _tree_usage(self.store_dir, seen)[1]
+            print(f"Total: lógico {_format_size(total_logical)}, "
+                  f"físico {_format_size(total_physical)}")
+
+    def _list_recorded(self, records):
+        """Lista as instalações a partir do banco de estado, sem percorrer as árvores."""
+        managed = set()
+        lines = []
+        for record in records:
+            components = json.loads(record["components"])
+            expected = json.loads(record["entry"]).get("components", {})
+            managed.update(components.values())
+            name = components.get("install_dir") or record["name"].removesuffix(".tar.gz")
+            label = " ".join(record["key"].split("/")).strip()
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(record["installed_at"]))
+            line = f"  - {name:<28} {label:<24} {_format_size(record['bytes']):>6}  {when}"
+            absent = [role for role in COMPONENT_ROLES
+                      if expected.get(role) and role not in components]
+            if absent:
+                line += f"  (sem {', '.join(absent)})"
+            lines.append(line)
+        others = [item.name for item in self._installed_entries()
+                  if item.is_dir() and item.name not in managed]
+
+        if not lines and not others:
+            print("Nenhuma compilação instalada")
+            return
+        if lines:
+            print("Compilações instaladas:")
+            print("\n".join(lines))
+        if others:
+            if lines:
+                print()
+            print("Não registrados pelo awx:")
+            for name in others:
+                print(f"  - {name}")
+
+    # ---------------------------
+    # Espelhos
+    # ---------------------------
+    def _mirror_stats_path(self) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / MIRROR_STATS_FILENAME
+
+    def _load_mirror_stats(self):
+        """
+        Estatísticas por espelho, {url: {"throughput", "updated", "failed_at"}},
+        guardadas no cache entre execuções.
+        """
+        if self._mirror_stats is None:
+            self._mirror_stats = {}
+            path = self._mirror_stats_path()
+            if path is not None and path.exists():
+                try:
+                    with path.open("r", encoding="utf-8") as f:
+                        self._mirror_stats = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._mirror_stats
+
+    def _save_mirror_stats(self):
+        path = self._mirror_stats_path()
+        if path is None or self.debug or self._mirror_stats is None:
+            return
+        with self._mirror_lock:
+            data = json.dumps(self._mirror_stats, separators=(",", ":"))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = Path(f"{path}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(data, encoding="utf-8")
+            tmp.replace(path)
+        except OSError:
+            pass  # só uma preferência: sem elas, os espelhos são medidos de novo
+
+    def _record_mirror(self, mirror, size=0, seconds=0.0, failed=False):
+        """Registra uma falha ou a vazão observada (média com a anterior)."""
+        with self._mirror_lock:
+            stats = self._load_mirror_stats().setdefault(mirror, {})
+            if failed:
+                stats["failed_at"] = time.time()
+                return
+            observed = size / max(seconds, 1e-6)
+            previous = stats.get("throughput")
+            stats["throughput"] = observed if previous is None else (previous + observed) / 2
+            stats["updated"] = time.time()
+            stats["failed_at"] = None
+
+    def _probe_mirror(self, mirror, name):
+        """
+        Mede um espelho com um pedido Range dos primeiros MIRROR_PROBE_SIZE
+        bytes de name. Retorna a vazão em bytes/s, ou None se falhar.
+        """
+        from http.client import HTTPException
+        from urllib.error import URLError
+        from urllib.request import Request, urlopen
+
+        request = Request(f"{mirror}/{name}",
+                          headers={"Range": f"bytes=0-{MIRROR_PROBE_SIZE - 1}"})
+        start = time.monotonic()
+        try:
+            with urlopen(request, timeout=MIRROR_PROBE_TIMEOUT) as response:
+                size = len(response.read(MIRROR_PROBE_SIZE))
+        except (URLError, HTTPException, OSError):
+            self._record_mirror(mirror, failed=True)
+            return None
+        elapsed = time.monotonic() - start
+        self._record_mirror(mirror, size, elapsed)
+        return size / max(elapsed, 1e-6)
+
+    def _probe_mirrors(self, mirrors, name):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(mirrors)) as pool:
+            results = list(pool.map(lambda m: self._probe_mirror(m, name), mirrors))
+        self._save_mirror_stats()
+        return results
+
+    def _mirror_urls(self, name, probe=False):
+        """
+        URLs de name em cada espelho, da maior para a menor vazão. Com
+        probe (antes de downloads grandes), espelhos sem estatísticas
+        recentes são medidos antes, em paralelo; os demais são ordenados
+        pela vazão de downloads anteriores, sem nova medição. Espelhos que
+        falharam há pouco ficam por último.
+        """
+        if len(self.mirrors) == 1:
+            return [f"{self.base_url}/{name}"]
+        stats = self._load_mirror_stats()
+        now = time.time()
+        if probe and not self.debug:
+            stale = [m for m in self.mirrors
+                     if now - stats.get(m, {}).get("updated", 0) > MIRROR_STATS_TTL
+                     and now - (stats.get(m, {}).get("failed_at") or 0) > MIRROR_RETRY_AFTER]
+            if stale:
+                self._say(f"Medindo {len(stale)} espelho(s)...")
+                self._probe_mirrors(stale, name)
+
+        def rank(mirror):
+            entry = stats.get(mirror, {})
+            failed = time.time() - (entry.get("failed_at") or 0) < MIRROR_RETRY_AFTER
+            return failed, -(entry.get("throughput") or 0)
+
+        return [f"{mirror}/{name}" for mirror in sorted(self.mirrors, key=rank)]
+
+    def mirrors_report(self, probe=False):
+        """
+        Lista os espelhos, na ordem em que seriam usados, com a vazão
+        observada. Com probe, mede todos agora com o maior pacote do manifest.
+        """
+        if probe and not self.debug:
+            manifest = self._load_manifest()
+            packages = (manifest or {}).get("packages", [])
+            if not packages:
+                print("Nenhum pacote no manifest para medir os espelhos")
+                return False
+            name = max(packages, key=lambda p: p.get("bytes") or 0)["name"]
+            print(f"Medindo {len(self.mirrors)} espelho(s) com {name}...")
+            self._probe_mirrors(self.mirrors, name)
+
+        stats = self._load_mirror_stats()
+        print("Espelhos (ordem de preferência):")
+        for url in self._mirror_urls(""):
+            mirror = _mirror_of(url)
+            entry = stats.get(mirror, {})
+            if entry.get("throughput"):
+                when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["updated"]))
+                detail = f"{_format_size(entry['throughput'])}/s (medido em {when})"
+            else:
+                detail = "sem medição"
+            if time.time() - (entry.get("failed_at") or 0) < MIRROR_RETRY_AFTER:
+                detail += ", falhou há pouco"
+            print(f"  - {mirror:<45} {detail}")
+        return True
+
+    # ---------------------------
+    # Download real
+    # ---------------------------
+    def _print_progress(self, downloaded, total_size):
+        """Desenha a barra de progresso na linha atual."""
+        percent = min(downloaded * 100 / total_size,
+                      100) if total_size > 0 else 0
+        bar_length = 40
+        filled = int(bar_length * percent / 100)
+        bar = '=' * filled + '-' * (bar_length - filled)
+        print(f'\r[{bar}] {percent:.1f}%', end='', flush=True)
+
+    def _download_file(self, url, dest, sha256=None, progress=None):
+        """
+        Baixa arquivo com barra de progresso (ou chamando progress(baixados,
+        total), se informado). url pode ser uma lista de URLs do mesmo
+        arquivo em espelhos diferentes, em ordem de preferência.
+
+        O conteúdo é gravado em '<dest>.part'. Se o servidor aceitar Range,
+        o arquivo é dividido em faixas de bytes baixadas em paralelo (até
+        self.connections) e o progresso de cada faixa fica registrado em
+        '<dest>.part.json', junto com a URL, o sha256 esperado e o validador
+        HTTP (ETag/Last-Modified). Um download interrompido continua de onde
+        parou na próxima execução. Se um espelho falhar no meio, as faixas
+        continuam de onde pararam no próximo.
+        """
+        import hashlib
+        from http.client import HTTPException
+        from urllib.error import URLError
+
+        urls = [url] if isinstance(url, str) else list(url)
+        part = Path(f"{dest}.part")
+        state_path = Path(f"{dest}.part.json")
+
+        with self._phase("download", urls[0].rsplit("/", 1)[-1]) as phase:
+            probe = None
+            for candidate in urls:
+                try:
+                    probe = self._probe_download(candidate)
+                    break
+                except (URLError, HTTPException, OSError, ValueError) as e:
+                    error = e
+                    if len(urls) > 1:
+                        self._say(f"Espelho indisponível: {_mirror_of(candidate)} ({e})")
+                        self._record_mirror(_mirror_of(candidate), failed=True)
+            if probe is None:
+                self._say(f"\nErro ao baixar: {error}")
+                self._save_mirror_stats()
+                return False
+            urls = urls[urls.index(probe["url"]):]
+
+            resumed = 0
+            if probe["total"] is None:
+                for candidate in urls:
+                    # Sem Range, cada tentativa recomeça do zero
+                    digest = hashlib.sha256() if sha256 else None
+                    ok = self._download_single(candidate, part, digest, progress)
+                    if ok:
+                        break
+            else:
+                # O sha256 é calculado sobre os bytes à medida que chegam
+                digest = hashlib.sha256() if sha256 else None
+                state = self._load_part_state(state_path, part, probe["url"], sha256, probe)
+                if state is None:
+                    state = self._new_part_state(probe["url"], sha256, probe)
+                    self._preallocate(part, probe["total"])
+                else:
+                    # Pode ter começado em outro espelho: o validador é o deste
+                    state.update(url=probe["url"], etag=probe["etag"],
+                                 last_modified=probe["last_modified"])
+                    resumed = sum(seg[2] for seg in state["segments"])
+                    self._say(f"Retomando download: {resumed} de {probe['total']} "
+                              f"bytes já baixados")
+                ok = self._download_segments(urls, part, state, state_path, digest, progress)
+            self._save_mirror_stats()
+
+            if not ok:
+                return False
+
+            if digest is not None and digest.hexdigest() != sha256.lower():
+                self._say(f"Erro: sha256 não confere para {probe['url']}\n"
+                          f"  esperado: {sha256}\n"
+                          f"  obtido:   {digest.hexdigest()}")
+                part.unlink()
+                if state_path.exists():
+                    state_path.unlink()
+                return False
+
+            phase.add(bytes=part.stat().st_size - resumed)
+            part.replace(dest)
+            if state_path.exists():
+                state_path.unlink()
+            return True
+
+    def _probe_download(self, url):
+        """
+        Pede o primeiro byte do arquivo para descobrir se o servidor aceita
+        Range. Retorna a URL, o tamanho total (None se Range não é aceito)
+        e o validador do conteúdo.
+        """
+        from urllib.request import Request, urlopen
+
+        request = Request(url, headers={"Range": "bytes=0-0"})
+        with urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            headers = response.headers
+            total = None
+            if response.status == 206:
+                content_range = headers.get("Content-Range", "")
+                size = content_range.rpartition("/")[2]
+                total = int(size) if size.isdigit() else None
+            return {
+                "url": url,
+                "total": total,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            }
+
+    def _new_part_state(self, url, sha256, probe):
+        """Cria o estado de um download novo, dividido em segmentos."""
+        total = probe["total"]
+        count = max(1, min(self.connections, total // MIN_SEGMENT_SIZE))
+        step = max(1, -(-total // count))
+        return {
+            "url": url,
+            "sha256": sha256,
+            "etag": probe["etag"],
+            "last_modified": probe["last_modified"],
+            "total": total,
+            # [início, fim, bytes já gravados]
+            "segments": [[start, min(start + step, total), 0]
+                         for start in range(0, total, step)],
+        }
+
+    def _load_part_state(self, state_path: Path, part: Path, url, sha256, probe):
+        """
+        Lê o estado de um download interrompido. Retorna None se não houver
+        estado, ou se ele não corresponder mais ao arquivo no servidor.
+        """
+        if not state_path.exists() or not part.exists():
+            return None
+        try:
+            with state_path.open("r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        validator_ok = (
+            (probe["etag"] or probe["last_modified"])
+            and state.get("etag") == probe["etag"]
+            and state.get("last_modified") == probe["last_modified"]
+        )
+        # Com sha256, o conteúdo é o mesmo em qualquer espelho (e é conferido
+        # no final); sem ele, só o validador do mesmo servidor garante isso
+        same_content = (state.get("sha256") == sha256
+                        and (sha256 or (state.get("url") == url and validator_ok)))
+        if (not same_content or state.get("total") != probe["total"]
+                or part.stat().st_size != probe["total"]):
+            self._say("Download parcial descartado: arquivo mudou no servidor")
+            return None
+        return state
+
+    def _save_part_state(self, state_path: Path, state):
+        """Grava o estado do download de forma atômica."""
+        tmp = Path(f"{state_path}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(state, f)
+        tmp.replace(state_path)
+
+    def _preallocate(self, path: Path, total):
+        with open(path, "wb") as f:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, total)
+            else:
+                f.truncate(total)
+
+    def _download_single(self, url, part: Path, digest=None, progress=None):
+        """Download em um único fluxo, para servidores sem suporte a Range."""
+        from http.client import HTTPException
+        from urllib.error import URLError
+        from urllib.request import urlopen
+
+        report = progress or self._print_progress
+        try:
+            with urlopen(url, timeout=HTTP_TIMEOUT) as response, part.open("wb") as f:
+                total = int(response.headers.get("Content-Length") or 0)
+                downloaded = 0
+                while True:
+                    chunk = response.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+                    downloaded += len(chunk)
+                    report(downloaded, total)
+                if total and downloaded != total:
+                    raise URLError(f"conexão encerrada no byte {downloaded} de {total}")
+            if progress is None:
+                print()  # Nova linha após o download
+        except (URLError, HTTPException, OSError) as e:
+            self._say(f"\nErro ao baixar: {e}")
+            # Sem Range não há como retomar: descarta o parcial
+            if part.exists():
+                part.unlink()
+            return False
+        return True
+
+    def _download_segments(self, urls, part: Path, state, state_path: Path, digest=None,
+                           progress=None):
+        """
+        Baixa os trechos pendentes de cada segmento, cada um por uma conexão
+        própria, gravando diretamente na posição certa do arquivo '.part'.
+        O estado é salvo periodicamente e sempre que o download é
+        interrompido.
+
+        urls são o mesmo arquivo em espelhos, em ordem de preferência. Se o
+        espelho atual falhar, cada segmento continua, do byte em que parou,
+        no próximo; a vazão obtida de cada espelho é registrada.
+
+        Se digest for informado, uma thread à parte o alimenta, em ordem,
+        com o prefixo contíguo do arquivo à medida que ele é gravado (relido
+        do cache de páginas, logo após a escrita).
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from http.client import HTTPException
+        from urllib.error import URLError
+        from urllib.request import Request, urlopen
+
+        report = progress or self._print_progress
+        total = state["total"]
+        # Cada espelho tem o seu ETag/Last-Modified para o If-Range
+        validators = {state["url"]: state["etag"] or state["last_modified"]}
+        dead = set()
+        # url -> [bytes, início, último byte recebido], para a vazão
+        received = {}
+        segments = state["segments"]
+        pending = [seg for seg in segments if seg[0] + seg[2] < seg[1]]
+
+        lock = threading.Condition()
+        failed = threading.Event()
+        finished = False
+
+        def contiguous_end():
+            for start, end, done in segments:
+                if start + done < end:
+                    return start + done
+            return total
+
+        def hash_prefix():
+            offset = 0
+            # Sem buffer: um buffer de leitura antecipada guardaria os zeros
+            # da pré-alocação além do prefixo, ainda não sobrescritos
+            with part.open("rb", buffering=0) as f:
+                while True:
+                    with lock:
+                        while contiguous_end() <= offset and not finished:
+                            lock.wait()
+                        end = contiguous_end()
+                    if end <= offset:
+                        return
+                    f.seek(offset)
+                    while offset < end:
+                        chunk = f.read(min(STREAM_CHUNK_SIZE, end - offset))
+                        digest.update(chunk)
+                        offset += len(chunk)
+        downloaded = sum(seg[2] for seg in state["segments"])
+        last_save = time.monotonic()
+
+        def validator_for(url):
+            if url not in validators:
+                probe = self._probe_download(url)
+                if probe["total"] != total:
+                    raise URLError(f"tamanho diferente no espelho ({probe['total']} bytes)")
+                validators[url] = probe["etag"] or probe["last_modified"]
+            return validators[url]
+
+        def fetch(seg):
+            while True:
+                with lock:
+                    alive = [url for url in urls if url not in dead]
+                if not alive:
+                    raise URLError("nenhum espelho disponível")
+                url = alive[0]
+                try:
+                    fetch_from(url, seg)
+                    return
+                except (URLError, HTTPException, ConnectionError, TimeoutError) as e:
+                    with lock:
+                        first = url not in dead
+                        dead.add(url)
+                        last = len(dead) == len(urls)
+                    if first and len(urls) > 1:
+                        self._record_mirror(_mirror_of(url), failed=True)
+                        if not last:
+                            self._say(f"\nEspelho {_mirror_of(url)} falhou ({e}); "
+                                      f"continuando de onde parou em outro")
+                    if last:
+                        raise
+
+        def fetch_from(url, seg):
+            nonlocal downloaded, last_save
+            start, end = seg[0] + seg[2], seg[1]
+            headers = {"Range": f"bytes={start}-{end - 1}"}
+            validator = validator_for(url)
+            if validator:
+                headers["If-Range"] = validator
+            with lock:
+                now = time.monotonic()
+                received.setdefault(url, [0, now, now])
+            # Sem buffer: o byte está no cache de páginas quando o
+            # segmento é marcado como gravado (o hasher relê de lá)
+            with urlopen(Request(url, headers=headers), timeout=HTTP_TIMEOUT) as response, \
+                    part.open("r+b", buffering=0) as f:
+                if response.status != 206:
+                    raise URLError("servidor não atendeu o pedido Range "
+                                   "(o arquivo pode ter mudado)")
+                f.seek(start)
+                pos = start
+                while pos < end:
+                    if failed.is_set():
+                        return
+                    chunk = response.read(min(STREAM_CHUNK_SIZE, end - pos))
+                    if not chunk:
+                        raise URLError(
+                            f"conexão encerrada no byte {pos} de {total}")
+                    f.write(chunk)
+                    pos += len(chunk)
+                    with lock:
+                        seg[2] = pos - seg[0]
+                        lock.notify_all()
+                        downloaded += len(chunk)
+                        stats = received[url]
+                        stats[0] += len(chunk)
+                        stats[2] = time.monotonic()
+                        report(downloaded, total)
+                        if time.monotonic() - last_save >= STATE_SAVE_INTERVAL:
+                            self._save_part_state(state_path, state)
+                            last_save = time.monotonic()
+
+        hasher = None
+        if digest is not None:
+            hasher = threading.Thread(target=hash_prefix, daemon=True)
+            hasher.start()
+
+        try:
+            self._save_part_state(state_path, state)
+            if pending:
+                with ThreadPoolExecutor(max_workers=min(len(pending), self.connections)) as pool:
+                    futures = [pool.submit(fetch, seg) for seg in pending]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except BaseException:
+                        failed.set()
+                        raise
+            if progress is None:
+                print()  # Nova linha após o download
+        except (URLError, HTTPException, OSError) as e:
+            self._say(f"\nErro ao baixar: {e}\n"
+                      f"Download parcial mantido em {part}; execute novamente para continuar")
+            return False
+        finally:
+            # Vale também para Ctrl+C: o que já foi gravado não se perde
+            with lock:
+                self._save_part_state(state_path, state)
+                finished = True
+                lock.notify_all()
+            if hasher is not None:
+                hasher.join()
+            if len(urls) > 1:
+                for url, (size, first, last) in received.items():
+                    # Trechos pequenos medem mais a latência do que a vazão
+                    if size >= MIN_SEGMENT_SIZE:
+                        self._record_mirror(_mirror_of(url), size, last - first)
+        return True
+
+    def _stream_extract(self, url, dest_dir: Path, sha256=None, hashes=None) -> bool:
+        """
+        Baixa e extrai ao mesmo tempo: o corpo da resposta HTTP alimenta
+        diretamente um leitor tar em fluxo ('r|gz'), sem arquivo temporário.
+
+        Se sha256 for informado, o hash é calculado sobre os bytes recebidos
+        e conferido ao final. Em caso de falha ou divergência, remove os
+        itens de primeiro nível que foram criados por esta extração.
+        """
+        import hashlib
+        import tarfile
+        from http.client import HTTPException
+        from urllib.error import URLError
+        from urllib.request import urlopen
+
+        created = []
+
+        def track(member):
+            top = member.name.split("/", 1)[0]
+            if top not in created and not (dest_dir / top).exists():
+                created.append(top)
+
+        with self._phase("stream", url.rsplit("/", 1)[-1]) as phase:
+            try:
+                with urlopen(url, timeout=HTTP_TIMEOUT) as response:
+                    total = int(response.headers.get("Content-Length") or 0)
+                    digest = hashlib.sha256() if sha256 else None
+                    reader = _ProgressReader(response, total, self._print_progress, digest)
+                    extractor = _ParallelExtractor(dest_dir, self.extract_workers, on_member=track,
+                                                   store=self._store(), hashes=hashes)
+                    extractor.extract(reader)
+                    reader.drain()
+                    phase.add(bytes=reader.downloaded, files=extractor.files)
+                print()
+            except (URLError, HTTPException, OSError, tarfile.TarError) as e:
+                self._say(f"\nErro ao baixar/extrair: {e}")
+                self._cleanup_partial(dest_dir, created)
+                return False
+
+        if digest is not None and digest.hexdigest() != sha256.lower():
+            self._say(f"Erro: sha256 não confere para {url}\n"
+                      f"  esperado: {sha256}\n"
+                      f"  obtido:   {digest.hexdigest()}\n"
+                      f"Desfazendo a extração...")
+            self._cleanup_partial(dest_dir, created)
+            return False
+        return True
+
+    def _cleanup_partial(self, dest_dir: Path, names):
+        """Remove itens de primeiro nível deixados por uma extração interrompida."""
+        import shutil
+
+        for name in names:
+            path = dest_dir / name
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path, ignore_errors=True)
+            elif path.exists() or path.is_symlink():
+                path.unlink()
+
+    # ---------------------------
+    # Cache de arquivos (por sha256)
+    # ---------------------------
+    def _cache_blob_path(self, sha256) -> Path | None:
+        """
+        Caminho do arquivo no cache, endereçado pelo sha256 do manifest.
+        Retorna None se o cache estiver desativado ou não houver sha256.
+        """
+        if self.cache_dir is None or not sha256:
+            return None
+        return self.cache_dir / "blobs" / sha256
+
+    def _cache_entries(self):
+        """
+        Lista os arquivos completos do cache como (caminho, tamanho, último uso),
+        do uso mais antigo para o mais recente. Downloads parciais ('.part')
+        não entram na lista.
+        """
+        if self.cache_dir is None:
+            return []
+        blobs_dir = self.cache_dir / "blobs"
+        if not blobs_dir.is_dir():
+            return []
+        entries = []
+        for item in blobs_dir.iterdir():
+            if "." in item.name or not item.is_file():
+                continue
+            st = item.stat()
+            entries.append((item, st.st_size, st.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def _cache_touch(self, blob: Path):
+        """Marca o arquivo como usado agora (o mtime guarda o último uso)."""
+        os.utime(blob)
+
+    def _cache_evict(self, max_size):
+        """
+        Remove os arquivos usados há mais tempo até o cache caber em
+        max_size bytes. Retorna a lista de (caminho, tamanho) removidos.
+        """
+        entries = self._cache_entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for blob, size, _ in entries:
+            if total <= max_size:
+                break
+            if not self.debug:
+                blob.unlink()
+            evicted.append((blob, size))
+            total -= size
+        return evicted
+
+    def _cache_names_by_sha(self):
+        """Mapeia sha256 -> nome do pacote, segundo o manifest."""
+        manifest = self._load_manifest() or {}
+        return {pkg.get("sha256"): pkg.get("name")
+                for pkg in manifest.get("packages", [])}
+
+    def cache_list(self):
+        """Lista o conteúdo do cache de arquivos"""
+        if self.cache_dir is None:
+            print("Cache desativado")
+            return
+
+        entries = self._cache_entries()
+        if not entries:
+            print(f"Cache vazio: {self.cache_dir}")
+            return
+
+        names = self._cache_names_by_sha()
+        total = sum(size for _, size, _ in entries)
+        print(f"Cache em {self.cache_dir} "
+              f"({_format_size(total)} de {_format_size(self.cache_max_size)}):")
+        for blob, size, last_use in reversed(entries):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(last_use))
+            name = names.get(blob.name, "(fora do manifest)")
+            print(f"  - {name:<36} {_format_size(size):>6}  {when}  {blob.name[:12]}")
+
+    def cache_prune(self, max_size=None):
+        """
+        Reduz o cache até max_size bytes (padrão: o limite configurado),
+        removendo primeiro os arquivos usados há mais tempo.
+        """
+        if self.cache_dir is None:
+            print("Cache desativado")
+            return True
+
+        limit = self.cache_max_size if max_size is None else max_size
+        evicted = self._cache_evict(limit)
+        prefix = "[DEBUG] Seria removido" if self.debug else "✓ Removido do cache"
+        for blob, size in evicted:
+            print(f"{prefix}: {blob.name[:12]} ({_format_size(size)})")
+        freed = sum(size for _, size in evicted)
+        print(f"Liberado: {_format_size(freed)}")
+        return True
+
+    # ---------------------------
+    # Deduplicação entre instalações
+    # ---------------------------
+    def _store(self):
+        """_DedupStore em uso, ou None se a deduplicação estiver desligada."""
+        if self.debug:
+            return None
+        if self.dedup_mode is None and not self.store_dir.is_dir():
+            return None
+        if getattr(self, "_dedup_store", None) is None:
+            self._dedup_store = _DedupStore(self.store_dir, self.dedup_mode)
+        return self._dedup_store
+
+    def _installed_entries(self):
+        """Itens de install_dir (instalações, fontes e scripts), sem os do awx."""
+        if not self.install_dir.is_dir():
+            return []
+        return sorted(item for item in self.install_dir.iterdir()
+                      if not item.name.startswith("."))
+
+    def _hash_file(self, path):
+        import hashlib
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(STREAM_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def dedup(self, mode=None):
+        """
+        Converte as instalações existentes para o armazém por conteúdo:
+        arquivos iguais viram hardlinks (ou reflinks) de uma única cópia.
+        As instalações seguintes passam a usar o armazém automaticamente.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if self.debug:
+            print(f"[DEBUG] Armazém: {self.store_dir} "
+                  f"(modo: {mode or self.dedup_mode or 'hardlink'})")
+            known = _DedupStore(self.store_dir).inodes() if self.store_dir.is_dir() else set()
+        else:
+            try:
+                store = _DedupStore(self.store_dir, mode or self.dedup_mode)
+            except (OSError, ValueError) as e:
+                print(f"Erro: {e}")
+                return False
+            known = store.inodes()
+
+        candidates = []
+        for entry in self._installed_entries():
+            paths = [entry] if entry.is_file() else (
+                Path(root) / name for root, _, files in os.walk(entry) for name in files)
+            for path in paths:
+                st = path.lstat()
+                if (stat.S_ISREG(st.st_mode) and st.st_size > 0
+                        and (st.st_dev, st.st_ino) not in known):
+                    candidates.append((path, st))
+        print(f"Calculando sha256 de {len(candidates)} arquivo(s)...")
+
+        with ThreadPoolExecutor(max_workers=self.extract_workers) as pool:
+            hashes = list(pool.map(lambda c: self._hash_file(c[0]), candidates))
+
+        if self.debug:
+            seen = set()
+            count = saved = 0
+            for (path, st), sha256 in zip(candidates, hashes):
+                key = (sha256, stat.S_IMODE(st.st_mode))
+                if key in seen:
+                    count += 1
+                    saved += st.st_size
+                seen.add(key)
+            print(f"[DEBUG] {count} arquivo(s) seriam deduplicados, "
+                  f"economizando {_format_size(saved)}")
+            return True
+
+        try:
+            for (path, _), sha256 in zip(candidates, hashes):
+                store.adopt(path, sha256)
+        except OSError as e:
+            print(f"Erro ao deduplicar: {e}")
+            return False
+        print(f"✓ {store.files} arquivo(s) deduplicados ({store.mode}), "
+              f"{_format_size(store.saved)} economizados")
+        count, freed = store.prune()
+        if count:
+            print(f"✓ {count} cópia(s) sem uso removidas do armazém ({_format_size(freed)})")
+        return True
+
+    # ---------------------------
+    # Etapas da instalação
+    # ---------------------------
+    def _fetch_archive(self, pkg_info, progress=None) -> Path | None:
+        """
+        Obtém o .tar.gz do pacote: do cache, se já estiver lá, ou baixando
+        (para o cache, ou para um arquivo temporário em install_dir/.awx se o
+        cache estiver desativado). Retorna o caminho do arquivo ou None.
+        """
+        archive_name = pkg_info["archive_name"]
+        sha256 = pkg_info["package"].get("sha256")
+        cached_file = self._cache_blob_path(sha256)
+        if cached_file is not None and cached_file.is_file():
+            self._cache_touch(cached_file)
+            return cached_file
+
+        dest = cached_file or self._download_path(archive_name)
+        # Um único download por arquivo, entre processos e threads: quem
+        # chega depois espera e reaproveita o arquivo baixado
+        with _FileLock(Path(f"{dest}.lock"),
+                       f"Aguardando outro download de {archive_name}..."):
+            if cached_file is not None and cached_file.is_file():
+                self._cache_touch(cached_file)
+                return cached_file
+            urls = self._mirror_urls(archive_name, probe=True)
+            if not self._download_file(urls, dest, sha256, progress):
+                return None
+        return dest
+
+    def _download_path(self, archive_name) -> Path:
+        """Destino do download quando o cache está desativado."""
+        return self.install_dir / STATE_DIRNAME / "downloads" / archive_name
+
+    def _extract_archive(self, archive: Path, pkg_info, select=None, dest=None,
+                         on_member=None, hashes=None) -> bool:
+        """
+        Extrai o .tar.gz em dest (padrão: install_dir), apenas os membros
+        aceitos por select, se informado. Arquivos temporários são removidos depois;
+        arquivos do cache ficam, e o limite do cache é aplicado.
+
+        A descompressão roda na thread atual e a escrita dos arquivos em um
+        pool (_ParallelExtractor). Se o manifest informar 'gzip_members'
+        (posições dos membros de um gzip multi-membro), os membros também
+        são descomprimidos em paralelo.
+        """
+        package = pkg_info["package"]
+        cached = archive == self._cache_blob_path(package.get("sha256"))
+        with self._phase("extract", pkg_info["archive_name"]) as phase:
+            try:
+                extractor = _ParallelExtractor(dest or self.install_dir, self.extract_workers,
+                                               on_member=on_member, select=select,
+                                               store=self._store(), hashes=hashes)
+                gzip_members = package.get("gzip_members")
+                if gzip_members and len(gzip_members) > 1:
+                    offsets = [member[0] for member in gzip_members]
+                    reader = _ParallelGzipReader(archive, offsets, self.extract_workers)
+                    try:
+                        extractor.extract(reader, compressed=False)
+                    finally:
+                        reader.close()
+                else:
+                    with archive.open("rb") as f:
+                        extractor.extract(f)
+                phase.add(bytes=extractor.bytes, files=extractor.files)
+
+                if cached:
+                    self._cache_evict(self.cache_max_size)
+                else:
+                    archive.unlink()
+
+            except AWXError:
+                raise  # cancelamento pela API assíncrona: o arquivo continua válido
+            except Exception as e:
+                import gzip
+                import tarfile
+                import zlib
+
+                self._say(f"Erro ao extrair {pkg_info['archive_name']}: {e}")
+                # Do cache, só apaga se o próprio arquivo estiver corrompido:
+                # um erro ao gravar o destino (disco cheio, permissão) não o
+                # invalida.
+                corrupt = isinstance(e, (tarfile.TarError, zlib.error, EOFError,
+                                         gzip.BadGzipFile))
+                if (corrupt or not cached) and archive.exists():
+                    archive.unlink()
+                return False
+        return True
+
+    # ---------------------------
+    # Instalação seletiva de componentes
+    # ---------------------------
+    def _component_paths(self, pkg_info):
+        """Mapeia cada componente do pacote para o seu caminho em install_dir."""
+        names = {
+            "script": pkg_info["script_name"],
+            "install_dir": pkg_info["install_dir_name"],
+            "source_dir": pkg_info["source_dir_name"],
+        }
+        return {role: self.install_dir / name
+                for role, name in names.items() if name}
+
+    def _component_status(self, pkg_info, components=None):
+        """
+        Componentes pedidos (components, ou todos os do pacote), na ordem de
+        COMPONENT_ROLES, e os que entre eles ainda faltam em install_dir.
+        Retorna (caminhos dos componentes, pedidos, faltando).
+        """
+        component_paths = self._component_paths(pkg_info)
+        selected = [role for role in COMPONENT_ROLES
+                    if role in (components or COMPONENT_ROLES) and role in component_paths]
+        missing = [role for role in selected if not component_paths[role].exists()]
+        return component_paths, selected, missing
+
+    def _fetch_index(self, package):
+        """
+        Baixa o índice de membros do pacote ('<arquivo>.index.json') do
+        primeiro espelho que responder. Retorna (índice, espelho).
+        """
+        import hashlib
+        from http.client import HTTPException
+        from urllib.error import URLError
+        from urllib.request import urlopen
+
+        urls = self._mirror_urls(package["index"])
+        for url in urls:
+            try:
+                with urlopen(url, timeout=HTTP_TIMEOUT) as response:
+                    data = response.read()
+                break
+            except (URLError, HTTPException, ConnectionError, TimeoutError) as e:
+                if url == urls[-1]:
+                    raise
+                self._record_mirror(_mirror_of(url), failed=True)
+                self._say(f"Espelho indisponível: {_mirror_of(url)} ({e})")
+        expected = package.get("index_sha256")
+        if expected and hashlib.sha256(data).hexdigest() != expected:
+            raise ValueError(f"sha256 do índice {package['index']} não confere")
+        return json.loads(data), _mirror_of(url)
+
+    def _component_byte_ranges(self, package, index, roles):
+        """
+        Converte as faixas dos componentes no tar descomprimido em faixas de
+        bytes do .tar.gz. Só é possível porque cada componente começa em um
+        membro gzip novo ('awx pack'). Retorna None se o pacote não tiver
+        essa organização.
+        """
+        by_offset = {uncompressed: compressed
+                     for compressed, uncompressed in package.get("gzip_members", [])}
+        ranges = []
+        for role in COMPONENT_ROLES:
+            if role not in roles:
+                continue
+            start, end = index["component_ranges"][role]
+            c_start = by_offset.get(start)
+            c_end = by_offset.get(end, package.get("bytes"))
+            if c_start is None or c_end is None:
+                return None
+            if ranges and ranges[-1][1] == c_start:
+                ranges[-1][1] = c_end
+            else:
+                ranges.append([c_start, c_end])
+        return ranges
+
+    def _fetch_components_ranged(self, pkg_info, roles, select, dest, hashes=None):
+        """
+        Baixa e extrai apenas os componentes pedidos, com pedidos Range
+        calculados a partir do índice do pacote. Cada arquivo é conferido
+        com o sha256 do índice.
+
+        Retorna True/False, ou None se o pacote ou o servidor não permitirem
+        a leitura por faixas (o chamador baixa o arquivo inteiro).
+        """
+        import tarfile
+        from http.client import HTTPException
+        from urllib.error import URLError
+        from urllib.request import Request, urlopen
+
+        package = pkg_info["package"]
+        if not package.get("index") or not package.get("gzip_members"):
+            return None
+        with self._phase("components", pkg_info["archive_name"]) as phase:
+            try:
+                index, mirror = self._fetch_index(package)
+                # As faixas vêm do mesmo espelho que respondeu pelo índice
+                url = f"{mirror}/{pkg_info['archive_name']}"
+                ranges = self._component_byte_ranges(package, index, roles)
+                if ranges is None:
+                    return None
+                expected = {entry["path"]: entry["sha256"] for entry in index["files"]
+                            if entry["path"].split("/", 1)[0] in select.names}
+
+                total = sum(end - start for start, end in ranges)
+                full = package.get("bytes") or 0
+                print(f"Baixando {_format_size(total)} de {_format_size(full)} "
+                      f"(apenas {', '.join(r for r in COMPONENT_ROLES if r in roles)})...")
+                done = 0
+                extractor = _ParallelExtractor(dest, self.extract_workers,
+                                               select=select, expected=expected,
+                                               store=self._store(), hashes=hashes)
+                for start, end in ranges:
+                    request = Request(url, headers={"Range": f"bytes={start}-{end - 1}"})
+                    with urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                        if response.status != 206:
+                            print("Servidor não aceita Range: baixando o arquivo completo")
+                            return None
+                        base = done
+                        reader = _ProgressReader(
+                            response, total,
+                            lambda n, t: self._print_progress(base + n, t))
+                        extractor.extract(reader)
+                        reader.report()
+                        done += reader.downloaded
+                phase.add(bytes=done, files=extractor.files)
+                print()
+                if extractor.files != len(expected):
+                    raise tarfile.ExtractError(
+                        f"{extractor.files} arquivos extraídos, {len(expected)} no índice")
+            except (URLError, HTTPException, OSError, ValueError, KeyError,
+                    tarfile.TarError) as e:
+                print(f"\nErro ao baixar componentes: {e}")
+                return False
+        return True
+
+    def _install_components(self, pkg_info, roles, dest, hashes=None):
+        """
+        Extrai em dest só alguns componentes do pacote: do cache, se o
+        arquivo completo estiver lá; senão por faixas de bytes usando o
+        índice; e, em último caso, baixando o arquivo completo e extraindo
+        só o pedido.
+        """
+        paths = self._component_paths(pkg_info)
+        names = {paths[role].name for role in roles}
+
+        def select(member):
+            return member.name.split("/", 1)[0] in names
+        select.names = names
+
+        cached_file = self._cache_blob_path(pkg_info["package"].get("sha256"))
+        ok = None
+        if cached_file is None or not cached_file.is_file():
+            ok = self._fetch_components_ranged(pkg_info, roles, select, dest, hashes)
+        if ok is None:
+            archive = self._fetch_archive(pkg_info)
+            ok = archive is not None and self._extract_archive(archive, pkg_info, select,
+                                                               dest, hashes=hashes)
+        return ok
+
+    # ---------------------------
+    # Instalação em staging, com lock por pacote
+    # ---------------------------
+    def _package_lock(self, archive_name):
+        """Lock entre processos para instalar ou remover um pacote."""
+        return _FileLock(self.install_dir / STATE_DIRNAME / "locks" / f"{archive_name}.lock",
+                         f"Aguardando outra instalação de {archive_name}...")
+
+    def _staging_dir(self, archive_name) -> Path:
+        """
+        Diretório privado onde o pacote é extraído antes de aparecer em
+        install_dir. Sobras de uma instalação interrompida são descartadas
+        (quem chama já tem o lock do pacote).
+        """
+        import shutil
+
+        staging = self.install_dir / STATE_DIRNAME / "staging" / archive_name.removesuffix(".tar.gz")
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        return staging
+
+    def _publish(self, staging: Path):
+        """
+        Move cada item extraído em staging para install_dir com rename
+        (atômico no mesmo sistema de arquivos): um componente nunca aparece
+        pela metade em install_dir.
+        """
+        with self._phase("publish", staging.name) as phase:
+            for item in sorted(staging.iterdir()):
+                target = self.install_dir / item.name
+                if target.exists() or target.is_symlink():
+                    self._say(f"Aviso: {target} já existe e foi mantido")
+                    continue
+                os.rename(item, target)
+                phase.add(files=1)
+
+    def _install_staged(self, pkg_info, roles, stream=False, hashes=None):
+        """
+        Baixa e extrai os componentes roles em um diretório de staging e os
+        publica em install_dir. Quem chama deve ter o lock do pacote. Se
+        informado, hashes recebe o sha256 de cada arquivo extraído.
+        """
+        import shutil
+
+        archive_name = pkg_info["archive_name"]
+        component_paths = self._component_paths(pkg_info)
+        cached_file = self._cache_blob_path(pkg_info["package"].get("sha256"))
+        cache_hit = cached_file is not None and cached_file.is_file()
+        staging = self._staging_dir(archive_name)
+        try:
+            if set(roles) != set(component_paths):
+                print(f"Instalando componentes de {archive_name}: {', '.join(roles)}")
+                ok = self._install_components(pkg_info, roles, staging, hashes)
+            elif stream and not cache_hit:
+                print(f"Baixando e extraindo {archive_name} para {self.install_dir}...")
+                ok = self._stream_extract(self._mirror_urls(archive_name, probe=True)[0],
+                                          staging, pkg_info["package"].get("sha256"), hashes)
+            else:
+                if cache_hit:
+                    print(f"Usando {archive_name} do cache: {cached_file}")
+                else:
+                    print(f"Baixando {archive_name}...")
+                archive = self._fetch_archive(pkg_info)
+                ok = archive is not None
+                if ok:
+                    print(f"Extraindo para {self.install_dir}...")
+                    ok = self._extract_archive(archive, pkg_info, dest=staging, hashes=hashes)
+            if ok:
+                self._publish(staging)
+            return ok
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    # ---------------------------
+    # Lixeira (install_dir/.awx/trash) e coleta de lixo
+    # ---------------------------
+    def _move_to_trash(self, paths, label):
+        """
+        Move os caminhos para um diretório novo na lixeira com rename: a
+        remoção termina na hora, e a árvore é apagada depois pelo 'awx gc'.
+        Um caminho em outro sistema de arquivos é apagado aqui mesmo.
+        """
+        name = f"{label}-{time.time_ns()}"
+        # Montado com nome oculto: um 'awx gc' rodando agora não o vê pela metade
+        entry = self.trash_dir / f".{name}"
+        entry.mkdir(parents=True)
+        for path in paths:
+            try:
+                os.rename(path, entry / path.name)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                if path.is_dir() and not path.is_symlink():
+                    _purge_tree(path, self.extract_workers)
+                else:
+                    path.unlink()
+        os.rename(entry, self.trash_dir / name)
+        return self.trash_dir / name
+
+    def _spawn_purge(self):
+        """
+        Esvazia a lixeira em um processo separado ('awx gc --background'),
+        desligado do terminal, para que o comando atual termine já.
+        """
+        import subprocess
+
+        command = [sys.executable, str(Path(__file__).resolve()),
+                   "--install-dir", str(self.install_dir), "gc", "--background"]
+        try:
+            subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, start_new_session=True)
+        except OSError:
+            return False
+        return True
+
+    def _trash_entries(self):
+        if not self.trash_dir.is_dir():
+            return []
+        return sorted(entry for entry in self.trash_dir.iterdir()
+                      if not entry.name.startswith("."))
+
+    def _lru_evictions(self, max_size):
+        """
+        Instalações registradas a remover, das usadas há mais tempo para as
+        mais recentes, até que o total registrado caiba em max_size.
+        Retorna (a remover, total antes, total depois).
+        """
+        records = self._installed_records() or []
+        total = remaining = sum(record["bytes"] for record in records)
+        evictions = []
+        for record in sorted(records, key=lambda r: r.get("last_used") or r["installed_at"]):
+            if remaining <= max_size:
+                break
+            evictions.append(record)
+            remaining -= record["bytes"]
+        return evictions, total, remaining
+
+    def _trash_install(self, record):
+        """Move para a lixeira todos os componentes de uma instalação registrada."""
+        names = json.loads(record["components"]).values()
+        with self._package_lock(record["name"]):
+            paths = [self.install_dir / name for name in names]
+            existing = [path for path in paths if path.exists() or path.is_symlink()]
+            if existing:
+                self._move_to_trash(existing, record["name"].removesuffix(".tar.gz"))
+            self._forget_install(record["key"])
+
+    def gc(self, max_size=None, background=False):
+        """
+        Apaga o que está na lixeira (ou simula, em debug) e, com o armazém
+        de deduplicação ativo, as cópias que ficaram sem uso. Com max_size,
+        antes disso remove as instalações usadas há mais tempo (com fonte e
+        script) até que as instalações registradas caibam em max_size.
+        """
+        entries = self._trash_entries()
+        if self.debug:
+            print()
+            print("[DEBUG] ===== SIMULAÇÃO DE COLETA DE LIXO =====")
+            if max_size is not None:
+                evictions, total, remaining = self._lru_evictions(max_size)
+                print(f"[DEBUG] Instalações registradas: {_format_size(total)} "
+                      f"(limite: {_format_size(max_size)})")
+                for record in evictions:
+                    used = record.get("last_used") or record["installed_at"]
+                    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(used))
+                    print(f"[DEBUG]   → {record['name'].removesuffix('.tar.gz')} "
+                          f"({_format_size(record['bytes'])}, último uso {when}) seria removido")
+                if not evictions:
+                    print(f"[DEBUG]   → Nada a remover: o limite já é respeitado")
+                print(f"[DEBUG] Total recuperado das instalações: "
+                      f"{_format_size(total - remaining)}")
+            print(f"[DEBUG] Lixeira: {self.trash_dir}")
+            total = 0
+            for entry in entries:
+                size = _tree_usage(entry, set())[1]
+                total += size
+                print(f"[DEBUG]   → {entry.name} ({_format_size(size)}) seria apagado")
+            print(f"[DEBUG] Total a liberar da lixeira: {_format_size(total)}")
+            if self.store_dir.is_dir():
+                print(f"[DEBUG] Remover do armazém as cópias sem uso")
+            print("[DEBUG]")
+            print("[DEBUG] ===== FIM DA SIMULAÇÃO =====")
+            return True
+
+        if background and hasattr(os, "nice"):
+            # Não disputa CPU e disco com a instalação que costuma vir depois
+            os.nice(10)
+        ok = True
+        purged = 0
+        # Um 'awx gc' por vez; o de fundo espera o que estiver rodando
+        with _FileLock(self.install_dir / STATE_DIRNAME / "locks" / "gc.lock",
+                       None if background else "Aguardando outro 'awx gc'..."):
+            if max_size is not None:
+                evictions, total, remaining = self._lru_evictions(max_size)
+                for record in evictions:
+                    try:
+                        self._trash_install(record)
+                    except Exception as e:
+                        print(f"Erro ao remover {record['name']}: {e}")
+                        ok = False
+                        continue
+                    used = record.get("last_used") or record["installed_at"]
+                    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(used))
+                    print(f"✓ Removido: {record['name'].removesuffix('.tar.gz')} "
+                          f"({_format_size(record['bytes'])}, último uso {when})")
+                print(f"Instalações registradas: {_format_size(remaining)} "
+                      f"(limite: {_format_size(max_size)})")
+            for entry in self._trash_entries():
+                try:
+                    with self._phase("purge", entry.name):
+                        _purge_tree(entry, self.extract_workers)
+                    purged += 1
+                except OSError as e:
+                    print(f"Erro ao apagar {entry}: {e}")
+                    ok = False
+            store = self._store()
+            count, freed = store.prune() if store is not None else (0, 0)
+        print(f"✓ Lixeira: {purged} remoção(ões) apagada(s)")
+        if count:
+            print(f"✓ {count} cópia(s) sem uso removidas do armazém ({_format_size(freed)})")
+        return ok
+
+    # ---------------------------
+    # Banco de estado (install_dir/.awx/state.db)
+    # ---------------------------
+    def _state_db(self, write=False):
+        """
+        Conexão com o banco das instalações feitas pelo awx. Sem write,
+        retorna None se o banco ainda não existir (nada é criado).
+        """
+        import sqlite3
+
+        path = self.install_dir / STATE_DIRNAME / "state.db"
+        if not write and not path.exists():
+            return None
+        if write:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        # sync registra instalações de várias threads: uma conexão por uso
+        db = sqlite3.connect(path, timeout=30)
+        if write:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(STATE_DB_SCHEMA)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(packages)")}
+            if "last_used" not in columns:
+                # Banco criado antes do registro de último uso
+                db.execute("ALTER TABLE packages ADD COLUMN last_used REAL")
+            columns = {row[1] for row in db.execute("PRAGMA table_info(files)")}
+            if "sha256" not in columns:
+                # Banco criado antes do 'awx verify': sem hash, só o tamanho é conferido
+                db.execute("ALTER TABLE files ADD COLUMN mtime REAL")
+                db.execute("ALTER TABLE files ADD COLUMN sha256 TEXT")
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _package_record_key(self, pkg_info):
+        parsed = _parse_package_name(pkg_info["archive_name"])
+        return _package_key(*parsed) if parsed else pkg_info["archive_name"]
+
+    def _record_install(self, pkg_info, roles, hashes=None):
+        """
+        Registra os componentes recém-instalados: entrada do manifest,
+        caminhos, lista de arquivos e bytes, e o sha256 de cada arquivo
+        calculado na extração (hashes: caminho relativo -> sha256).
+        Componentes instalados depois (--components) são somados ao
+        registro existente.
+        """
+        import sqlite3
+        from contextlib import closing
+
+        with self._phase("record", pkg_info["archive_name"]) as phase:
+            key = self._package_record_key(pkg_info)
+            paths = self._component_paths(pkg_info)
+            rows = []
+            for role in roles:
+                root = paths[role]
+                rows.append(self._state_row(key, root, root.lstat(), hashes))
+                if root.is_dir() and not root.is_symlink():
+                    for base, dirs, files in os.walk(root):
+                        for name in dirs + files:
+                            path = Path(base) / name
+                            rows.append(self._state_row(key, path, path.lstat(), hashes))
+
+            phase.add(files=len(rows))
+            package = pkg_info["package"]
+            try:
+                with closing(self._state_db(write=True)) as db, db:
+                    row = db.execute("SELECT components FROM packages WHERE key = ?",
+                                     (key,)).fetchone()
+                    components = json.loads(row["components"]) if row else {}
+                    components.update({role: paths[role].name for role in roles})
+                    db.executemany("INSERT OR REPLACE INTO files (package, path, kind, size, "
+                                   "mtime, sha256) VALUES (?, ?, ?, ?, ?, ?)", rows)
+                    files, size = db.execute(
+                        "SELECT count(*), coalesce(sum(size), 0) FROM files "
+                        "WHERE package = ? AND kind != 'd'", (key,)).fetchone()
+                    now = time.time()
+                    # Componentes somados depois mantêm a data da instalação
+                    db.execute(
+                        "INSERT INTO packages (key, name, sha256, entry, components, "
+                        "files, bytes, base_url, installed_at, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET name = excluded.name, "
+                        "sha256 = excluded.sha256, entry = excluded.entry, "
+                        "components = excluded.components, files = excluded.files, "
+                        "bytes = excluded.bytes, base_url = excluded.base_url, "
+                        "last_used = excluded.last_used",
+                        (key, pkg_info["archive_name"], package.get("sha256"),
+                         json.dumps(package), json.dumps(components), files, size,
+                         self.base_url, now, now))
+            except (sqlite3.Error, OSError) as e:
+                self._say(f"Aviso: instalação não registrada em {STATE_DIRNAME}/state.db: {e}")
+
+    def _state_row(self, key, path, st, hashes=None):
+        if stat.S_ISDIR(st.st_mode):
+            kind, size = "d", 0
+        elif stat.S_ISLNK(st.st_mode):
+            kind, size = "l", 0
+        else:
+            kind, size = "f", st.st_size
+        name = path.relative_to(self.install_dir).as_posix()
+        sha256 = hashes.get(name) if hashes and kind == "f" else None
+        return key, name, kind, size, st.st_mtime, sha256
+
+    def _installed_records(self):
+        """Instalações registradas no banco, ou None se não houver banco."""
+        from contextlib import closing
+
+        db = self._state_db()
+        if db is None:
+            return None
+        with closing(db):
+            return [dict(row) for row in
+                    db.execute("SELECT * FROM packages ORDER BY name")]
+
+    def _installed_record(self, key):
+        from contextlib import closing
+
+        db = self._state_db()
+        if db is None:
+            return None
+        with closing(db):
+            row = db.execute("SELECT * FROM packages WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def _touch_install(self, key, record=None):
+        """
+        Marca uma instalação como usada agora. Para que 'awx prefix' em
+        scripts de build continue barato, o banco só é regravado quando o
+        último uso registrado tem mais de LAST_USE_RESOLUTION segundos.
+        """
+        import sqlite3
+        from contextlib import closing
+
+        record = record or self._installed_record(key)
+        if record is None:
+            return
+        now = time.time()
+        if now - (record.get("last_used") or 0) < LAST_USE_RESOLUTION:
+            return
+        try:
+            with closing(self._state_db(write=True)) as db, db:
+                db.execute("UPDATE packages SET last_used = ? WHERE key = ?", (now, key))
+        except (sqlite3.Error, OSError):
+            pass  # install_dir somente leitura: o uso não depende do registro
+
+    def _forget_install(self, key):
+        """Apaga do banco o registro e a lista de arquivos de uma instalação."""
+        from contextlib import closing
+
+        with closing(self._state_db(write=True)) as db, db:
+            db.execute("DELETE FROM files WHERE package = ?", (key,))
+            db.execute("DELETE FROM packages WHERE key = ?", (key,))
+
+    def info(self, platform, version, variant=None):
+        """Mostra o que o banco de estado sabe sobre uma compilação instalada."""
+        if platform == "windows":
+            variant = None
+        key = _package_key(platform, version, variant)
+        record = self._installed_record(key)
+        label = " ".join(filter(None, (platform, version, variant)))
+        if record is None:
+            print(f"Compilação não registrada como instalada: {label}")
+            return False
+
+        components = json.loads(record["components"])
+        entry = json.loads(record["entry"])
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(record["installed_at"]))
+        print(f"{record['name']} ({label})")
+        print(f"  sha256:       {record['sha256'] or '(não informado)'}")
+        print(f"  Instalado em: {when}")
+        print(f"  Origem:       {record['base_url']}")
+        print(f"  Arquivos:     {record['files']} ({_format_size(record['bytes'])})")
+        if record.get("last_used"):
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(record["last_used"]))
+            print(f"  Último uso:   {used}")
+        print(f"  Componentes:")
+        for role in COMPONENT_ROLES:
+            name = components.get(role)
+            if name:
+                print(f"    - {role + ':':<12} {self.install_dir / name}")
+            elif entry.get("components", {}).get(role):
+                print(f"    - {role + ':':<12} (não instalado)")
+        return True
+
+    def prefix(self, platform, version, variant=None, wx_config=False):
+        """
+        Imprime só o prefixo de uma compilação instalada (ou o caminho do
+        seu wx-config), para scripts de build e CMake:
+        $(awx prefix linux 3.3.1). Conta como uso para 'awx gc --max-size'.
+        Não consulta o manifest; erros vão para stderr.
+        """
+        if platform == "windows":
+            variant = None
+        key = _package_key(platform, version, variant)
+        record = self._installed_record(key)
+        if record:
+            name = (json.loads(record["components"]).get("install_dir")
+                    or record["name"].removesuffix(".tar.gz"))
+        else:
+            name = _default_install_dir_name(platform, version, variant)
+        path = self._get_install_path_from_name(name)
+        if not path.is_dir():
+            label = " ".join(filter(None, (platform, version, variant)))
+            print(f"Compilação não instalada: {label}", file=sys.stderr)
+            return False
+        if wx_config:
+            path = path / "bin" / "wx-config"
+            if not path.exists():
+                print(f"wx-config não encontrado em {path.parent}", file=sys.stderr)
+                return False
+        if record and not self.debug:
+            self._touch_install(key, record)
+        print(path)
+        return True
+
+    # ---------------------------
+    # Verificação de integridade (awx verify)
+    # ---------------------------
+    def _verify_rows(self, record):
+        """
+        Arquivos registrados de uma instalação. Arquivos sem sha256
+        (instalados antes do 'awx verify') recebem o do índice do pacote,
+        se houver, e o banco é completado com ele.
+        """
+        import sqlite3
+        from contextlib import closing
+        from http.client import HTTPException
+        from urllib.error import URLError
+
+        with closing(self._state_db()) as db:
+            # Bancos antigos não têm mtime nem sha256
+            rows = [{"mtime": None, "sha256": None, **dict(row)} for row in db.execute(
+                "SELECT * FROM files WHERE package = ? ORDER BY path", (record["key"],))]
+        unhashed = [row for row in rows if row["kind"] == "f" and not row["sha256"]]
+        package = json.loads(record["entry"])
+        if not unhashed or not package.get("index") or self.debug:
+            return rows
+
+        try:
+            index, _ = self._fetch_index(package)
+        except (URLError, HTTPException, OSError, ValueError) as e:
+            print(f"Aviso: índice de {record['name']} indisponível ({e}); "
+                  f"arquivos sem hash registrado terão só o tamanho conferido")
+            return rows
+        by_path = {entry["path"]: entry["sha256"] for entry in index.get("files", [])}
+        filled = []
+        for row in unhashed:
+            if row["path"] in by_path:
+                row["sha256"] = by_path[row["path"]]
+                filled.append((row["sha256"], record["key"], row["path"]))
+        try:
+            with closing(self._state_db(write=True)) as db, db:
+                db.executemany("UPDATE files SET sha256 = ? WHERE package = ? AND path = ?",
+                               filled)
+        except (sqlite3.Error, OSError):
+            pass  # install_dir somente leitura: o índice vale só para esta execução
+        return rows
+
+    def _verify_install(self, record, rows, quick, pool):
+        """
+        Confere os arquivos de uma instalação contra o registro: existência,
+        tipo, tamanho e, para arquivos, o sha256, com as leituras divididas
+        entre as threads de pool. Com quick, arquivos com o mesmo tamanho e
+        mtime do registro não são relidos.
+
+        Retorna (problemas, arquivos conferidos, bytes relidos, pulados, sem
+        hash), com problemas como [(caminho relativo, motivo)]; diretórios e
+        links não entram na contagem de arquivos.
+        """
+        problems = []
+        to_hash = []
+        files = skipped = unhashed = 0
+        kinds = {"d": stat.S_ISDIR, "l": stat.S_ISLNK, "f": stat.S_ISREG}
+        for row in rows:
+            path = self.install_dir / row["path"]
+            try:
+                st = os.lstat(path)
+            except FileNotFoundError:
+                problems.append((row["path"], "faltando"))
+                continue
+            if not kinds[row["kind"]](st.st_mode):
+                problems.append((row["path"], "tipo diferente"))
+                continue
+            if row["kind"] != "f":
+                continue
+            files += 1
+            if st.st_size != row["size"]:
+                problems.append((row["path"], f"tamanho diferente ({st.st_size} bytes, "
+                                              f"registrado {row['size']})"))
+            elif quick and row["mtime"] is not None and st.st_mtime == row["mtime"]:
+                skipped += 1
+            elif not row["sha256"]:
+                unhashed += 1
+            else:
+                to_hash.append(row)
+
+        def check(row):
+            try:
+                digest = _hash_mapped(self.install_dir / row["path"])
+            except OSError as e:
+                return row["path"], f"ilegível ({e.strerror})"
+            return None if digest == row["sha256"] else (row["path"], "conteúdo alterado")
+
+        problems.extend(problem for problem in pool.map(check, to_hash) if problem)
+        problems.sort()
+        return problems, files, sum(row["size"] for row in to_hash), skipped, unhashed
+
+    def _fetch_members_ranged(self, package, index, mirror, names, dest, expected):
+        """
+        Baixa só os membros gzip que contêm os arquivos names (pelo índice do
+        pacote) e grava cada arquivo em dest, com modo e mtime do seu
+        cabeçalho tar, depois de conferir o sha256 em expected. Cada trecho
+        contínuo de membros é um único pedido Range.
+        """
+        import hashlib
+        import tarfile
+        import zlib
+        from bisect import bisect_left, bisect_right
+        from urllib.error import URLError
+        from urllib.request import Request, urlopen
+
+        members = sorted(package["gzip_members"], key=lambda member: member[1])
+        starts = [uncompressed for _, uncompressed in members]
+        # Membros [primeiro, último) com o cabeçalho (512 bytes antes dos dados) e os dados
+        spans = []
+        for entry in sorted((e for e in index["files"] if e["path"] in names),
+                            key=lambda e: e["offset"]):
+            first = bisect_right(starts, entry["offset"] - 512) - 1
+            last = bisect_left(starts, entry["offset"] + entry["size"])
+            if spans and first <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], last)
+                spans[-1][2].append(entry)
+            else:
+                spans.append([first, last, [entry]])
+
+        url = f"{mirror}/{package['name']}"
+        for first, last, entries in spans:
+            start = members[first][0]
+            end = members[last][0] - 1 if last < len(members) else ""
+            request = Request(url, headers={"Range": f"bytes={start}-{end}"})
+            with urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                if response.status != 206:
+                    raise URLError("servidor não atendeu o pedido Range")
+                data = response.read()
+            out = bytearray()
+            while data:
+                decompressor = zlib.decompressobj(31)
+                out += decompressor.decompress(data)
+                data = decompressor.unused_data
+            base = starts[first]
+            for entry in entries:
+                offset = entry["offset"] - base
+                content = bytes(out[offset:offset + entry["size"]])
+                if hashlib.sha256(content).hexdigest() != expected[entry["path"]]:
+                    raise tarfile.ExtractError(f"sha256 não confere: {entry['path']}")
+                info = tarfile.TarInfo.frombuf(bytes(out[offset - 512:offset]),
+                                               tarfile.ENCODING, "surrogateescape")
+                target = dest / entry["path"]
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(content)
+                os.chmod(target, info.mode)
+                os.utime(target, (info.mtime, info.mtime))
+
+    def _repair_install(self, record, rows, damaged):
+        """
+        Reinstala só os caminhos damaged de uma instalação. Diretórios são
+        recriados; arquivos e links vêm do .tar.gz em cache, se houver;
+        senão, com o índice do pacote, só dos membros gzip que os contêm;
+        e, em último caso, do arquivo completo. Cada arquivo é conferido
+        com o sha256 registrado e substitui o danificado com rename.
+        Retorna os caminhos que não puderam ser reparados.
+        """
+        import shutil
+        import tarfile
+        from http.client import HTTPException
+        from urllib.error import URLError
+
+        package = json.loads(record["entry"])
+        archive_name = record["name"]
+        by_path = {row["path"]: row for row in rows}
+        expected = {path: by_path[path]["sha256"] for path in damaged
+                    if by_path[path]["kind"] == "f" and by_path[path]["sha256"]}
+        names = {path for path in damaged if by_path[path]["kind"] != "d"}
+        store = self._store()
+
+        with self._package_lock(archive_name), \
+                self._phase("repair", archive_name) as phase:
+            staging = self._staging_dir(archive_name)
+            try:
+                cached_file = self._cache_blob_path(package.get("sha256"))
+                ranged = (package.get("index") and package.get("gzip_members")
+                          and all(by_path[path]["kind"] == "f" for path in names))
+                if names and (cached_file is None or not cached_file.is_file()) and ranged:
+                    try:
+                        index, mirror = self._fetch_index(package)
+                        if names <= {entry["path"] for entry in index["files"]}:
+                            print(f"Baixando só os trechos de {archive_name} com "
+                                  f"{len(names)} arquivo(s)...")
+                            self._fetch_members_ranged(package, index, mirror, names,
+                                                       staging, expected)
+                            names = set()
+                    except (URLError, HTTPException, OSError, ValueError, KeyError,
+                            tarfile.TarError) as e:
+                        print(f"Trechos indisponíveis ({e}); usando o arquivo completo")
+                try:
+                    if names:
+                        pkg_info = {"package": package, "archive_name": archive_name}
+                        archive = self._fetch_archive(pkg_info)
+                        if archive is None:
+                            return sorted(damaged)
+                        print(f"Extraindo {len(names)} arquivo(s) de {archive_name}...")
+                        # Sem o armazém: a cópia dele pode ser justamente a danificada
+                        extractor = _ParallelExtractor(
+                            staging, self.extract_workers,
+                            select=lambda member: member.name in names, expected=expected)
+                        gzip_members = package.get("gzip_members")
+                        if gzip_members and len(gzip_members) > 1:
+                            reader = _ParallelGzipReader(
+                                archive, [member[0] for member in gzip_members],
+                                self.extract_workers)
+                            try:
+                                extractor.extract(reader, compressed=False)
+                            finally:
+                                reader.close()
+                        else:
+                            with archive.open("rb") as f:
+                                extractor.extract(f)
+                        if archive == cached_file:
+                            self._cache_evict(self.cache_max_size)
+                        else:
+                            archive.unlink()
+                except (URLError, HTTPException, OSError, ValueError, KeyError,
+                        tarfile.TarError) as e:
+                    print(f"Erro ao obter os arquivos de {archive_name}: {e}")
+                    return sorted(damaged)
+
+                failed = []
+                for path in sorted(damaged):
+                    source, target = staging / path, self.install_dir / path
+                    if by_path[path]["kind"] == "d":
+                        if target.is_symlink() or (target.exists() and not target.is_dir()):
+                            target.unlink()
+                        target.mkdir(parents=True, exist_ok=True)
+                        continue
+                    if not os.path.lexists(source):
+                        failed.append(path)
+                        continue
+                    if target.is_dir() and not target.is_symlink():
+                        shutil.rmtree(target)
+                    sha256 = expected.get(path)
+                    if store is not None and sha256 and os.path.lexists(target):
+                        # A cópia danificada não pode continuar sendo compartilhada
+                        blob = store.blob(sha256, target.lstat().st_mode)
+                        if blob.exists() and os.path.samefile(blob, target):
+                            blob.unlink()
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(source, target)
+                    if store is not None and sha256:
+                        store.adopt(target, sha256)
+                    phase.add(bytes=by_path[path]["size"], files=1)
+                return failed
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def verify(self, platform=None, version=None, variant=None, quick=False, repair=False,
+               jobs=DEFAULT_EXTRACT_WORKERS):
+        """
+        Confere a integridade das instalações registradas (ou de uma só):
+        cada arquivo é relido (mmap) e comparado com o sha256 calculado na
+        instalação, em paralelo. Com quick, arquivos com tamanho e mtime
+        iguais aos do registro são pulados. Com repair, só os arquivos
+        danificados são baixados e substituídos.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if platform is not None:
+            key = _package_key(platform, version, None if platform == "windows" else variant)
+            record = self._installed_record(key)
+            if record is None:
+                print(f"Compilação não registrada: {key} (instalações feitas pelo awx "
+                      f"ficam em {STATE_DIRNAME}/state.db)")
+                return False
+            records = [record]
+        else:
+            records = self._installed_records() or []
+            if not records:
+                print("Nenhuma compilação registrada para conferir.")
+                return True
+
+        if self.debug:
+            print()
+            print("[DEBUG] ===== SIMULAÇÃO DE VERIFICAÇÃO =====")
+            for record in records:
+                print(f"[DEBUG] {record['name'].removesuffix('.tar.gz')}: "
+                      f"{record['files']} arquivo(s), {_format_size(record['bytes'])}")
+            print(f"[DEBUG]   1. Conferir existência, tipo e tamanho de cada arquivo")
+            if quick:
+                print(f"[DEBUG]   2. Reler só arquivos com mtime diferente do registro")
+            else:
+                print(f"[DEBUG]   2. Reler todos os arquivos (mmap, {jobs} thread(s)) "
+                      f"e comparar o sha256")
+            if repair:
+                print(f"[DEBUG]   3. Reparar os danificados: do cache, dos membros gzip "
+                      f"que os contêm (índice) ou do arquivo completo")
+            print("[DEBUG]")
+            print("[DEBUG] ===== FIM DA SIMULAÇÃO =====")
+            return True
+
+        ok = True
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            for record in records:
+                label = record["name"].removesuffix(".tar.gz")
+                rows = self._verify_rows(record)
+                start = time.perf_counter()
+                with self._phase("verify", label) as phase:
+                    problems, checked, size, skipped, unhashed = self._verify_install(
+                        record, rows, quick, pool)
+                    phase.add(bytes=size, files=checked - skipped)
+                elapsed = time.perf_counter() - start
+                details = f"{checked} arquivo(s), {_format_size(size)} relidos em {elapsed:.2f}s"
+                others = sum(row["kind"] != "f" for row in rows)
+                if others:
+                    details += f"; {others} diretório(s) e link(s)"
+                if skipped:
+                    details += f"; {skipped} pulado(s) no modo rápido"
+                if unhashed:
+                    details += f"; {unhashed} sem hash registrado (só o tamanho)"
+                if not problems:
+                    print(f"✓ {label}: íntegra ({details})")
+                    continue
+
+                print(f"✗ {label}: {len(problems)} problema(s) ({details})")
+                for path, reason in problems[:20]:
+                    print(f"  {reason}: {path}")
+                if len(problems) > 20:
+                    print(f"  ... e mais {len(problems) - 20}")
+                if not repair:
+                    ok = False
+                    continue
+                failed = self._repair_install(record, rows, [path for path, _ in problems])
+                if failed:
+                    print(f"✗ {len(failed)} arquivo(s) não reparado(s) em {label}; "
+                          f"reinstale com 'awx remove' e 'awx install'")
+                    ok = False
+                else:
+                    print(f"✓ {label}: {len(problems)} arquivo(s) reparado(s)")
+        if not ok and not repair:
+            print("Use 'awx verify --repair' para baixar só os arquivos danificados.")
+        return ok
+
+    # ---------------------------
+    # Servidor local com cache (awx serve)
+    # ---------------------------
+    def _serve_manifest(self):
+        """Manifest do upstream (revalidado a cada MANIFEST_TTL segundos)."""
+        with self._manifest_lock:
+            record = self._fetch_manifest()
+            if record is not None:
+                self._manifest, self._manifest_index = record["manifest"], record["index"]
+            elif self._manifest is None:
+                self._load_manifest()
+            return self._manifest
+
+    def _serve_lookup(self, name):
+        """
+        (sha256, tamanho) de um pacote ou índice do manifest pelo nome do
+        arquivo, ou None se o nome não estiver no manifest.
+        """
+        for package in (self._serve_manifest() or {}).get("packages", []):
+            if package.get("name") == name:
+                return package.get("sha256"), package.get("bytes")
+            if package.get("index") == name:
+                return package.get("index_sha256"), None
+        return None
+
+    def _serve_source(self, name, sha256, size, fills, lock):
+        """
+        _CacheFill de onde um cliente lê o arquivo: já concluído, se o
+        arquivo estiver no cache; senão o download em andamento, iniciado
+        pelo primeiro cliente que o pediu.
+        """
+        blob = self._cache_blob_path(sha256)
+        with lock:
+            fill = fills.get(sha256)
+            if fill is not None:
+                return fill
+            fill = _CacheFill()
+            if blob.is_file():
+                self._cache_touch(blob)
+                fill.path = blob
+                fill.size = blob.stat().st_size
+                fill.finish()
+                return fill
+            fills[sha256] = fill
+        threading.Thread(target=self._fill_from_upstream,
+                         args=(name, sha256, size, fill, fills, lock), daemon=True).start()
+        return fill
+
+    def _fill_from_upstream(self, name, sha256, size, fill, fills, lock):
+        """
+        Baixa name do upstream (espelho mais rápido, continuando em outro se
+        falhar) para '<blob>.fill', avisando os leitores a cada bloco. Com o
+        sha256 conferido, o arquivo entra no cache.
+        """
+        import hashlib
+        from http.client import HTTPException
+        from urllib.error import URLError
+        from urllib.request import Request, urlopen
+
+        blob = self._cache_blob_path(sha256)
+        part = Path(f"{blob}.fill")
+        try:
+            # O mesmo lock do 'awx install': um download por arquivo no cache
+            with _FileLock(Path(f"{blob}.lock")):
+                if blob.is_file():
+                    with fill.cond:
+                        fill.path = blob
+                        fill.size = blob.stat().st_size
+                    fill.finish()
+                    return
+                digest = hashlib.sha256()
+                with part.open("wb", buffering=0) as f:
+                    with fill.cond:
+                        fill.path = part
+                    if size:
+                        fill.set_total(size)
+                    error = None
+                    for url in self._mirror_urls(name, probe=not name.endswith(".json")):
+                        headers = {"Range": f"bytes={fill.size}-"} if fill.size else {}
+                        try:
+                            request = Request(url, headers=headers)
+                            with urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                                if fill.size and response.status != 206:
+                                    raise URLError("o espelho não aceita Range para continuar")
+                                length = response.headers.get("Content-Length")
+                                if fill.total is None and length and not fill.size:
+                                    fill.set_total(int(length))
+                                while chunk := response.read(STREAM_CHUNK_SIZE):
+                                    f.write(chunk)
+                                    digest.update(chunk)
+                                    fill.advance(len(chunk))
+                            if fill.total is None or fill.size == fill.total:
+                                break
+                            raise URLError(f"conexão encerrada no byte {fill.size} de {fill.total}")
+                        except (URLError, HTTPException, ConnectionError, TimeoutError) as e:
+                            error = e
+                            if len(self.mirrors) > 1:
+                                self._record_mirror(_mirror_of(url), failed=True)
+                                print(f"Espelho {_mirror_of(url)} falhou ({e})")
+                    else:
+                        raise error
+                if digest.hexdigest() != sha256.lower():
+                    raise ValueError(f"sha256 não confere (obtido {digest.hexdigest()})")
+                with fill.cond:
+                    part.replace(blob)
+                    fill.path = blob
+            fill.finish()
+            print(f"✓ {name} no cache ({_format_size(fill.size)})")
+            self._save_mirror_stats()
+            self._cache_evict(self.cache_max_size)
+        except (URLError, HTTPException, OSError, ValueError) as e:
+            print(f"Erro ao baixar {name} do upstream: {e}")
+            part.unlink(missing_ok=True)
+            fill.finish(e)
+        finally:
+            with lock:
+                fills.pop(sha256, None)
+
+    def serve(self, host="0.0.0.0", port=DEFAULT_SERVE_PORT):
+        """
+        Servidor HTTP com o mesmo layout de base_url (manifest.json,
+        pacotes e índices), para uma rede local. Cada arquivo é baixado do
+        upstream uma única vez, para o cache, e entregue aos clientes
+        enquanto ainda chega; o sha256 do manifest é conferido antes de o
+        arquivo entrar no cache. Aceita Range, com o sha256 como ETag.
+        """
+        import hashlib
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import unquote
+
+        if self.cache_dir is None:
+            print("Erro: 'awx serve' guarda os arquivos no cache; não use --no-cache")
+            return False
+        if self.debug:
+            print()
+            print("[DEBUG] ===== SIMULAÇÃO DO SERVIDOR =====")
+            print(f"[DEBUG] Escutaria em http://{host}:{port}")
+            print(f"[DEBUG] Upstream: {', '.join(self.mirrors)}")
+            print(f"[DEBUG] Cache: {self.cache_dir / 'blobs'} "
+                  f"(limite: {_format_size(self.cache_max_size)})")
+            print("[DEBUG] ===== FIM DA SIMULAÇÃO =====")
+            return True
+
+        installer = self
+        fills = {}  # sha256 -> _CacheFill dos downloads em andamento
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                print(f"{self.address_string()} {format % args}")
+
+            def do_HEAD(self):
+                self.respond(head=True)
+
+            def do_GET(self):
+                self.respond(head=False)
+
+            def respond(self, head):
+                name = unquote(self.path.split("?", 1)[0]).lstrip("/")
+                try:
+                    if name == MANIFEST_FILENAME:
+                        self.send_manifest(head)
+                        return
+                    entry = installer._serve_lookup(name) if "/" not in name else None
+                    if entry is None or not entry[0]:
+                        # Sem sha256 no manifest, não há como conferir o que vai para o cache
+                        self.send_error(404)
+                        return
+                    self.send_file(name, *entry, head)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # o cliente desistiu
+
+            def send_manifest(self, head):
+                manifest = installer._serve_manifest()
+                if manifest is None:
+                    self.send_error(502, "manifest indisponível no upstream")
+                    return
+                body = json.dumps(manifest, indent=2).encode("utf-8")
+                etag = f'"{hashlib.sha256(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def send_file(self, name, sha256, size, head):
+                source = installer._serve_source(name, sha256, size, fills, lock)
+                total = source.wait_total()
+                if total is None:
+                    self.send_error(502, f"falha ao baixar {name} do upstream")
+                    return
+                etag = f'"{sha256}"'
+                start, end = 0, total
+                ranged = self.headers.get("Range")
+                if ranged and self.headers.get("If-Range", etag) == etag:
+                    match = re.fullmatch(r"bytes=(\d*)-(\d*)", ranged.strip())
+                    if match and match.group(1):
+                        start = int(match.group(1))
+                        end = min(int(match.group(2)) + 1, total) if match.group(2) else total
+                    elif match and match.group(2):
+                        start = max(0, total - int(match.group(2)))
+                    if not match or start >= end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{total}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end - 1}/{total}")
+                else:
+                    self.send_response(200)
+                content_type = "application/json" if name.endswith(".json") else "application/gzip"
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(end - start))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", etag)
+                self.end_headers()
+                if head:
+                    return
+                with source.cond:
+                    f = open(source.path, "rb")
+                with f:
+                    pos = start
+                    while pos < end:
+                        try:
+                            available = source.wait(pos)
+                        except OSError:
+                            # Content-Length não será atingido: o cliente descarta
+                            return
+                        f.seek(pos)
+                        chunk = f.read(min(STREAM_CHUNK_SIZE, available - pos, end - pos))
+                        self.wfile.write(chunk)
+                        pos += len(chunk)
+
+        try:
+            server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"Erro ao escutar em {host}:{port}: {e}")
+            return False
+        print(f"Servindo em http://{host}:{port} (upstream: {self.base_url})")
+        print(f"Nos clientes: awx --base-url http://<este-host>:{port} install ...")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nEncerrado")
+        finally:
+            server.server_close()
+        return True
+
+    # ---------------------------
+    # Paths
+    # ---------------------------
+    def _get_install_path_from_name(self, install_dir_name: str) -> Path:
+        return self.install_dir / install_dir_name
+
+    # ---------------------------
+    # Operações
+    # ---------------------------
+    def install(self, platform, version, variant=None, stream=False, components=None):
+        """
+        Instala uma compilação específica (ou simula, em debug) usando o manifest.
+
+        Com stream=True o download é extraído enquanto chega, sem gravar o
+        arquivo .tar.gz em disco. components limita a instalação a alguns
+        dos componentes ('script', 'install_dir', 'source_dir'); os que
+        ficarem de fora podem ser instalados depois da mesma forma.
+        """
+        pkg_info = self._find_package(platform, version, variant)
+        if not pkg_info:
+            return False
+
+        component_paths, selected, missing = self._component_status(pkg_info, components)
+        partial = set(missing) != set(component_paths)
+
+        archive_name = pkg_info["archive_name"]
+        install_dir_name = pkg_info["install_dir_name"]
+        script_name = pkg_info["script_name"]
+        source_dir_name = pkg_info["source_dir_name"]
+
+        install_path = self._get_install_path_from_name(install_dir_name)
+        urls = self._mirror_urls(archive_name)
+        url = urls[0]
+        cached_file = self._cache_blob_path(pkg_info["package"].get("sha256"))
+        cache_hit = cached_file is not None and cached_file.is_file()
+        temp_file = cached_file or self._download_path(archive_name)
+        variante_str = variant if variant else "padrão"
+
+        if self.debug:
+            self._say("")
+            self._say("[DEBUG] ===== SIMULAÇÃO DE INSTALAÇÃO =====")
+            self._say(f"[DEBUG] Plataforma: {platform}")
+            self._say(f"[DEBUG] Versão: {version}")
+            self._say(f"[DEBUG] Variante: {variante_str}")
+            self._say("[DEBUG]")
+            self._say(f"[DEBUG] Arquivo: {archive_name}")
+            self._say(f"[DEBUG] URL de download: {url}")
+            if len(urls) > 1:
+                self._say(f"[DEBUG] Outros espelhos (em ordem): "
+                          f"{', '.join(_mirror_of(u) for u in urls[1:])}")
+            self._say(f"[DEBUG] Arquivo temporário: {temp_file}")
+            self._say(f"[DEBUG] Destino final: {install_path}")
+            self._say(f"[DEBUG] Componentes: {', '.join(selected)}")
+            self._say("[DEBUG]")
+            self._say(f"[DEBUG] Passos que seriam executados:")
+            self._say(f"[DEBUG]   1. Verificar quais componentes já existem")
+            for role in selected:
+                state = "falta" if role in missing else "já existe"
+                self._say(f"[DEBUG]      → {role}: {component_paths[role]} ({state})")
+            if not missing:
+                self._say(f"[DEBUG]      → Nada a instalar")
+            elif partial:
+                self._say(f"[DEBUG]   2. Instalar apenas: {', '.join(missing)}")
+                if cache_hit:
+                    self._say(f"[DEBUG]      → Extrair do cache: {cached_file}")
+                elif pkg_info["package"].get("index"):
+                    self._say(f"[DEBUG]      → Ler o índice {pkg_info['package']['index']} e "
+                              f"baixar só as faixas de bytes desses componentes")
+                else:
+                    self._say(f"[DEBUG]      → Pacote sem índice: baixar o arquivo completo "
+                              f"e extrair só esses componentes")
+            elif cache_hit:
+                self._say(f"[DEBUG]   2. Usar arquivo do cache: {cached_file}")
+                self._say(f"[DEBUG]      → Nenhum download necessário")
+                self._say(f"[DEBUG]   3. Extrair arquivo tar.gz")
+                self._say(f"[DEBUG]      → Destino: {self.install_dir}")
+                self._say(f"[DEBUG]   4. Manter o arquivo no cache")
+            elif stream:
+                self._say(f"[DEBUG]   2. Baixar de {url}")
+                self._say(f"[DEBUG]      → Extrair em fluxo, sem arquivo temporário")
+                self._say(f"[DEBUG]      → Conferir sha256 durante o download")
+                self._say(f"[DEBUG]   3. Extrair arquivo tar.gz durante o download")
+                self._say(f"[DEBUG]      → Destino: {self.install_dir}")
+                self._say(f"[DEBUG]   4. Em caso de falha ou sha256 divergente, remover a extração parcial")
+            else:
+                self._say(f"[DEBUG]   2. Baixar de {url}")
+                self._say(f"[DEBUG]      → Salvar em {temp_file}")
+                part_file = Path(f"{temp_file}.part")
+                if part_file.exists():
+                    self._say(f"[DEBUG]      → Download parcial encontrado em {part_file}, seria retomado")
+                self._say(f"[DEBUG]      → Até {self.connections} conexão(ões) paralela(s), "
+                          f"se o servidor aceitar Range")
+                if len(urls) > 1:
+                    self._say(f"[DEBUG]      → Medir os espelhos sem estatísticas recentes e "
+                              f"usar o mais rápido")
+                    self._say(f"[DEBUG]      → Se o espelho falhar, continuar as faixas "
+                              f"no próximo")
+                self._say(f"[DEBUG]      → Conferir sha256 durante o download, antes de extrair")
+                self._say(f"[DEBUG]   3. Extrair arquivo tar.gz")
+                self._say(f"[DEBUG]      → Destino: {self.install_dir}")
+                if cached_file:
+                    self._say(f"[DEBUG]   4. Manter o arquivo no cache "
+                              f"(limite: {_format_size(self.cache_max_size)})")
+                else:
+                    self._say(f"[DEBUG]   4. Remover arquivo temporário")
+            if missing:
+                self._say(f"[DEBUG]      → Registrar arquivos e componentes em "
+                          f"{self.install_dir / STATE_DIRNAME / 'state.db'}")
+            self._say(f"[DEBUG]   5. Mostrar componentes instalados:")
+            if script_name:
+                self._say(
+                    f"[DEBUG]      - Script de build: {self.install_dir / script_name}")
+            else:
+                self._say(f"[DEBUG]      - Script de build")
+            self._say(f"[DEBUG]      - Diretório de instalação: {install_path}")
+            if source_dir_name:
+                self._say(
+                    f"[DEBUG]      - Diretório fonte: {self.install_dir / source_dir_name}")
+            else:
+                self._say(f"[DEBUG]      - Diretório fonte (para resolver links)")
+            self._say("[DEBUG]")
+            self._say("[DEBUG] ===== FIM DA SIMULAÇÃO =====")
+            return bool(missing)
+
+        # Execução real
+        record_key = self._package_record_key(pkg_info)
+        if not missing:
+            self._touch_install(record_key)
+            print(f"Compilação já instalada em: {install_path}")
+            return True
+
+        self.install_dir.mkdir(parents=True, exist_ok=True)
+        with self._package_lock(archive_name):
+            # Outro processo pode ter instalado enquanto esperávamos o lock
+            missing = [role for role in missing if not component_paths[role].exists()]
+            if not missing:
+                self._touch_install(record_key)
+                print(f"Compilação já instalada em: {install_path}")
+                return True
+            hashes = {}
+            if not self._install_staged(pkg_info, missing, stream, hashes):
+                return False
+            self._record_install(pkg_info, [role for role in missing
+                                            if component_paths[role].exists()], hashes)
+
+        print(f"✓ Componentes extraídos:")
+        if script_name:
+            if "script" in missing:
+                print(f"  - Script de build: {self.install_dir / script_name}")
+        else:
+            print(f"  - Script de build")
+        if "install_dir" in missing:
+            print(f"  - Diretório de instalação: {install_path}")
+        if source_dir_name:
+            if "source_dir" in missing:
+                print(
+                    f"  - Diretório fonte: {self.install_dir / source_dir_name}")
+        else:
+            print(f"  - Diretório fonte (para resolver links)")
+        skipped = [role for role in component_paths
+                   if not component_paths[role].exists()]
+        if skipped:
+            print(f"  (não instalados: {', '.join(skipped)}; use --components para "
+                  f"instalá-los depois)")
+
+        if install_path.exists():
+            print(f"\n✓ Instalado com sucesso em: {install_path}")
+        else:
+            print(f"\n✓ Componentes instalados em: {self.install_dir}")
+        return True
+
+    def _read_lockfile(self, lockfile):
+        """
+        Lê um lockfile com uma compilação por linha, no mesmo formato dos
+        argumentos de 'awx install':
+
+            # comentário
+            linux 3.3.1
+            linux 3.3.1 cmake
+            android 3.3.1 arm64-v8a
+
+        Retorna a lista de (plataforma, versão, variante) ou None em caso de erro.
+        """
+        try:
+            with open(lockfile, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError as e:
+            print(f"Erro ao ler {lockfile}: {e}")
+            return None
+
+        entries = []
+        for number, line in enumerate(lines, 1):
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) not in (2, 3) or fields[0] not in PLATFORMS:
+                print(f"{lockfile}:{number}: linha inválida: {line.strip()}")
+                print("  Formato esperado: <plataforma> <versão> [variante]")
+                return None
+            platform, version = fields[0], fields[1]
+            variant = fields[2] if len(fields) == 3 else None
+            entries.append((platform, version, variant))
+        return entries
+
+    def sync(self, lockfile=DEFAULT_LOCKFILE, download_jobs=DEFAULT_DOWNLOAD_JOBS,
+             extract_jobs=DEFAULT_EXTRACT_JOBS):
+        """
+        Instala todas as compilações listadas no lockfile.
+
+        Todas as entradas são resolvidas no manifest antes de qualquer
+        download. Os downloads rodam em um pool de download_jobs threads e,
+        à medida que terminam, as extrações entram em um pool separado de
+        extract_jobs threads, com uma única linha de progresso agregada.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        entries = self._read_lockfile(lockfile)
+        if entries is None:
+            return False
+
+        resolved = {}
+        invalid = False
+        for platform, version, variant in entries:
+            pkg_info = self._find_package(platform, version, variant)
+            if pkg_info is None:
+                invalid = True
+                continue
+            label = " ".join(filter(None, (platform, version, variant)))
+            resolved.setdefault(pkg_info["archive_name"], (label, pkg_info,
+                                                          (platform, version, variant)))
+        if invalid:
+            print(f"Nenhuma instalação realizada: corrija {lockfile}")
+            return False
+        if not resolved:
+            print(f"Nenhuma compilação listada em {lockfile}")
+            return True
+
+        if self.debug:
+            print()
+            print(f"[DEBUG] ===== SIMULAÇÃO DE SINCRONIZAÇÃO ({lockfile}) =====")
+            print(f"[DEBUG] {len(resolved)} compilação(ões) resolvida(s) no manifest")
+            print(f"[DEBUG] Downloads simultâneos: {download_jobs}")
+            print(f"[DEBUG] Extrações simultâneas: {extract_jobs}")
+            results = [self.install(*args) for _, _, args in resolved.values()]
+            return all(results)
+
+        results = {}
+        pending = []
+        for label, pkg_info, _ in resolved.values():
+            install_path = self._get_install_path_from_name(pkg_info["install_dir_name"])
+            # Como no install(): só está instalado com todos os componentes
+            if not self._component_status(pkg_info)[2]:
+                self._touch_install(self._package_record_key(pkg_info))
+                results[label] = (True, f"já instalado em {install_path}")
+            else:
+                pending.append((label, pkg_info))
+
+        progress = _BatchProgress([label for label, _ in pending])
+        extract_futures = []
+
+        def extract(label, archive, pkg_info):
+            import shutil
+
+            progress.set_status(label, "extraindo")
+            try:
+                with self._package_lock(pkg_info["archive_name"]):
+                    paths, _, missing = self._component_status(pkg_info)
+                    if not missing:
+                        # Outro processo instalou enquanto esperávamos o lock
+                        ok = True
+                        if archive != self._cache_blob_path(pkg_info["package"].get("sha256")):
+                            archive.unlink(missing_ok=True)
+                    else:
+                        staging = self._staging_dir(pkg_info["archive_name"])
+                        hashes = {}
+                        member_filter = None
+                        if set(missing) != set(paths):
+                            # Instalação parcial: completa só o que falta
+                            names = {paths[role].name for role in missing}
+
+                            def requested(member):
+                                return member.name.split("/", 1)[0] in names
+
+                            member_filter = requested
+                        try:
+                            ok = self._extract_archive(archive, pkg_info, member_filter,
+                                                       staging, hashes=hashes)
+                            if ok:
+                                self._publish(staging)
+                        finally:
+                            shutil.rmtree(staging, ignore_errors=True)
+                    if ok and missing:
+                        self._record_install(pkg_info, [role for role in missing
+                                                        if paths[role].exists()], hashes)
+            except Exception as e:
+                print(f"\nErro ao extrair {label}: {e}")
+                ok = False
+            install_path = self._get_install_path_from_name(pkg_info["install_dir_name"])
+            results[label] = (ok, f"instalado em {install_path}" if ok else "falha na extração")
+            progress.set_status(label, "ok" if ok else "erro")
+
+        def download(label, pkg_info, extract_pool):
+            progress.set_status(label, "baixando")
+            try:
+                archive = self._fetch_archive(pkg_info, progress.reporter(label))
+            except Exception as e:
+                print(f"\nErro ao baixar {label}: {e}")
+                archive = None
+            if archive is None:
+                results[label] = (False, "falha no download")
+                progress.set_status(label, "erro")
+                return
+            progress.set_status(label, "aguardando extração")
+            extract_futures.append(extract_pool.submit(extract, label, archive, pkg_info))
+
+        if pending:
+            print(f"Sincronizando {len(pending)} compilação(ões) de {lockfile}...")
+            with ThreadPoolExecutor(max_workers=max(1, extract_jobs)) as extract_pool:
+                with ThreadPoolExecutor(max_workers=max(1, download_jobs)) as download_pool:
+                    for label, pkg_info in pending:
+                        download_pool.submit(download, label, pkg_info, extract_pool)
+                # Todos os downloads terminaram: as extrações já foram enfileiradas
+                for future in extract_futures:
+                    future.result()
+            progress.finish()
+
+        print("\nResultado:")
+        for label, _, _ in resolved.values():
+            ok, detail = results[label]
+            print(f"  {'✓' if ok else '✗'} {label}: {detail}")
+        return all(ok for ok, _ in results.values())
+
+    def remove(self, platform, version, variant=None, purge=True):
+        """
+        Remove uma compilação instalada (ou simula, em debug): diretório de
+        instalação, diretório fonte e script. Os nomes vêm do banco de
+        estado, sem consultar o manifest, e, para instalações não
+        registradas, do manifest quando possível. Os componentes vão para a
+        lixeira com rename e são apagados por um 'awx gc' em segundo plano
+        (purge=False deixa para o próximo 'awx gc').
+        """
+        key = _package_key(platform, version, None if platform == "windows" else variant)
+        record = self._installed_record(key)
+        if record:
+            recorded = json.loads(record["components"])
+            archive_name = record["name"]
+            install_dir_name = (recorded.get("install_dir")
+                                or record["name"].removesuffix(".tar.gz"))
+            entry = json.loads(record["entry"]).get("components", {})
+            script_name = recorded.get("script") or entry.get("script")
+            source_dir_name = recorded.get("source_dir") or entry.get("source_dir")
+        elif pkg_info := self._find_package(platform, version, variant):
+            archive_name = pkg_info["archive_name"]
+            install_dir_name = pkg_info["install_dir_name"]
+            script_name = pkg_info["script_name"]
+            source_dir_name = pkg_info["source_dir_name"]
+        else:
+            # Fallback: tentar um padrão simples
+            script_name = None
+            source_dir_name = None
+            install_dir_name = _default_install_dir_name(platform, version, variant)
+            if install_dir_name is None:
+                self._say(f"Plataforma inválida: {platform}")
+                return False
+            archive_name = f"{install_dir_name}.tar.gz"
+
+        install_path = self._get_install_path_from_name(install_dir_name)
+        variante_str = variant if variant else "padrão"
+        targets = {"install_dir": install_path}
+        if source_dir_name:
+            targets["source_dir"] = self.install_dir / source_dir_name
+        if script_name:
+            targets["script"] = self.install_dir / script_name
+
+        def existing_targets():
+            return {role: path for role, path in targets.items()
+                    if path.exists() or path.is_symlink()}
+
+        if self.debug:
+            existing = existing_targets()
+            self._say("")
+            self._say("[DEBUG] ===== SIMULAÇÃO DE REMOÇÃO =====")
+            self._say(f"[DEBUG] Plataforma: {platform}")
+            self._say(f"[DEBUG] Versão: {version}")
+            self._say(f"[DEBUG] Variante: {variante_str}")
+            self._say("[DEBUG]")
+            self._say(f"[DEBUG] Caminho a remover: {install_path}")
+            self._say("[DEBUG]")
+            self._say(f"[DEBUG] Passos que seriam executados:")
+            self._say(f"[DEBUG]   1. Verificar quais componentes existem")
+            for role, path in targets.items():
+                state = "existe, seria removido" if role in existing else "não existe"
+                self._say(f"[DEBUG]      → {role}: {path} ({state})")
+            self._say(f"[DEBUG]   2. Mover os componentes para {self.trash_dir} (rename)")
+            if record:
+                self._say(f"[DEBUG]   3. Apagar o registro em {STATE_DIRNAME}/state.db "
+                          f"({record['files']} arquivo(s))")
+            if purge:
+                self._say(f"[DEBUG]   4. Esvaziar a lixeira em segundo plano ('awx gc')")
+            else:
+                self._say(f"[DEBUG]   4. Deixar a lixeira para o próximo 'awx gc'")
+            self._say("[DEBUG]")
+            self._say("[DEBUG] ===== FIM DA SIMULAÇÃO =====")
+            return bool(record or existing)
+
+        # Execução real
+        with self._phase("remove", install_dir_name) as phase:
+            try:
+                with self._package_lock(archive_name):
+                    existing = existing_targets()
+                    if not record and not existing:
+                        self._say(f"Compilação não encontrada: {install_path.name}")
+                        return False
+                    if existing:
+                        self._move_to_trash(list(existing.values()), install_dir_name)
+                        phase.add(files=len(existing))
+                    if record:
+                        self._forget_install(key)
+            except Exception as e:
+                self._say(f"Erro ao remover: {e}")
+                return False
+
+        for path in existing.values():
+            self._say(f"✓ Removido: {path.name}", AWXEvent("removed", message=str(path)))
+        if not purge:
+            self._say(f"Espaço liberado no próximo 'awx gc' ({self.trash_dir})")
+        elif not self._spawn_purge():
+            self._say(f"Aviso: não foi possível esvaziar a lixeira agora; use 'awx gc'")
+        return True
+
+    # ---------------------------
+    # API assíncrona
+    # ---------------------------
+    async def _load_manifest_async(self):
+        """
+        _load_manifest sem bloquear o event loop: a revalidação usa
+        _http_get_async, com o mesmo cache, os mesmos espelhos e os mesmos
+        recursos (cópia antiga, manifest.json local) de _fetch_manifest.
+        """
+        import asyncio
+
+        if self._manifest is not None:
+            return self._manifest
+
+        with self._phase("manifest", self.base_url):
+            cached = await asyncio.to_thread(self._read_manifest_cache)
+            record = None
+            if cached and time.time() - cached.get("checked_at", 0) < MANIFEST_TTL:
+                record = cached
+            else:
+                error = None
+                for mirror in self.mirrors:
+                    headers = {}
+                    # Validadores só valem no servidor que os gerou
+                    if cached and cached.get("source", self.base_url) == mirror:
+                        if cached.get("etag"):
+                            headers["If-None-Match"] = cached["etag"]
+                        if cached.get("last_modified"):
+                            headers["If-Modified-Since"] = cached["last_modified"]
+                    try:
+                        status, response_headers, reader, writer = await _http_get_async(
+                            f"{mirror}/{MANIFEST_FILENAME}", headers)
+                        try:
+                            if status == 304 and cached:
+                                record = cached
+                                break
+                            if status != 200:
+                                raise AWXError(f"HTTP {status}")
+                            body = b"".join([chunk async for chunk in
+                                             _http_body_async(reader, response_headers)])
+                        finally:
+                            writer.close()
+                        manifest = json.loads(body)
+                        record = {
+                            "etag": response_headers.get("etag"),
+                            "last_modified": response_headers.get("last-modified"),
+                            "source": mirror,
+                            "manifest": manifest,
+                            "index": _build_manifest_index(manifest),
+                        }
+                        break
+                    except (AWXError, OSError, EOFError, ValueError) as e:
+                        error = e
+                if record is None:
+                    record = self._stale_manifest(cached, error)
+                else:
+                    await asyncio.to_thread(self._write_manifest_cache, record)
+
+            if record is None:
+                return await asyncio.to_thread(self._load_local_manifest)
+            self._manifest = record["manifest"]
+            self._manifest_index = record["index"]
+            return self._manifest
+
+    async def list_available_async(self):
+        """
+        Compilações do manifest, em ordem, como dicts com platform,
+        version, variant (None se não houver), name, sha256, size e bytes.
+        """
+        emit = _loop_emitter(None)
+        token = _event_sink.set(emit)
+        try:
+            manifest = await self._load_manifest_async()
+        finally:
+            _event_sink.reset(token)
+        if manifest is None:
+            raise AWXError(emit.last or "manifest indisponível")
+
+        builds = []
+        for key, position in sorted(self._manifest_index.items()):
+            platform, version, variant = key.split("/")
+            package = manifest["packages"][position]
+            builds.append({
+                "platform": platform,
+                "version": version,
+                "variant": variant or None,
+                "name": package["name"],
+                "sha256": package.get("sha256"),
+                "size": package.get("size"),
+                "bytes": package.get("bytes"),
+            })
+        return builds
+
+    async def _fetch_archive_async(self, pkg_info):
+        """
+        _fetch_archive para a API assíncrona: do cache ou baixando com
+        _download_async, sob o mesmo lock por arquivo.
+        """
+        import asyncio
+
+        archive_name = pkg_info["archive_name"]
+        sha256 = pkg_info["package"].get("sha256")
+        cached_file = self._cache_blob_path(sha256)
+        dest = cached_file or self._download_path(archive_name)
+        lock = _FileLock(Path(f"{dest}.lock"),
+                         f"Aguardando outro download de {archive_name}...")
+        await lock.acquire_async()
+        try:
+            if cached_file is not None and cached_file.is_file():
+                await asyncio.to_thread(self._cache_touch, cached_file)
+                return cached_file
+            urls = await asyncio.to_thread(self._mirror_urls, archive_name, True)
+            with self._phase("download", archive_name) as phase:
+                phase.add(bytes=await self._download_async(urls, dest, sha256, archive_name))
+        finally:
+            lock.__exit__(None, None, None)
+        return dest
+
+    async def _probe_async(self, url):
+        """_probe_download com _http_get_async."""
+        status, headers, reader, writer = await _http_get_async(url, {"Range": "bytes=0-0"})
+        writer.close()
+        if status not in (200, 206):
+            raise AWXError(f"HTTP {status}")
+        total = None
+        if status == 206:
+            size = headers.get("content-range", "").rpartition("/")[2]
+            total = int(size) if size.isdigit() else None
+        return {
+            "url": url,
+            "total": total,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+        }
+
+    async def _download_async(self, urls, dest, sha256, name):
+        """
+        _download_file no event loop, com uma conexão por vez: as faixas
+        pendentes são baixadas em ordem, e o sha256 é calculado enquanto
+        os bytes chegam. Usa os mesmos '<dest>.part' e '<dest>.part.json',
+        então um download interrompido aqui continua no CLI e vice-versa.
+        Se um espelho falhar, a faixa continua de onde parou no próximo
+        (só com sha256, que garante o mesmo conteúdo). Gravação e hash
+        rodam em threads. Retorna os bytes recebidos; falhas levantam
+        AWXError.
+        """
+        import asyncio
+        import hashlib
+
+        emit = _event_sink.get()
+        part = Path(f"{dest}.part")
+        state_path = Path(f"{dest}.part.json")
+
+        probe = error = None
+        for url in urls:
+            try:
+                probe = await self._probe_async(url)
+                break
+            except (AWXError, OSError, EOFError) as e:
+                error = e
+                if len(urls) > 1:
+                    self._say(f"Espelho indisponível: {_mirror_of(url)} ({e})")
+                    self._record_mirror(_mirror_of(url), failed=True)
+        if probe is None:
+            await asyncio.to_thread(self._save_mirror_stats)
+            raise AWXError(f"Erro ao baixar {name}: {error}")
+        urls = urls[urls.index(probe["url"]):] if sha256 else [probe["url"]]
+
+        await asyncio.to_thread(dest.parent.mkdir, parents=True, exist_ok=True)
+        total = probe["total"]
+        state = None
+        if total is None:
+            # Sem Range: um único fluxo, sem retomada
+            segments = [[0, None, 0]]
+            await asyncio.to_thread(part.write_bytes, b"")
+        else:
+            state = await asyncio.to_thread(self._load_part_state, state_path, part,
+                                            probe["url"], sha256, probe)
+            if state is None:
+                state = self._new_part_state(probe["url"], sha256, probe)
+                await asyncio.to_thread(self._preallocate, part, total)
+            else:
+                state.update(url=probe["url"], etag=probe["etag"],
+                             last_modified=probe["last_modified"])
+            segments = state["segments"]
+
+        digest = hashlib.sha256() if sha256 else None
+        downloaded = sum(seg[2] for seg in segments)
+        received = 0  # só os bytes desta execução, para --timings
+        last_event = last_save = time.monotonic()
+
+        def write(fd, chunk, offset):
+            os.pwrite(fd, chunk, offset)
+            if digest is not None:
+                digest.update(chunk)
+
+        def hash_range(fd, start, end):
+            while start < end:
+                chunk = os.pread(fd, min(STREAM_CHUNK_SIZE, end - start), start)
+                if not chunk:
+                    raise AWXError(f"{part} menor que o esperado")
+                digest.update(chunk)
+                start += len(chunk)
+
+        async def fetch(fd, url, seg):
+            nonlocal downloaded, received, last_event, last_save, total
+            pos = seg[0] + seg[2]
+            headers = {} if seg[1] is None else {"Range": f"bytes={pos}-{seg[1] - 1}"}
+            status, response_headers, reader, writer = await _http_get_async(url, headers)
+            started, size = time.monotonic(), 0
+            try:
+                if seg[1] is None:
+                    if status != 200:
+                        raise AWXError(f"HTTP {status}")
+                    length = response_headers.get("content-length")
+                    total = int(length) if length and length.isdigit() else None
+                elif (status != 206 or not response_headers.get("content-range", "")
+                        .startswith(f"bytes {pos}-")
+                        or not response_headers["content-range"].endswith(f"/{state['total']}")):
+                    raise AWXError("servidor não atendeu o pedido Range "
+                                   "(o arquivo pode ter mudado)")
+                async for chunk in _http_body_async(reader, response_headers):
+                    await _run_in_thread(write, fd, chunk, pos)
+                    pos += len(chunk)
+                    seg[2] = pos - seg[0]
+                    size += len(chunk)
+                    downloaded += len(chunk)
+                    received += len(chunk)
+                    now = time.monotonic()
+                    if now - last_event >= EVENT_INTERVAL:
+                        emit(AWXEvent("download", name, downloaded, total))
+                        last_event = now
+                    if state is not None and now - last_save >= STATE_SAVE_INTERVAL:
+                        await _run_in_thread(self._save_part_state, state_path, state)
+                        last_save = now
+                if seg[1] is not None and pos < seg[1]:
+                    raise AWXError(f"conexão encerrada no byte {pos} de {state['total']}")
+            finally:
+                writer.close()
+                if len(self.mirrors) > 1 and size >= MIN_SEGMENT_SIZE:
+                    self._record_mirror(_mirror_of(url), size, time.monotonic() - started)
+
+        fd = await asyncio.to_thread(os.open, part, os.O_RDWR)
+        try:
+            for seg in segments:
+                if digest is not None and seg[2]:
+                    await _run_in_thread(hash_range, fd, seg[0], seg[0] + seg[2])
+                while seg[1] is None or seg[0] + seg[2] < seg[1]:
+                    try:
+                        await fetch(fd, urls[0], seg)
+                        break
+                    except (AWXError, OSError, EOFError) as e:
+                        if state is None or len(urls) == 1:
+                            raise AWXError(f"Erro ao baixar {name}: {e}") from e
+                        self._record_mirror(_mirror_of(urls[0]), failed=True)
+                        self._say(f"Espelho {_mirror_of(urls[0])} falhou ({e}); "
+                                  f"continuando de onde parou em outro")
+                        urls = urls[1:]
+        except BaseException:
+            if state is None:
+                # Sem Range não há como retomar: descarta o parcial
+                await asyncio.to_thread(part.unlink, True)
+            raise
+        finally:
+            # Vale também para o cancelamento: o que já foi gravado não se perde
+            os.close(fd)
+            if state is not None:
+                self._save_part_state(state_path, state)
+            await asyncio.to_thread(self._save_mirror_stats)
+        emit(AWXEvent("download", name, downloaded, total or downloaded))
+
+        if digest is not None and digest.hexdigest() != sha256.lower():
+            await asyncio.to_thread(part.unlink)
+            if state is not None:
+                await asyncio.to_thread(state_path.unlink, True)
+            raise AWXError(f"sha256 não confere para {name}: esperado {sha256}, "
+                           f"obtido {digest.hexdigest()}")
+        await asyncio.to_thread(part.replace, dest)
+        if state is not None:
+            await asyncio.to_thread(state_path.unlink, True)
+        return received
+
+    async def _install_staged_async(self, pkg_info, roles, hashes=None):
+        """
+        _install_staged para a API assíncrona: download no event loop,
+        extração e publicação em threads. Se a tarefa for cancelada, a
+        extração para no próximo membro e o staging é apagado. Quem chama
+        deve ter o lock do pacote.
+        """
+        import asyncio
+        import shutil
+
+        emit = _event_sink.get()
+        archive_name = pkg_info["archive_name"]
+        component_paths = self._component_paths(pkg_info)
+        staging = await asyncio.to_thread(self._staging_dir, archive_name)
+        cancel = threading.Event()
+        extracted = 0
+        last_event = time.monotonic()
+
+        def on_member(member):
+            nonlocal extracted, last_event
+            if cancel.is_set():
+                raise AWXError("instalação cancelada")
+            extracted += 1
+            now = time.monotonic()
+            if now - last_event >= EVENT_INTERVAL:
+                emit(AWXEvent("extract", archive_name, extracted))
+                last_event = now
+
+        member_filter = None
+        if set(roles) != set(component_paths):
+            # Componentes avulsos: arquivo completo e só os membros pedidos
+            # (as faixas de bytes de _fetch_components_ranged ficam no CLI)
+            names = {component_paths[role].name for role in roles}
+
+            def requested(member):
+                return member.name.split("/", 1)[0] in names
+
+            member_filter = requested
+
+        try:
+            archive = await self._fetch_archive_async(pkg_info)
+            if not await _run_in_thread(self._extract_archive, archive, pkg_info, member_filter,
+                                        staging, on_member, hashes, cancel=cancel):
+                raise AWXError(emit.last or f"Erro ao extrair {archive_name}")
+            emit(AWXEvent("extract", archive_name, extracted))
+            await _run_in_thread(self._publish, staging)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, staging, True)
+
+    async def install_async(self, platform, version, variant=None, components=None,
+                            on_event=None):
+        """
+        install() para asyncio: rede no event loop, descompressão e sistema
+        de arquivos em threads. Em vez de imprimir, entrega AWXEvent a
+        on_event (na thread do event loop). Retorna o caminho da instalação;
+        falhas levantam AWXError.
+
+        Se a tarefa for cancelada, a extração é interrompida, o staging é
+        apagado e os locks são liberados; nada aparece em install_dir, e o
+        download parcial fica para ser retomado.
+        """
+        import asyncio
+
+        emit = _loop_emitter(on_event)
+        token = _event_sink.set(emit)
+        try:
+            if self.debug:
+                await asyncio.to_thread(self.install, platform, version, variant,
+                                        False, components)
+                return None
+
+            if await self._load_manifest_async() is None:
+                raise AWXError(emit.last or "manifest indisponível")
+            pkg_info = self._find_package(platform, version, variant)
+            if pkg_info is None:
+                raise AWXError(emit.last)
+            archive_name = pkg_info["archive_name"]
+            emit(AWXEvent("resolved", archive_name, message=archive_name))
+
+            component_paths = self._component_paths(pkg_info)
+            install_path = self._get_install_path_from_name(pkg_info["install_dir_name"])
+            record_key = self._package_record_key(pkg_info)
+
+            def missing_roles():
+                return self._component_status(pkg_info, components)[2]
+
+            missing = await asyncio.to_thread(missing_roles)
+            if missing:
+                await asyncio.to_thread(self.install_dir.mkdir, parents=True, exist_ok=True)
+                lock = self._package_lock(archive_name)
+                await lock.acquire_async()
+                try:
+                    # Outro processo pode ter instalado enquanto esperávamos o lock
+                    missing = await asyncio.to_thread(missing_roles)
+                    if missing:
+                        hashes = {}
+                        await self._install_staged_async(pkg_info, missing, hashes)
+                        installed = [role for role in missing if component_paths[role].exists()]
+                        await _run_in_thread(self._record_install, pkg_info, installed, hashes)
+                finally:
+                    lock.__exit__(None, None, None)
+            if not missing:
+                await asyncio.to_thread(self._touch_install, record_key)
+
+            emit(AWXEvent("installed", archive_name, message=str(install_path)))
+            return install_path
+        finally:
+            _event_sink.reset(token)
+
+    async def remove_async(self, platform, version, variant=None, purge=True, on_event=None):
+        """
+        remove() em uma thread, com as mensagens entregues como AWXEvent a
+        on_event. Falhas levantam AWXError.
+        """
+        import asyncio
+
+        emit = _loop_emitter(on_event)
+        token = _event_sink.set(emit)
+        try:
+            if not await asyncio.to_thread(self.remove, platform, version, variant, purge):
+                raise AWXError(emit.last or "compilação não removida")
+        finally:
+            _event_sink.reset(token)
+
+
+def _gzip_member(block, level):
+    """Comprime um bloco como um membro gzip completo e independente."""
+    import zlib
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(block) + compressor.flush()
 
-        # Monta o nome esperado do arquivo conforme convenção do manifest
-        if platform == "linux":
-            if variant is None:
-                expected_name = f"linux-wx-{version}.tar.gz"
-            elif variant == "cmake":
-                expected_name = f"linux-cmake-wx-{version}.tar.gz"
-            else:
-                print(
-                    f"Variante inválida para linux: {variant}. Use 'cmake' ou deixe em branco.")
-                return None
 
-        elif platform == "windows":
-            expected_name = f"windows-wx-{version}.tar.gz"
+class _ParallelGzipWriter:
+    """
+    Arquivo de escrita que comprime em blocos independentes (um membro gzip
+    por bloco, como 'pigz --independent') em um pool de threads. Os membros
+    são gravados em ordem, e o sha256 e o tamanho do .tar.gz são calculados
+    nessa mesma passagem. O resultado é um .tar.gz comum, que qualquer
+    'tar xzf' lê.
 
-        elif platform == "android":
-            if not variant:
-                print("Para android é necessário informar a ABI (ex: arm64-v8a).")
-                return None
-            # era: android-{variant}-wx-{version}.tar.gz
-            expected_name = f"android-{variant}-{version}.tar.gz"
+    members guarda, para cada membro, [posição comprimida, posição
+    descomprimida], que é o formato de 'gzip_members' no manifest.
+    """
 
-        else:
-            print(f"Plataforma inválida: {platform}")
-            return None
+    def __init__(self, out, pool, block_size=PACK_BLOCK_SIZE, level=PACK_LEVEL):
+        import hashlib
 
-        for pkg in packages:
-            name = pkg.get("name")
-            if name == expected_name:
-                components = pkg.get("components", {})
-                install_dir_name = components.get("install_dir")
-                script_name = components.get("script")
-                source_dir_name = components.get("source_dir")
-
-                # Fallback: se não tiver install_dir no manifest, deduzir do nome
-                if not install_dir_name:
-                    install_dir_name = expected_name.replace(".tar.gz", "")
-
-                return {
-                    "package": pkg,
-                    "archive_name": name,
-                    "install_dir_name": install_dir_name,
-                    "script_name": script_name,
-                    "source_dir_name": source_dir_name,
-                }
-
-        print(
-            f"Pacote não encontrado no manifest para: plataforma={platform}, versão={version}, variante={variant}")
-        print(f"Nome esperado: {expected_name}")
-        return None
+        self.out = out
+        self.pool = pool
+        self.block_size = block_size
+        self.level = level
+        self.max_pending = pool._max_workers + 1
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.position = 0    # bytes descomprimidos recebidos
+        self.submitted = 0   # bytes descomprimidos já enviados para compressão
+        self.size = 0        # bytes comprimidos gravados
+        self.sha256 = hashlib.sha256()
+        self.members = []
 
-    # ---------------------------
-    # Listagens
-    # ---------------------------
-    def list_available(self):
-        manifest = self._load_manifest()
-        if manifest is None:
-            # Fallback antigo, caso não haja manifest
-            print("Compilações disponíveis (fallback):")
-            print("\nLinux:")
-            print("  - linux 3.2.4")
-            print("  - linux 3.3.1")
-            print("  - linux-cmake 3.2.4")
-            print("  - linux-cmake 3.3.1")
-            print("\nWindows:")          # ← tem windows aqui
-            print("  - windows 3.2.4")
-            print("  - windows 3.3.1")
-            print("\nAndroid:")
-            print("  - android 3.2.4 arm64-v8a")
-            print("  - android 3.3.1 arm64-v8a")
-            return
+    def tell(self):
+        return self.position
 
-        packages = manifest.get("packages", [])
-        linux = []
-        windows = []
-        android = []
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            self._submit(block)
+        return len(data)
 
-        for pkg in packages:
-            name = pkg.get("name", "")
-            if name.startswith("linux-cmake-wx-"):
-                version = name.removeprefix(
-                    "linux-cmake-wx-").removesuffix(".tar.gz")
-                linux.append(f"linux {version} cmake")
-            elif name.startswith("linux-wx-"):
-                version = name.removeprefix(
-                    "linux-wx-").removesuffix(".tar.gz")
-                linux.append(f"linux {version}")
-            elif name.startswith("windows-wx-"):
-                version = name.removeprefix(
-                    "windows-wx-").removesuffix(".tar.gz")
-                windows.append(f"windows {version}")
-            elif name.startswith("android-"):
-                # Ex: android-arm64-v8a-wx-3.2.4.tar.gz
-                without_prefix = name.removeprefix("android-")
-                try:
-                    abi, rest = without_prefix.split("-wx-", 1)
-                    version = rest.removesuffix(".tar.gz")
-                    android.append(f"android {version} {abi}")
-                except ValueError:
-                    android.append(name)
+    def cut(self):
+        """Encerra o membro atual: o próximo byte escrito começa um membro novo."""
+        if self.buffer:
+            block = bytes(self.buffer)
+            self.buffer.clear()
+            self._submit(block)
 
-        print("Compilações disponíveis:")
-        if linux:
-            print("\nLinux:")
-            for item in sorted(linux):
-                print(f"  - {item}")
-        if windows:
-            print("\nWindows:")
-            for item in sorted(windows):
-                print(f"  - {item}")
-        if android:
-            print("\nAndroid:")
-            for item in sorted(android):
-                print(f"  - {item}")
+    def close(self):
+        self.cut()
+        while self.pending:
+            self._drain_one()
 
-    def list_installed(self):
-        """Lista compilações instaladas localmente"""
-        if self.debug:
-            print(f"[DEBUG] Listaria instalações em: {self.install_dir}")
-            print(f"[DEBUG] Verificaria existência do diretório")
-            if self.install_dir.exists():
-                print(f"[DEBUG]   → Diretório existe")
-                print(f"[DEBUG] Iteraria sobre subdiretórios")
-                for item in sorted(self.install_dir.iterdir()):
-                    if item.is_dir():
-                        print(f"[DEBUG]   → Encontrado: {item.name}")
-            else:
-                print(f"[DEBUG]   → Diretório não existe")
-            return
+    def _submit(self, block):
+        future = self.pool.submit(_gzip_member, block, self.level)
+        self.pending.append((self.submitted, future))
+        self.submitted += len(block)
+        while len(self.pending) > self.max_pending:
+            self._drain_one()
 
-        if not self.install_dir.exists():
-            print("Nenhuma compilação instalada")
-            return
+    def _drain_one(self):
+        offset, future = self.pending.popleft()
+        data = future.result()
+        self.members.append([self.size, offset])
+        self.out.write(data)
+        self.sha256.update(data)
+        self.size += len(data)
 
-        installed = list(self.install_dir.iterdir())
-        if not installed:
-            print("Nenhuma compilação instalada")
-            return
 
-        print("Compilações instaladas:")
-        for item in sorted(installed):
-            if item.is_dir():
-                print(f"  - {item.name}")
+class AWXPacker:
+    """
+    Gera os pacotes .tar.gz, seus índices e o manifest.json consumido pelo
+    AWXInstaller (substitui mk-packages.sh/prepare-wx-packages.sh).
 
-    # ---------------------------
-    # Download real
-    # ---------------------------
-    def _download_file(self, url, dest):
-        """Baixa arquivo com barra de progresso"""
-        def progress(block_num, block_size, total_size):
-            downloaded = block_num * block_size
-            percent = min(downloaded * 100 / total_size,
-                          100) if total_size > 0 else 0
-            bar_length = 40
-            filled = int(bar_length * percent / 100)
-            bar = '=' * filled + '-' * (bar_length - filled)
-            print(f'\r[{bar}] {percent:.1f}%', end='', flush=True)
+    Cada pacote contém os três componentes (script, install_dir,
+    source_dir), nessa ordem e cada um começando em um membro gzip novo.
+    Ao lado de cada arquivo fica '<arquivo>.index.json', com a posição
+    (no tar descomprimido), o tamanho e o sha256 de cada arquivo.
+    """
 
-        try:
-            urlretrieve(url, dest, progress)
-            print()  # Nova linha após o download
-        except URLError as e:
-            print(f"\nErro ao baixar: {e}")
-            return False
-        return True
+    def __init__(self, source_dir=".", output_dir=DEFAULT_PACK_DIR, debug=False,
+                 jobs=DEFAULT_PACK_JOBS, workers=DEFAULT_EXTRACT_WORKERS):
+        self.source_dir = Path(source_dir).expanduser()
+        self.output_dir = Path(output_dir).expanduser()
+        self.debug = debug
+        self.jobs = max(1, jobs)
+        self.workers = max(1, workers)
+        self._print_lock = threading.Lock()
 
-    # ---------------------------
-    # Paths
-    # ---------------------------
-    def _get_install_path_from_name(self, install_dir_name: str) -> Path:
-        return self.install_dir / install_dir_name
+    def _say(self, message):
+        with self._print_lock:
+            print(message, flush=True)
 
-    # ---------------------------
-    # Operações
-    # ---------------------------
-    def install(self, platform, version, variant=None):
-        """Instala uma compilação específica (ou simula, em debug) usando o manifest."""
-        pkg_info = self._find_package(platform, version, variant)
-        if not pkg_info:
-            return False
+    @staticmethod
+    def package_layout(version, os_name):
+        """
+        Nomes do pacote e de seus componentes para (versão, sistema),
+        seguindo a convenção do manifest.
+        """
+        if os_name.startswith("android-"):
+            archive_name = f"{os_name}-{version}.tar.gz"
+        else:
+            archive_name = f"{os_name}-wx-{version}.tar.gz"
+        return {
+            "name": archive_name,
+            "components": {
+                "script": f"build-{os_name}-{version}.sh",
+                "install_dir": f"{os_name}-wx-{version}",
+                "source_dir": f"wxWidgets-{version}-{os_name}",
+            },
+        }
 
-        archive_name = pkg_info["archive_name"]
-        install_dir_name = pkg_info["install_dir_name"]
-        script_name = pkg_info["script_name"]
-        source_dir_name = pkg_info["source_dir_name"]
+    def _iter_component(self, root: Path):
+        """Percorre um componente em ordem estável (diretório antes do conteúdo)."""
+        yield root
+        if root.is_dir() and not root.is_symlink():
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                base = Path(dirpath)
+                for name in sorted(dirnames + filenames):
+                    yield base / name
 
-        install_path = self._get_install_path_from_name(install_dir_name)
-        url = f"{self.base_url}/{archive_name}"
-        temp_file = self.install_dir / archive_name
-        variante_str = variant if variant else "padrão"
+    def _build(self, layout, compress_pool):
+        """Gera um pacote. Retorna a entrada do manifest (com o índice) ou None."""
+        import hashlib
+        import tarfile
 
-        if self.debug:
-            print()
-            print("[DEBUG] ===== SIMULAÇÃO DE INSTALAÇÃO =====")
-            print(f"[DEBUG] Plataforma: {platform}")
-            print(f"[DEBUG] Versão: {version}")
-            print(f"[DEBUG] Variante: {variante_str}")
-            print("[DEBUG]")
-            print(f"[DEBUG] Arquivo: {archive_name}")
-            print(f"[DEBUG] URL de download: {url}")
-            print(f"[DEBUG] Arquivo temporário: {temp_file}")
-            print(f"[DEBUG] Destino final: {install_path}")
-            print("[DEBUG]")
-            print(f"[DEBUG] Passos que seriam executados:")
-            print(f"[DEBUG]   1. Verificar se {install_path} já existe")
-            if install_path.exists():
-                print(
-                    f"[DEBUG]      → Existe, instalação real falharia ou seria sobrescrita")
-            else:
-                print(f"[DEBUG]      → Não existe, prosseguiria")
-            print(f"[DEBUG]   2. Baixar de {url}")
-            print(f"[DEBUG]      → Salvar em {temp_file}")
-            print(f"[DEBUG]   3. Extrair arquivo tar.gz")
-            print(f"[DEBUG]      → Destino: {self.install_dir}")
-            print(f"[DEBUG]   4. Remover arquivo temporário")
-            print(f"[DEBUG]   5. Mostrar componentes instalados:")
-            if script_name:
-                print(
-                    f"[DEBUG]      - Script de build: {self.install_dir / script_name}")
-            else:
-                print(f"[DEBUG]      - Script de build")
-            print(f"[DEBUG]      - Diretório de instalação: {install_path}")
-            if source_dir_name:
-                print(
-                    f"[DEBUG]      - Diretório fonte: {self.install_dir / source_dir_name}")
-            else:
-                print(f"[DEBUG]      - Diretório fonte (para resolver links)")
-            print("[DEBUG]")
-            print("[DEBUG] ===== FIM DA SIMULAÇÃO =====")
-            return not install_path.exists()
+        name = layout["name"]
+        archive = self.output_dir / name
+        index_path = self.output_dir / f"{name}.index.json"
 
-        # Execução real
-        if install_path.exists():
-            print(f"Compilação já instalada em: {install_path}")
-            return True
+        if archive.exists() and index_path.exists():
+            data = index_path.read_bytes()
+            entry = json.loads(data)["package"]
+            entry["index_sha256"] = hashlib.sha256(data).hexdigest()
+            self._say(f"✓ {name} já existe, pulando...")
+            return entry
 
-        print(f"Baixando {archive_name}...")
-        if not self._download_file(url, temp_file):
-            return False
+        missing = [component for component in layout["components"].values()
+                   if not (self.source_dir / component).exists()
+                   and not (self.source_dir / component).is_symlink()]
+        if missing:
+            self._say(f"✗ {missing[0]} não encontrado, pulando {name}")
+            return None
 
-        print(f"Extraindo para {self.install_dir}...")
-        try:
-            with tarfile.open(temp_file, 'r:gz') as tar:
-                # Extração simples, equivalente a: tar xvzf file.tar.gz -C <install_dir>
-                tar.extractall(path=self.install_dir)
+        if self.debug:
+            self._say(f"[DEBUG] Empacotaria {name} a partir de {self.source_dir}:")
+            for role, component in layout["components"].items():
+                self._say(f"[DEBUG]   - {role}: {component}")
+            return None
 
-            temp_file.unlink()
+        self._say(f"Empacotando {name}...")
+        part = Path(f"{archive}.part")
+        files = []
+        ranges = {}
+        try:
+            with part.open("wb") as out:
+                writer = _ParallelGzipWriter(out, compress_pool)
+                with tarfile.open(fileobj=writer, mode="w", format=tarfile.PAX_FORMAT) as tar:
+                    for role, component in layout["components"].items():
+                        writer.cut()
+                        start = tar.offset
+                        for path in self._iter_component(self.source_dir / component):
+                            arcname = path.relative_to(self.source_dir).as_posix()
+                            info = tar.gettarinfo(str(path), arcname)
+                            if info is None:
+                                continue  # sockets e afins
+                            if not info.isreg():
+                                tar.addfile(info)
+                                continue
+                            with path.open("rb") as f:
+                                reader = _HashingReader(f)
+                                tar.addfile(info, reader)
+                            blocks = -(-info.size // tarfile.BLOCKSIZE)
+                            files.append({
+                                "path": arcname,
+                                "offset": tar.offset - blocks * tarfile.BLOCKSIZE,
+                                "size": info.size,
+                                "sha256": reader.digest.hexdigest(),
+                            })
+                        ranges[role] = [start, tar.offset]
+                    writer.cut()
+                writer.close()
+        except BaseException:
+            if part.exists():
+                part.unlink()
+            raise
 
-            print(f"✓ Componentes extraídos:")
-            if script_name:
-                print(f"  - Script de build: {self.install_dir / script_name}")
-            else:
-                print(f"  - Script de build")
-            print(f"  - Diretório de instalação: {install_path}")
-            if source_dir_name:
-                print(
-                    f"  - Diretório fonte: {self.install_dir / source_dir_name}")
-            else:
-                print(f"  - Diretório fonte (para resolver links)")
+        entry = {
+            "name": name,
+            "size": _format_size(writer.size),
+            "bytes": writer.size,
+            "sha256": writer.sha256.hexdigest(),
+            "components": layout["components"],
+            "gzip_members": writer.members,
+            "index": index_path.name,
+        }
+        index = {
+            "package": entry,
+            "component_ranges": ranges,
+            "files": files,
+        }
+        data = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        tmp_index = Path(f"{index_path}.tmp")
+        tmp_index.write_bytes(data)
+        part.replace(archive)
+        tmp_index.replace(index_path)
+        # Só no manifest: o índice não pode conter o próprio hash
+        entry = dict(entry, index_sha256=hashlib.sha256(data).hexdigest())
 
-            print(f"\n✓ Instalado com sucesso em: {install_path}")
-            return True
+        self._say(f"✓ {name} criado ({entry['size']}, {len(files)} arquivos, "
+                  f"{len(writer.members)} membros gzip, sha256 {entry['sha256'][:16]}...)")
+        return entry
 
-        except Exception as e:
-            print(f"Erro ao extrair: {e}")
-            if temp_file.exists():
-                temp_file.unlink()
-            return False
+    def pack(self, specs=DEFAULT_PACK_SPECS):
+        """
+        Empacota cada (versão, sistema) de specs em paralelo e gera o
+        manifest.json em output_dir com os pacotes criados.
+        """
+        import tarfile
+        from concurrent.futures import ThreadPoolExecutor
 
-    def remove(self, platform, version, variant=None):
-        """Remove uma compilação instalada (ou simula, em debug) usando o manifest quando possível."""
-        pkg_info = self._find_package(platform, version, variant)
-        if pkg_info:
-            install_dir_name = pkg_info["install_dir_name"]
-            script_name = pkg_info["script_name"]
-            source_dir_name = pkg_info["source_dir_name"]
+        layouts = [self.package_layout(version, os_name) for version, os_name in specs]
+        if self.debug:
+            print(f"[DEBUG] Diretório de origem: {self.source_dir}")
+            print(f"[DEBUG] Diretório de saída: {self.output_dir}")
+            print(f"[DEBUG] Pacotes simultâneos: {self.jobs}, "
+                  f"threads de compressão: {self.workers}")
         else:
-            # Fallback: tentar um padrão simples
-            script_name = None
-            source_dir_name = None
-            if platform == "linux":
-                if variant == "cmake":
-                    install_dir_name = f"linux-cmake-wx-{version}"
-                else:
-                    install_dir_name = f"linux-wx-{version}"
-            elif platform == "windows":
-                install_dir_name = f"windows-wx-{version}"
-            elif platform == "android":
-                abi = variant or "arm64-v8a"
-                install_dir_name = f"android-{abi}-wx-{version}"
-            else:
-                print(f"Plataforma inválida: {platform}")
-                return False
+            self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        install_path = self._get_install_path_from_name(install_dir_name)
-        variante_str = variant if variant else "padrão"
+        entries = []
+        failed = False
+        with ThreadPoolExecutor(max_workers=self.workers) as compress_pool, \
+                ThreadPoolExecutor(max_workers=self.jobs) as package_pool:
+            futures = [package_pool.submit(self._build, layout, compress_pool)
+                       for layout in layouts]
+            for layout, future in zip(layouts, futures):
+                try:
+                    entry = future.result()
+                except (OSError, tarfile.TarError) as e:
+                    self._say(f"✗ Erro ao criar {layout['name']}: {e}")
+                    failed = True
+                    continue
+                if entry is not None:
+                    entries.append(entry)
 
         if self.debug:
-            print()
-            print("[DEBUG] ===== SIMULAÇÃO DE REMOÇÃO =====")
-            print(f"[DEBUG] Plataforma: {platform}")
-            print(f"[DEBUG] Versão: {version}")
-            print(f"[DEBUG] Variante: {variante_str}")
-            print("[DEBUG]")
-            print(f"[DEBUG] Caminho a remover: {install_path}")
-            print("[DEBUG]")
-            print(f"[DEBUG] Passos que seriam executados:")
-            print(f"[DEBUG]   1. Verificar se {install_path} existe")
-            if install_path.exists():
-                print(f"[DEBUG]      → Existe, seria removido")
-            else:
-                print(f"[DEBUG]      → Não existe, remoção real falharia")
-            print(f"[DEBUG]   2. Remover diretório recursivamente")
-            print(f"[DEBUG]      → shutil.rmtree({install_path})")
+            print(f"[DEBUG] Geraria {self.output_dir / MANIFEST_FILENAME}")
+            return True
+        if not entries:
+            print("ERRO: Nenhum pacote foi criado com sucesso!")
+            return False
 
-            print(f"[DEBUG]   3. Também seria necessário remover:")
-            if source_dir_name:
-                source_dir = self.install_dir / source_dir_name
-                print(f"[DEBUG]      → Diretório fonte: {source_dir}")
-                print(
-                    f"[DEBUG]        ({'existe' if source_dir.exists() else 'não existe'})")
-            if script_name:
-                script = self.install_dir / script_name
-                print(f"[DEBUG]      → Script: {script}")
-                print(
-                    f"[DEBUG]        ({'existe' if script.exists() else 'não existe'})")
-            print("[DEBUG]")
-            print(
-                f"[DEBUG] NOTA: Atualmente apenas {install_path} seria removido")
-            print(
-                f"[DEBUG]       Os outros componentes precisam ser removidos manualmente")
-            print("[DEBUG]")
-            print("[DEBUG] ===== FIM DA SIMULAÇÃO =====")
-            return install_path.exists()
+        manifest = {
+            "version": "1.0",
+            "generated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "packages": entries,
+        }
+        manifest_path = self.output_dir / MANIFEST_FILENAME
+        with manifest_path.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+        print(f"✓ {manifest_path} criado ({len(entries)} pacote(s))")
+        return not failed
 
-        # Execução real
-        if not install_path.exists():
-            print(f"Compilação não encontrada: {install_path.name}")
-            return False
 
-        try:
-            shutil.rmtree(install_path)
-            print(f"✓ Removido: {install_path.name}")
-            return True
-        except Exception as e:
-            print(f"Erro ao remover: {e}")
-            return False
+# Na ordem da ajuda
+COMMANDS = ("list-available", "list-installed", "install", "remove", "gc", "serve",
+            "mirrors", "prefix", "info", "verify", "sync", "pack", "dedup", "cache")
+# Opções globais que consomem o token seguinte como valor
+VALUE_OPTIONS = ("--base-url", "--install-dir", "--connections",
+                 "--cache-dir", "--cache-max-size", "--dedup", "--mirror",
+                 "--trace-json")
+
+
+def _first_positional(args):
+    """Índice do primeiro token que não é opção global nem valor de uma (ou None)."""
+    skip_next = False
+    for i, a in enumerate(args):
+        if skip_next:
+            skip_next = False
+            continue
+        if a.startswith("-"):
+            skip_next = a in VALUE_OPTIONS
+            continue
+        return i
+    return None
 
 
 def _preprocess_argv(raw_args):
@@ -452,29 +4738,51 @@ def _preprocess_argv(raw_args):
         if a in ("-h", "--help", "--version"):
             return args
 
-    platforms = {"linux", "windows", "android"}
-    commands = {"list-available", "list-installed", "install", "remove"}
+    i = _first_positional(args)
+    # Se é uma plataforma, insere "install" antes; se já é um comando
+    # conhecido (ou qualquer outra coisa), deixa para o argparse
+    if i is not None and args[i] in PLATFORMS:
+        return args[:i] + ["install"] + args[i:]
+    return args
 
-    # Acha o primeiro token que não é opção (-algo)
-    for i, a in enumerate(args):
-        if a.startswith("-"):
-            continue
 
-        # Se já é um comando conhecido, não mexe
-        if a in commands:
-            return args
+def _requested_command(args):
+    """
+    Comando pedido em args (já pré-processado), ou None se não houver um
+    comando conhecido ou se a ajuda geral (-h antes do comando) for pedida.
+    """
+    i = _first_positional(args)
+    if i is None or args[i] not in COMMANDS:
+        return None
+    if any(a in ("-h", "--help") for a in args[:i]):
+        return None
+    return args[i]
 
-        # Se é uma plataforma, insere "install" antes
-        if a in platforms:
-            return args[:i] + ["install"] + args[i:]
 
-        # Qualquer outra coisa: deixa o argparse reclamar
-        return args
+class _SkippedParser:
+    """
+    Subparser de um comando que não foi pedido: aceita e descarta as
+    definições de argumentos, que só custariam tempo de inicialização.
+    """
 
-    return args
+    def add_argument(self, *args, **kwargs):
+        pass
+
+    def add_subparsers(self, **kwargs):
+        return self
+
+    def add_parser(self, *args, **kwargs):
+        return self
 
 
 def main():
+    # Caminho rápido: nem o argparse é necessário
+    if sys.argv[1:] == ["--version"]:
+        print(f"awx {VERSION}")
+        return 0
+
+    import argparse
+
     parser = argparse.ArgumentParser(
         description='awx - Another wxWidgets Installer',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -485,7 +4793,26 @@ Exemplos:
   awx install linux 3.2.4                 Instala wxWidgets 3.2.4 para Linux
   awx install linux 3.3.1 cmake           Instala wxWidgets 3.3.1 (CMake) para Linux
   awx install android 3.2.4 arm64-v8a     Instala wxWidgets 3.2.4 (arm64-v8a) para Android
-  awx remove windows 3.2.4                Remove wxWidgets 3.2.4 para Windows
+  awx install linux 3.3.1 --stream        Baixa e extrai ao mesmo tempo (sem .tar.gz temporário)
+  awx install linux 3.3.1 --components install_dir
+                                          Só bibliotecas e headers (sem o código fonte)
+  awx remove windows 3.2.4                Remove wxWidgets 3.2.4 para Windows (os três componentes)
+  awx gc                                  Apaga o que foi removido e ainda está na lixeira
+  awx gc --max-size 20G                   Remove as compilações usadas há mais tempo até caber em 20G
+  awx prefix linux 3.3.1                  Imprime o diretório da compilação (para scripts e CMake)
+  awx --mirror http://espelho/wx mirrors --probe
+                                          Mede os espelhos e mostra a ordem de uso
+  awx serve --port 8899                   Cache na rede local: clientes usam --base-url http://host:8899
+  awx info linux 3.3.1                    Arquivos, tamanho, sha256 e origem de uma instalação
+  awx verify linux 3.3.1 cmake            Confere o sha256 de cada arquivo instalado
+  awx verify --quick --repair             Confere só arquivos com mtime alterado e repara
+  awx sync awx.lock                       Instala em paralelo tudo o que está em awx.lock
+  awx pack --source-dir /srv/wx 3.3.1:linux   Gera pacote, índice e manifest.json
+  awx cache list                          Lista os arquivos no cache local
+  awx cache prune --max-size 5G           Reduz o cache a 5G (menos usados primeiro)
+  awx dedup                               Arquivos iguais entre instalações viram hardlinks
+  awx list-installed --sizes              Mostra tamanho lógico e físico de cada instalação
+  awx --timings install linux 3.3.1       Mostra quanto tempo cada fase levou
 
 Atalhos:
   awx linux 3.2.4                         ≡ awx install linux 3.2.4
@@ -497,29 +4824,77 @@ Atalhos:
                         version=f'awx {VERSION}')
     parser.add_argument(
         '--base-url', help=f'URL base do servidor (padrão: {DEFAULT_BASE_URL})')
+    parser.add_argument(
+        '--mirror', action='append', metavar='URL',
+        help='Espelho com o mesmo conteúdo de --base-url (pode ser repetido); '
+             'o mais rápido é usado, e os outros em caso de falha')
     parser.add_argument(
         '--install-dir', help=f'Diretório de instalação (padrão: {DEFAULT_INSTALL_DIR})')
+    parser.add_argument(
+        '--connections', type=int, default=DEFAULT_CONNECTIONS, metavar='N',
+        help=f'Conexões paralelas por download (padrão: {DEFAULT_CONNECTIONS})')
+    parser.add_argument(
+        '--cache-dir', help=f'Diretório do cache de arquivos (padrão: {DEFAULT_CACHE_DIR})')
+    parser.add_argument(
+        '--cache-max-size', default=DEFAULT_CACHE_MAX_SIZE, type=_size_argument,
+        metavar='TAMANHO',
+        help=f'Limite do cache, ex: 512M, 20G (padrão: {DEFAULT_CACHE_MAX_SIZE})')
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Não usa nem preenche o cache de arquivos')
+    parser.add_argument(
+        '--dedup', choices=DEDUP_MODES, metavar='MODO',
+        help='Instala pelo armazém de deduplicação: hardlink ou reflink '
+             '(padrão: ativo só depois de "awx dedup")')
     parser.add_argument(
         '--debug',
         action='store_true',
         help='Ativa modo de simulação (não faz alterações no sistema)'
     )
+    parser.add_argument(
+        '--timings', action='store_true',
+        help='Ao final, mostra em stderr o tempo, bytes, arquivos, MB/s e pico de '
+             'memória de cada fase (manifest, download, extração, remoção...)')
+    parser.add_argument(
+        '--trace-json', metavar='ARQUIVO',
+        help='Grava as fases em JSON no formato de trace do Chrome '
+             '(chrome://tracing, Perfetto); "-" escreve em stdout')
 
+    # metavar explícito: o uso mostra todos os comandos mesmo quando só o
+    # pedido é montado (abaixo)
     subparsers = parser.add_subparsers(
-        dest='command', help='Comandos disponíveis')
+        dest='command', metavar='{' + ','.join(COMMANDS) + '}',
+        help='Comandos disponíveis')
+
+    # Pré-processa argv para suportar atalhos
+    raw_args = sys.argv[1:]
+    processed_args = _preprocess_argv(raw_args)
+
+    # Só o comando pedido recebe seus argumentos: montar os de todos os
+    # comandos pesa no orçamento de 'awx list-installed'. Sem comando
+    # conhecido (ajuda, erro de digitação), monta tudo.
+    command = _requested_command(processed_args)
+
+    def add_parser(name, **kwargs):
+        if command is not None and name != command:
+            return _SkippedParser()
+        return subparsers.add_parser(name, **kwargs)
 
     # list-available
-    subparsers.add_parser(
+    add_parser(
         'list-available', help='Lista compilações disponíveis no servidor (via manifest)')
 
     # list-installed
-    subparsers.add_parser(
+    list_installed_parser = add_parser(
         'list-installed', help='Lista compilações instaladas')
+    list_installed_parser.add_argument(
+        '--sizes', action='store_true',
+        help='Mostra tamanho lógico e físico (arquivos compartilhados contam uma vez)')
 
     # install
-    install_parser = subparsers.add_parser(
+    install_parser = add_parser(
         'install', help='Instala uma compilação')
-    install_parser.add_argument('platform', choices=['linux', 'windows', 'android'],
+    install_parser.add_argument('platform', choices=PLATFORMS,
                                 help='Plataforma alvo')
     install_parser.add_argument(
         'version', help='Versão do wxWidgets (ex: 3.2.4)')
@@ -528,11 +4903,21 @@ Atalhos:
         nargs='?',
         help='Variante (cmake para linux, arm64-v8a para android)'
     )
+    install_parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Extrai durante o download, sem gravar o .tar.gz em disco'
+    )
+    install_parser.add_argument(
+        '--components', metavar='LISTA',
+        help='Componentes a instalar, separados por vírgula: '
+             'install_dir, source_dir, script (padrão: todos)'
+    )
 
     # remove
-    remove_parser = subparsers.add_parser(
+    remove_parser = add_parser(
         'remove', help='Remove uma compilação instalada')
-    remove_parser.add_argument('platform', choices=['linux', 'windows', 'android'],
+    remove_parser.add_argument('platform', choices=PLATFORMS,
                                help='Plataforma alvo')
     remove_parser.add_argument(
         'version', help='Versão do wxWidgets (ex: 3.2.4)')
@@ -541,10 +4926,142 @@ Atalhos:
         nargs='?',
         help='Variante (cmake para linux, arm64-v8a para android)'
     )
+    remove_parser.add_argument(
+        '--no-purge', action='store_true',
+        help='Só move para a lixeira; o espaço é liberado no próximo "awx gc"')
 
-    # Pré-processa argv para suportar atalhos
-    raw_args = sys.argv[1:]
-    processed_args = _preprocess_argv(raw_args)
+    # gc
+    gc_parser = add_parser(
+        'gc', help='Apaga as compilações removidas que ainda estão na lixeira')
+    gc_parser.add_argument(
+        '--max-size', type=_size_argument, metavar='TAMANHO',
+        help='Remove antes as compilações usadas há mais tempo (com fonte e script) '
+             'até as registradas caberem no limite, ex: 20G')
+    # Usado pelo processo que o 'awx remove' deixa rodando
+    gc_parser.add_argument('--background', action='store_true', help=argparse.SUPPRESS)
+
+    # serve
+    serve_parser = add_parser(
+        'serve', help='Servidor local com cache do manifest e dos pacotes de --base-url')
+    serve_parser.add_argument(
+        '--bind', default='0.0.0.0', metavar='ENDEREÇO',
+        help='Endereço de escuta (padrão: 0.0.0.0)')
+    serve_parser.add_argument(
+        '--port', type=int, default=DEFAULT_SERVE_PORT,
+        help=f'Porta (padrão: {DEFAULT_SERVE_PORT})')
+
+    # mirrors
+    mirrors_parser = add_parser(
+        'mirrors', help='Lista os espelhos com a vazão observada')
+    mirrors_parser.add_argument(
+        '--probe', action='store_true',
+        help='Mede todos os espelhos agora')
+
+    # prefix
+    prefix_parser = add_parser(
+        'prefix', help='Imprime o diretório de uma compilação instalada')
+    prefix_parser.add_argument('platform', choices=PLATFORMS,
+                               help='Plataforma alvo')
+    prefix_parser.add_argument(
+        'version', help='Versão do wxWidgets (ex: 3.2.4)')
+    prefix_parser.add_argument(
+        'variant',
+        nargs='?',
+        help='Variante (cmake para linux, arm64-v8a para android)'
+    )
+    prefix_parser.add_argument(
+        '--wx-config', action='store_true',
+        help='Imprime o caminho do wx-config da compilação')
+
+    # info
+    info_parser = add_parser(
+        'info', help='Mostra arquivos, tamanho e origem de uma compilação instalada')
+    info_parser.add_argument('platform', choices=PLATFORMS,
+                             help='Plataforma alvo')
+    info_parser.add_argument(
+        'version', help='Versão do wxWidgets (ex: 3.2.4)')
+    info_parser.add_argument(
+        'variant',
+        nargs='?',
+        help='Variante (cmake para linux, arm64-v8a para android)'
+    )
+
+    # verify
+    verify_parser = add_parser(
+        'verify', help='Confere a integridade dos arquivos instalados (todas as compilações '
+                       'registradas, ou uma)')
+    verify_parser.add_argument('platform', nargs='?', choices=PLATFORMS,
+                               help='Plataforma alvo (padrão: todas as compilações)')
+    verify_parser.add_argument(
+        'version', nargs='?', help='Versão do wxWidgets (ex: 3.2.4)')
+    verify_parser.add_argument(
+        'variant',
+        nargs='?',
+        help='Variante (cmake para linux, arm64-v8a para android)'
+    )
+    verify_parser.add_argument(
+        '--quick', action='store_true',
+        help='Não relê arquivos com tamanho e mtime iguais aos da instalação')
+    verify_parser.add_argument(
+        '--repair', action='store_true',
+        help='Baixa e substitui só os arquivos danificados')
+    verify_parser.add_argument(
+        '--jobs', type=int, default=DEFAULT_EXTRACT_WORKERS, metavar='N',
+        help=f'Threads de leitura (padrão: {DEFAULT_EXTRACT_WORKERS})')
+
+    # sync
+    sync_parser = add_parser(
+        'sync', help='Instala, em paralelo, todas as compilações de um lockfile')
+    sync_parser.add_argument(
+        'lockfile', nargs='?', default=DEFAULT_LOCKFILE,
+        help=f'Arquivo com uma compilação por linha (padrão: {DEFAULT_LOCKFILE})')
+    sync_parser.add_argument(
+        '--download-jobs', type=int, default=DEFAULT_DOWNLOAD_JOBS, metavar='N',
+        help=f'Downloads simultâneos (padrão: {DEFAULT_DOWNLOAD_JOBS})')
+    sync_parser.add_argument(
+        '--extract-jobs', type=int, default=DEFAULT_EXTRACT_JOBS, metavar='N',
+        help=f'Extrações simultâneas (padrão: {DEFAULT_EXTRACT_JOBS})')
+
+    # pack
+    pack_parser = add_parser(
+        'pack', help='Gera os pacotes .tar.gz, seus índices e o manifest.json (servidor)')
+    pack_parser.add_argument(
+        'specs', nargs='*', metavar='VERSÃO:SISTEMA',
+        help='Pacotes a gerar, ex: 3.3.1:linux 3.3.1:android-arm64-v8a '
+             '(padrão: os mesmos de prepare-wx-packages.sh)')
+    pack_parser.add_argument(
+        '--source-dir', default='.',
+        help='Diretório com os scripts, instalações e fontes (padrão: .)')
+    pack_parser.add_argument(
+        '--output-dir', default=DEFAULT_PACK_DIR,
+        help=f'Diretório de saída (padrão: {DEFAULT_PACK_DIR})')
+    pack_parser.add_argument(
+        '--jobs', type=int, default=DEFAULT_PACK_JOBS, metavar='N',
+        help=f'Pacotes gerados ao mesmo tempo (padrão: {DEFAULT_PACK_JOBS})')
+    pack_parser.add_argument(
+        '--workers', type=int, default=DEFAULT_EXTRACT_WORKERS, metavar='N',
+        help=f'Threads de compressão (padrão: {DEFAULT_EXTRACT_WORKERS})')
+
+    # dedup
+    dedup_parser = add_parser(
+        'dedup', help='Deduplica arquivos iguais entre as instalações existentes')
+    dedup_parser.add_argument(
+        '--mode', choices=DEDUP_MODES,
+        help='hardlink (padrão) ou reflink (btrfs, XFS: cada instalação mantém '
+             'seu próprio inode)')
+
+    # cache
+    cache_parser = add_parser(
+        'cache', help='Gerencia o cache de arquivos baixados')
+    cache_subparsers = cache_parser.add_subparsers(
+        dest='cache_command', help='Operações do cache')
+    cache_subparsers.add_parser(
+        'list', help='Lista os arquivos no cache (mais recentes primeiro)')
+    prune_parser = cache_subparsers.add_parser(
+        'prune', help='Remove os arquivos usados há mais tempo até caber no limite')
+    prune_parser.add_argument(
+        '--max-size', type=_size_argument, metavar='TAMANHO',
+        help='Limite a aplicar agora (padrão: --cache-max-size; 0 esvazia o cache)')
 
     args = parser.parse_args(processed_args)
 
@@ -552,20 +5069,94 @@ Atalhos:
         parser.print_help()
         return 1
 
+    if args.command == 'pack':
+        specs = []
+        for spec in args.specs or []:
+            version, sep, os_name = spec.partition(":")
+            if not sep or not version or not os_name:
+                parser.error(f"pacote inválido: {spec} (use VERSÃO:SISTEMA, ex: 3.3.1:linux)")
+            specs.append((version, os_name))
+        packer = AWXPacker(args.source_dir, args.output_dir, debug=args.debug,
+                           jobs=args.jobs, workers=args.workers)
+        success = packer.pack(specs or DEFAULT_PACK_SPECS)
+        return 0 if success else 1
+
     base_url = args.base_url or DEFAULT_BASE_URL
     install_dir = args.install_dir or DEFAULT_INSTALL_DIR
-    installer = AWXInstaller(base_url, install_dir, debug=args.debug)
+    cache_dir = None if args.no_cache else (args.cache_dir or DEFAULT_CACHE_DIR)
+    timings = _Timings() if args.timings or args.trace_json else None
+    installer = AWXInstaller(base_url, install_dir, debug=args.debug,
+                             connections=args.connections, cache_dir=cache_dir,
+                             cache_max_size=args.cache_max_size, dedup=args.dedup,
+                             mirrors=args.mirror, timings=timings)
+    try:
+        return _run_command(installer, args, parser, cache_parser)
+    finally:
+        if timings is not None:
+            if args.timings:
+                timings.report()
+            if args.trace_json:
+                timings.write_trace(args.trace_json, raw_args)
 
+
+def _run_command(installer, args, parser, cache_parser):
+    """Executa o comando de args (exceto pack) e retorna o código de saída."""
     if args.command == 'list-available':
         installer.list_available()
     elif args.command == 'list-installed':
-        installer.list_installed()
+        installer.list_installed(sizes=args.sizes)
     elif args.command == 'install':
-        success = installer.install(args.platform, args.version, args.variant)
+        components = None
+        if args.components:
+            components = [c.strip() for c in args.components.split(",") if c.strip()]
+            invalid = [c for c in components if c not in COMPONENT_ROLES]
+            if invalid:
+                parser.error(f"componente inválido: {invalid[0]} "
+                             f"(use {', '.join(COMPONENT_ROLES)})")
+        success = installer.install(args.platform, args.version, args.variant,
+                                    stream=args.stream, components=components)
         return 0 if success else 1
     elif args.command == 'remove':
-        success = installer.remove(args.platform, args.version, args.variant)
+        success = installer.remove(args.platform, args.version, args.variant,
+                                   purge=not args.no_purge)
+        return 0 if success else 1
+    elif args.command == 'gc':
+        success = installer.gc(args.max_size, background=args.background)
         return 0 if success else 1
+    elif args.command == 'serve':
+        success = installer.serve(args.bind, args.port)
+        return 0 if success else 1
+    elif args.command == 'mirrors':
+        success = installer.mirrors_report(probe=args.probe)
+        return 0 if success else 1
+    elif args.command == 'prefix':
+        success = installer.prefix(args.platform, args.version, args.variant,
+                                   wx_config=args.wx_config)
+        return 0 if success else 1
+    elif args.command == 'info':
+        success = installer.info(args.platform, args.version, args.variant)
+        return 0 if success else 1
+    elif args.command == 'verify':
+        if args.platform and not args.version:
+            parser.error("informe a versão (ex: awx verify linux 3.3.1)")
+        success = installer.verify(args.platform, args.version, args.variant,
+                                   quick=args.quick, repair=args.repair, jobs=args.jobs)
+        return 0 if success else 1
+    elif args.command == 'sync':
+        success = installer.sync(args.lockfile, args.download_jobs, args.extract_jobs)
+        return 0 if success else 1
+    elif args.command == 'dedup':
+        success = installer.dedup(args.mode)
+        return 0 if success else 1
+    elif args.command == 'cache':
+        if args.cache_command == 'list':
+            installer.cache_list()
+        elif args.cache_command == 'prune':
+            success = installer.cache_prune(args.max_size)
+            return 0 if success else 1
+        else:
+            cache_parser.print_help()
+            return 1
 
     return 0
 
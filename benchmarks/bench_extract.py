@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extração: tarfile.extractall (implementação antiga de
+install()) contra o _ParallelExtractor do awx, com gzip de um único membro
+e com gzip multi-membro (descompressão paralela).
+
+Gera um .tar.gz sintético no formato dos pacotes (script, diretório de
+instalação e diretório fonte) e imprime arquivos/s e MB/s de cada modo.
+
+Uso:
+  python3 benchmarks/bench_extract.py --files 20000 --size 200M
+"""
+
+import argparse
+import io
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import awx  # noqa: E402
+
+MEMBER_SIZE = 16 * 1024 * 1024
+
+
+def build_tar(files, total_size, seed=0):
+    """Monta, em memória, um tar com a estrutura de um pacote do awx."""
+    rng = random.Random(seed)
+    buf = io.BytesIO()
+    mean = max(1, total_size // max(1, files))
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        script = b"#!/bin/sh\necho build\n"
+        info = tarfile.TarInfo("build-linux-9.9.9.sh")
+        info.size, info.mode = len(script), 0o755
+        tar.addfile(info, io.BytesIO(script))
+        for i in range(files):
+            component = "linux-wx-9.9.9" if i % 5 == 0 else "wxWidgets-9.9.9-linux"
+            name = f"{component}/d{i % 97}/f{i}.h"
+            size = min(rng.randint(1, 2 * mean), 4 * mean)
+            # Metade texto repetitivo (comprime bem), metade aleatório
+            if i % 2:
+                data = rng.randbytes(size)
+            else:
+                data = (b"#define WX_%d 1\n" % i) * (size // 16 + 1)
+                data = data[:size]
+            info = tarfile.TarInfo(name)
+            info.size, info.mode, info.mtime = len(data), 0o644, 1700000000
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def gzip_single(raw):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def gzip_multi(raw):
+    """gzip multi-membro: um membro independente a cada MEMBER_SIZE bytes."""
+    out = bytearray()
+    offsets = []
+    for start in range(0, len(raw), MEMBER_SIZE):
+        offsets.append(len(out))
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        out += compressor.compress(raw[start:start + MEMBER_SIZE]) + compressor.flush()
+    return bytes(out), offsets
+
+
+def run(label, func, dest, files, raw_size):
+    if dest.exists():
+        shutil.rmtree(dest)
+    dest.mkdir()
+    start = time.perf_counter()
+    func(dest)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {elapsed:7.2f}s  {files / elapsed:9.0f} arquivos/s  "
+          f"{raw_size / elapsed / 1e6:7.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extração do awx")
+    parser.add_argument("--files", type=int, default=20000, help="Número de arquivos")
+    parser.add_argument("--size", default="200M", help="Tamanho total descomprimido")
+    parser.add_argument("--workers", type=int, default=awx.DEFAULT_EXTRACT_WORKERS,
+                        help="Threads de escrita/descompressão")
+    parser.add_argument("--dir", help="Diretório de trabalho (padrão: temporário)")
+    args = parser.parse_args()
+
+    workdir = Path(args.dir or tempfile.mkdtemp(prefix="awx-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        raw = build_tar(args.files, awx._parse_size(args.size))
+        single = workdir / "single.tar.gz"
+        single.write_bytes(gzip_single(raw))
+        multi_data, offsets = gzip_multi(raw)
+        multi = workdir / "multi.tar.gz"
+        multi.write_bytes(multi_data)
+        del multi_data
+
+        print(f"Arquivo: {args.files} arquivos, {awx._format_size(len(raw))} descomprimidos, "
+              f"{awx._format_size(single.stat().st_size)} comprimidos "
+              f"({len(offsets)} membros no multi-membro), {args.workers} threads")
+
+        def baseline(dest):
+            with tarfile.open(single, "r:gz") as tar:
+                tar.extractall(path=dest)
+
+        def parallel(dest):
+            with single.open("rb") as f:
+                awx._ParallelExtractor(dest, args.workers).extract(f)
+
+        def parallel_multi(dest):
+            reader = awx._ParallelGzipReader(multi, offsets, args.workers)
+            try:
+                awx._ParallelExtractor(dest, args.workers).extract(reader, compressed=False)
+            finally:
+                reader.close()
+
+        dest = workdir / "out"
+        run("tarfile.extractall", baseline, dest, args.files, len(raw))
+        run("_ParallelExtractor", parallel, dest, args.files, len(raw))
+        run("_ParallelExtractor + multi-membro", parallel_multi, dest, args.files, len(raw))
+    finally:
+        if not args.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ponta a ponta: 'awx install' e 'awx remove' contra um servidor
+HTTP local, com pacotes sintéticos no formato dos pacotes reais.
+
+Gera uma compilação falsa com os três componentes do manifest (script,
+diretório de instalação com headers, bibliotecas e symlinks, e diretório
+fonte), empacota com o AWXPacker (gzip multi-membro e índice, como o
+'awx pack') e a serve em 127.0.0.1, opcionalmente limitando a banda
+(compartilhada entre as conexões, como um link) e somando latência a cada
+requisição. Cada rodada roda o awx em um processo separado, com
+--trace-json e install-dir e cache-dir novos, e mede:
+
+  - tempo total do install, MB/s do download e arquivos/s da extração
+    (fases do trace; com --stream, da fase 'stream');
+  - pico de RSS do processo do awx;
+  - pico de uso de disco durante o install (statvfs do sistema de
+    arquivos do diretório de trabalho, amostrado) e o espaço que fica;
+  - tempo do 'awx remove --no-purge' e do 'awx gc' que esvazia a lixeira.
+
+O resultado (rodadas e medianas) sai em JSON com --json, para comparar
+commits; --compare mostra a variação das medianas contra um JSON anterior.
+
+Uso:
+  python3 benchmarks/bench_install.py --files 20000 --size 300M --runs 3
+  python3 benchmarks/bench_install.py --bandwidth 20M --latency-ms 40 --json atual.json
+  python3 benchmarks/bench_install.py --stream --compare anterior.json
+"""
+
+import argparse
+import contextlib
+import http.server
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import awx  # noqa: E402
+
+VERSION = "9.9.9"
+OS_NAMES = sorted({os_name for _, os_name in awx.DEFAULT_PACK_SPECS})
+SAMPLE_INTERVAL = 0.05  # segundos entre amostras de uso de disco
+CHUNK_SIZE = 64 * 1024
+
+# Métrica -> True se maior é melhor (para --compare)
+METRICS = {
+    "install_s": False,
+    "download_mb_s": True,
+    "extract_files_s": True,
+    "peak_rss": False,
+    "disk_peak": False,
+    "disk_final": False,
+    "remove_s": False,
+    "purge_s": False,
+}
+SIZE_METRICS = ("peak_rss", "disk_peak", "disk_final")
+
+
+def awx_args(os_name):
+    """(plataforma, versão, variante) do CLI para um sistema de DEFAULT_PACK_SPECS."""
+    name, _, variant = os_name.partition("-")
+    return [name, VERSION] + ([variant] if variant else [])
+
+
+def write_file(path, size, rng, text):
+    """Arquivo com size bytes: texto repetitivo (comprime bem) ou aleatório."""
+    if text:
+        line = b"#define WX_%s 1\n" % path.stem.upper().encode()
+        data = (line * (size // len(line) + 1))[:size]
+    else:
+        data = rng.randbytes(size)
+    path.write_bytes(data)
+
+
+def build_tree(source_dir, os_name, files, total_size, seed=0):
+    """
+    Monta em source_dir a compilação de os_name: o script, o diretório de
+    instalação (20% dos arquivos e 60% dos bytes: headers pequenos e
+    bibliotecas grandes, com os symlinks .so usuais) e o diretório fonte.
+    """
+    rng = random.Random(seed)
+    layout = awx.AWXPacker.package_layout(VERSION, os_name)["components"]
+    script = source_dir / layout["script"]
+    script.write_text("#!/bin/sh\necho build\n")
+    script.chmod(0o755)
+
+    install = source_dir / layout["install_dir"]
+    sources = source_dir / layout["source_dir"]
+    libs = max(1, files // 200)
+    headers = max(1, files // 5 - libs)
+    rest = max(1, files - libs - headers - 1)
+
+    lib_dir = install / "lib"
+    lib_dir.mkdir(parents=True)
+    lib_bytes = int(total_size * 0.55)
+    for i in range(libs):
+        name = f"libwx_base{i}-{VERSION[:3]}.so.0.0.0"
+        write_file(lib_dir / name, max(1, lib_bytes // libs), rng, text=i % 2 == 0)
+        (lib_dir / f"libwx_base{i}-{VERSION[:3]}.so").symlink_to(name)
+    bin_dir = install / "bin"
+    bin_dir.mkdir()
+    write_file(bin_dir / "wx-config", 4096, rng, text=True)
+    (bin_dir / "wx-config").chmod(0o755)
+
+    def spread(root, count, budget, dirs):
+        mean = max(1, budget // count)
+        for i in range(count):
+            directory = root / f"d{i % dirs}"
+            directory.mkdir(parents=True, exist_ok=True)
+            size = rng.randint(1, 2 * mean)
+            write_file(directory / f"f{i}.h", size, rng, text=i % 3 != 0)
+
+    spread(install / "include" / "wx", headers, int(total_size * 0.05), 40)
+    spread(sources / "src", rest, total_size - lib_bytes - int(total_size * 0.05), 200)
+
+
+def prepare(workdir, args):
+    """
+    Gera (ou reaproveita, com --dir e os mesmos parâmetros) o pacote e o
+    manifest em workdir/srv. Retorna a entrada do pacote no manifest.
+    """
+    served = workdir / "srv"
+    params_path = workdir / "params.json"
+    params = {"os": args.os, "files": args.files, "size": args.size, "seed": args.seed}
+    manifest_path = served / awx.MANIFEST_FILENAME
+    if params_path.exists() and manifest_path.exists() \
+            and json.loads(params_path.read_text()) == params:
+        print("Reaproveitando o pacote gerado antes")
+    else:
+        for stale in (served, workdir / "src", params_path):
+            if stale.is_dir():
+                shutil.rmtree(stale)
+            elif stale.exists():
+                stale.unlink()
+        source_dir = workdir / "src"
+        source_dir.mkdir()
+        start = time.perf_counter()
+        build_tree(source_dir, args.os, args.files, awx._parse_size(args.size), args.seed)
+        packer = awx.AWXPacker(source_dir, served, workers=args.workers)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ok = packer.pack([(VERSION, args.os)])
+        if not ok:
+            raise SystemExit("Falha ao gerar o pacote sintético")
+        shutil.rmtree(source_dir)
+        params_path.write_text(json.dumps(params))
+        print(f"Pacote gerado em {time.perf_counter() - start:.1f}s")
+    with manifest_path.open(encoding="utf-8") as f:
+        return json.load(f)["packages"][0]
+
+
+class Link:
+    """Banda compartilhada entre as conexões: cada bloco reserva sua vez no link."""
+
+    def __init__(self, bandwidth):
+        self.bandwidth = bandwidth
+        self._free_at = 0.0
+        self._lock = threading.Lock()
+
+    def send(self, size):
+        if not self.bandwidth:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._free_at = max(self._free_at, now) + size / self.bandwidth
+            wait = self._free_at - now
+        time.sleep(wait)
+
+
+def start_server(directory, bandwidth, latency):
+    """
+    Servidor HTTP com Range, ETag, banda limitada e latência, em uma
+    thread. Retorna (servidor, URL base).
+    """
+    link = Link(bandwidth)
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, directory=str(directory), **kw)
+
+        def log_message(self, *a):
+            pass
+
+        def send_head(self):
+            path = self.translate_path(self.path)
+            if not os.path.isfile(path):
+                self.send_error(404)
+                return None
+            if latency:
+                time.sleep(latency)
+            f = open(path, "rb")
+            st = os.fstat(f.fileno())
+            start, end = 0, st.st_size - 1
+            match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+            if match and (match.group(1) or match.group(2)):
+                if match.group(1):
+                    start = int(match.group(1))
+                    if match.group(2):
+                        end = min(end, int(match.group(2)))
+                else:
+                    start = max(0, st.st_size - int(match.group(2)))
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+            else:
+                self.send_response(200)
+            f.seek(start)
+            self._remaining = end - start + 1
+            self.send_header("Content-Length", str(self._remaining))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", f'"{st.st_size:x}-{st.st_mtime_ns:x}"')
+            self.send_header("Last-Modified", self.date_time_string(int(st.st_mtime)))
+            self.end_headers()
+            return f
+
+        def copyfile(self, source, outputfile):
+            remaining = self._remaining
+            while remaining > 0:
+                chunk = source.read(min(CHUNK_SIZE if bandwidth else 1 << 20, remaining))
+                if not chunk:
+                    break
+                link.send(len(chunk))
+                outputfile.write(chunk)
+                remaining -= len(chunk)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def disk_used(path):
+    st = os.statvfs(path)
+    return (st.f_blocks - st.f_bfree) * st.f_frsize
+
+
+class DiskSampler:
+    """Pico de uso do sistema de arquivos de path, acima do início, em bytes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.base = disk_used(path)
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            self.peak = max(self.peak, disk_used(self.path) - self.base)
+            if self._stop.wait(SAMPLE_INTERVAL):
+                break
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, disk_used(self.path) - self.base)
+        return False
+
+
+def run_awx(argv, trace=None):
+    """Roda o awx em um processo novo. Retorna (segundos, trace ou None)."""
+    command = [sys.executable, str(ROOT / "awx.py")]
+    if trace:
+        command += ["--trace-json", str(trace)]
+    start = time.perf_counter()
+    result = subprocess.run(command + argv, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"awx {' '.join(argv)} falhou ({result.returncode}):\n"
+                         f"{result.stderr}")
+    if not trace:
+        return elapsed, None
+    with open(trace, encoding="utf-8") as f:
+        return elapsed, json.load(f)
+
+
+def phase_rate(trace, names, key):
+    """Soma de key nas fases names dividida pela soma das durações."""
+    events = [e for e in trace["traceEvents"] if e["ph"] == "X" and e["name"] in names]
+    seconds = sum(e["dur"] for e in events) / 1e6
+    total = sum(e["args"].get(key, 0) for e in events)
+    return total / seconds if seconds and total else None
+
+
+def one_run(workdir, base_url, args, number):
+    """Uma rodada: install em diretórios novos, depois remove e gc."""
+    run_dir = workdir / f"run{number}"
+    if run_dir.exists():
+        shutil.rmtree(run_dir)
+    run_dir.mkdir()
+    common = ["--base-url", base_url, "--install-dir", str(run_dir / "install"),
+              "--cache-dir", str(run_dir / "cache"), "--connections", str(args.connections)]
+    if args.no_cache:
+        common.append("--no-cache")
+    target = awx_args(args.os)
+    install = [*common, "install", *target] + (["--stream"] if args.stream else [])
+    try:
+        with DiskSampler(workdir) as disk:
+            install_s, trace = run_awx(install, run_dir / "install.json")
+        disk_final = disk_used(workdir) - disk.base
+        remove_s, _ = run_awx([*common, "remove", *target, "--no-purge"])
+        purge_s, _ = run_awx([*common, "gc"])
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    download = ("stream",) if args.stream else ("download",)
+    extract = ("stream",) if args.stream else ("extract", "components")
+    download_rate = phase_rate(trace, download, "bytes")
+    extract_rate = phase_rate(trace, extract, "files")
+    return {
+        "install_s": round(install_s, 4),
+        "download_mb_s": round(download_rate / 1e6, 3) if download_rate else None,
+        "extract_files_s": round(extract_rate, 1) if extract_rate else None,
+        "peak_rss": trace["otherData"]["peak_rss"],
+        "disk_peak": disk.peak,
+        "disk_final": disk_final,
+        "remove_s": round(remove_s, 4),
+        "purge_s": round(purge_s, 4),
+        "phases": {e["name"]: round(e["dur"] / 1e6, 4)
+                   for e in trace["traceEvents"] if e["ph"] == "X"},
+    }
+
+
+def medians(runs):
+    result = {}
+    for metric in METRICS:
+        values = [r[metric] for r in runs if r[metric] is not None]
+        result[metric] = statistics.median(values) if values else None
+    return result
+
+
+def format_metric(metric, value):
+    if value is None:
+        return "-"
+    if metric in SIZE_METRICS:
+        return awx._format_size(value)
+    if metric.endswith("_s") and metric[:-2] in ("install", "remove", "purge"):
+        return f"{value:.2f}s"
+    return f"{value:,.1f}"
+
+
+def commit_id():
+    """Commit do awx medido (com '+' se houver alterações locais), ou None."""
+    try:
+        head = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "awx.py"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return head + ("+" if dirty else "")
+
+
+def compare(result, path):
+    """Variação das medianas de result contra as de um JSON anterior."""
+    with open(path, encoding="utf-8") as f:
+        previous = json.load(f)
+    if previous.get("params") != result["params"]:
+        print("Aviso: parâmetros diferentes dos da medição anterior")
+    print(f"\nComparação com {path} (commit {previous.get('commit') or '?'}):")
+    for metric, higher_is_better in METRICS.items():
+        old, new = previous["median"].get(metric), result["median"][metric]
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        better = change > 0 if higher_is_better else change < 0
+        mark = "" if abs(change) < 2 else ("  melhor" if better else "  pior")
+        print(f"  {metric:<16} {format_metric(metric, old):>10} -> "
+              f"{format_metric(metric, new):>10}  {change:+6.1f}%{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de install/remove do awx")
+    parser.add_argument("--os", choices=OS_NAMES, default="linux",
+                        help="Formato do pacote (padrão: linux)")
+    parser.add_argument("--files", type=int, default=5000, help="Número de arquivos")
+    parser.add_argument("--size", default="100M", help="Tamanho total descomprimido")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do conteúdo")
+    parser.add_argument("--runs", type=int, default=3, help="Rodadas (padrão: 3)")
+    parser.add_argument("--bandwidth", default="0",
+                        help="Banda do servidor por segundo, ex: 20M (padrão: sem limite)")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Latência somada a cada requisição, em ms")
+    parser.add_argument("--connections", type=int, default=awx.DEFAULT_CONNECTIONS,
+                        help="Conexões por download (--connections do awx)")
+    parser.add_argument("--stream", action="store_true", help="Instala com --stream")
+    parser.add_argument("--no-cache", action="store_true", help="Instala com --no-cache")
+    parser.add_argument("--workers", type=int, default=awx.DEFAULT_EXTRACT_WORKERS,
+                        help="Threads de compressão ao gerar o pacote")
+    parser.add_argument("--dir", help="Diretório de trabalho, reaproveitado entre "
+                                      "execuções (padrão: temporário)")
+    parser.add_argument("--json", metavar="ARQUIVO",
+                        help='Grava o resultado em JSON ("-" para stdout)')
+    parser.add_argument("--compare", metavar="ARQUIVO",
+                        help="JSON de uma medição anterior para comparar as medianas")
+    args = parser.parse_args()
+
+    # Com --json -, stdout fica só para o JSON
+    if args.json == "-":
+        with contextlib.redirect_stdout(sys.stderr):
+            result = bench(args)
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        result = bench(args)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+                f.write("\n")
+            print(f"Resultado gravado em {args.json}")
+    return 0
+
+
+def bench(args):
+    """Gera o pacote, sobe o servidor e faz as rodadas. Retorna o resultado."""
+    workdir = Path(args.dir or tempfile.mkdtemp(prefix="awx-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    server = None
+    try:
+        package = prepare(workdir, args)
+        bandwidth = awx._parse_size(args.bandwidth) if args.bandwidth != "0" else 0
+        server, base_url = start_server(workdir / "srv", bandwidth, args.latency_ms / 1000)
+        print(f"Pacote: {package['name']}, {args.files} arquivos, {args.size} "
+              f"descomprimidos, {awx._format_size(package['bytes'])} comprimidos "
+              f"({len(package['gzip_members'])} membros gzip)")
+        print(f"Servidor: {base_url}, banda "
+              f"{awx._format_size(bandwidth) + '/s' if bandwidth else 'sem limite'}, "
+              f"latência {args.latency_ms:g} ms")
+
+        runs = []
+        for number in range(1, args.runs + 1):
+            run = one_run(workdir, base_url, args, number)
+            runs.append(run)
+            print(f"  rodada {number}: " + "  ".join(
+                f"{metric}={format_metric(metric, run[metric])}" for metric in METRICS))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if not args.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "benchmark": "install",
+        "awx": awx.VERSION,
+        "commit": commit_id(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {
+            "os": args.os, "files": args.files, "size": args.size, "seed": args.seed,
+            "bandwidth": args.bandwidth, "latency_ms": args.latency_ms,
+            "connections": args.connections, "stream": args.stream,
+            "no_cache": args.no_cache,
+        },
+        "package": {"name": package["name"], "bytes": package["bytes"]},
+        "runs": runs,
+        "median": medians(runs),
+    }
+    print("Mediana: " + "  ".join(
+        f"{metric}={format_metric(metric, value)}"
+        for metric, value in result["median"].items()))
+    if args.compare:
+        compare(result, args.compare)
+    return result
+
+
+if __name__ == "__main__":
+    sys.exit(main())
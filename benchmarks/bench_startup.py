@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicialização: mede 'awx --version', 'awx list-installed' e
+'awx list-available' como são chamados por prompts e scripts de build, e
+falha se algum passar do orçamento de tempo. O orçamento vale para o custo
+do awx, isto é, o tempo além do que o interpretador leva para 'pass'.
+
+Cada comando roda como 'python3 -m awx' (bytecode em cache, como na
+instalação recomendada no README) contra um install-dir vazio e um
+manifest já em cache, sem rede. Com -X importtime, confere também que
+nenhum módulo pesado (rede, tar, compressão, hashing) é importado e que
+install-dir não é criado.
+
+Uso:
+  python3 benchmarks/bench_startup.py
+  python3 benchmarks/bench_startup.py --budget-ms 50 --runs 20
+"""
+
+import argparse
+import json
+import os
+import py_compile
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import awx  # noqa: E402
+
+BASE_URL = "http://127.0.0.1:9/bench"  # nunca acessado: o manifest está em cache
+# shutil e zlib ficam de fora: o próprio argparse os importa
+HEAVY_MODULES = ("tarfile", "gzip", "hashlib", "ssl", "http.client", "urllib.request",
+                 "concurrent.futures")
+
+
+def seed_manifest_cache(cache_dir):
+    """Grava no cache um manifest recém-validado, como após um 'awx list-available'."""
+    with (ROOT / awx.MANIFEST_FILENAME).open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    installer = awx.AWXInstaller(BASE_URL, cache_dir=cache_dir)
+    path = installer._manifest_cache_path()
+    path.parent.mkdir(parents=True)
+    record = {
+        "etag": None,
+        "last_modified": None,
+        "manifest": manifest,
+        "index": awx._build_manifest_index(manifest),
+        # Válido durante todo o benchmark
+        "checked_at": time.time() + 3600,
+    }
+    path.write_text(json.dumps(record), encoding="utf-8")
+
+
+def run(commands, env, runs):
+    """
+    Tempo de parede, em ms, de 'python3 -m awx argv' para cada argv de
+    commands e de 'python3 -c pass'. As execuções são intercaladas (uma
+    de cada por rodada), para que variações de carga da máquina afetem
+    todos igualmente. Retorna ({rótulo: mediana}, mediana do interpretador,
+    {rótulo: mediana da diferença para o interpretador na mesma rodada}).
+    """
+    def wall(command):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        return (time.perf_counter() - start) * 1000
+
+    baseline = []
+    times = {label: [] for label in commands}
+    extra = {label: [] for label in commands}
+    for _ in range(runs):
+        base = wall([sys.executable, "-c", "pass"])
+        baseline.append(base)
+        for label, argv in commands.items():
+            elapsed = wall([sys.executable, "-m", "awx", *argv])
+            times[label].append(elapsed)
+            extra[label].append(elapsed - base)
+    return ({label: statistics.median(values) for label, values in times.items()},
+            statistics.median(baseline),
+            {label: statistics.median(values) for label, values in extra.items()})
+
+
+def imported_modules(argv, env):
+    """Módulos importados pelo comando, segundo -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "awx", *argv],
+                            cwd=ROOT, env=env, check=True, text=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            if name != "imported package":
+                modules.add(name)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização do awx")
+    parser.add_argument("--budget-ms", type=float, default=50.0,
+                        help="Tempo máximo (mediana) por comando além do interpretador, "
+                             "em ms (padrão: 50)")
+    parser.add_argument("--runs", type=int, default=10, help="Execuções por comando")
+    args = parser.parse_args()
+
+    # O orçamento assume bytecode em cache, como na instalação recomendada
+    py_compile.compile(str(ROOT / "awx.py"), doraise=True)
+
+    workdir = Path(tempfile.mkdtemp(prefix="awx-bench-"))
+    try:
+        return bench(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench(args, workdir):
+    install_dir = workdir / "install"
+    cache_dir = workdir / "cache"
+    seed_manifest_cache(cache_dir)
+    common = ["--base-url", BASE_URL, "--install-dir", str(install_dir),
+              "--cache-dir", str(cache_dir)]
+    commands = {
+        "--version": ["--version"],
+        "list-installed": [*common, "list-installed"],
+        "list-available": [*common, "list-available"],
+    }
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+
+    elapsed, baseline, extra = run(commands, env, args.runs)
+    print(f"Interpretador sozinho: {baseline:6.1f} ms  "
+          f"(orçamento do awx: {args.budget_ms:.0f} ms além disso)")
+
+    failed = False
+    for label, argv in commands.items():
+        heavy = sorted(m for m in imported_modules(argv, env) if m in HEAVY_MODULES)
+        problems = []
+        if extra[label] > args.budget_ms:
+            problems.append("acima do orçamento")
+        if heavy:
+            problems.append(f"importa {', '.join(heavy)}")
+        if install_dir.exists():
+            problems.append(f"criou {install_dir}")
+        failed = failed or bool(problems)
+        status = "ok" if not problems else "FALHOU: " + "; ".join(problems)
+        print(f"  awx {label:<16} {elapsed[label]:6.1f} ms  (+{extra[label]:5.1f} ms)  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Fixtures compartilhadas: um servidor HTTP local (ThreadingHTTPServer, em
+uma thread) que atende pedidos Range, como o servidor de pacotes, e pode
+simular espelhos lentos, que caem no meio da transferência ou que não
+aceitam Range.
+"""
+
+import hashlib
+import http.server
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import awx  # noqa: E402
+
+WRITE_SIZE = 4093  # bytes por escrita: blocos ímpares, fora do alinhamento
+
+
+class PackageServer(http.server.ThreadingHTTPServer):
+    """
+    Serve files ({nome: bytes}) em http://127.0.0.1:<porta>/<nome>.
+
+    Atributos que os testes podem mudar com o servidor no ar:
+      ranges   -- False para ignorar Range e responder 200 com tudo
+      cut      -- encerra a conexão depois de enviar tantos bytes por pedido
+      stall    -- com cut, deixa a conexão aberta e muda em vez de encerrá-la
+      fail     -- responde 503 a tudo
+      delay    -- segundos de espera entre escritas (espelho lento)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.files = files
+        self.ranges = True
+        self.cut = None
+        self.stall = False
+        self.released = threading.Event()
+        self.fail = False
+        self.delay = 0.0
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("Range")))
+        data = server.files.get(self.path.lstrip("/"))
+        if server.fail or data is None:
+            self.send_error(503 if server.fail else 404)
+            return
+        etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+        start, end = 0, len(data)
+        spec = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if server.ranges and spec and (if_range is None or if_range == etag):
+            first, _, last = spec.removeprefix("bytes=").partition("-")
+            start, end = int(first), min(int(last) + 1 if last else len(data), len(data))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        limit = end if server.cut is None else min(end, start + server.cut)
+        try:
+            for pos in range(start, limit, WRITE_SIZE):
+                self.wfile.write(data[pos:min(pos + WRITE_SIZE, limit)])
+                self.wfile.flush()
+                if server.delay:
+                    time.sleep(server.delay)
+            if server.stall and limit < end:
+                server.released.wait()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+
+@pytest.fixture
+def serve():
+    """serve(files) -> PackageServer no ar, desligado ao fim do teste."""
+    servers = []
+
+    def start(files):
+        server = PackageServer(files)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.released.set()
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def payload():
+    """Conteúdo pseudoaleatório de alguns MB e o seu sha256."""
+    data = os.urandom(3 * 1024 * 1024 + 12345)
+    return data, hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def installer(tmp_path, monkeypatch):
+    """AWXInstaller em diretórios temporários, sem cache e com segmentos pequenos."""
+    monkeypatch.setattr(awx, "MIN_SEGMENT_SIZE", 256 * 1024)
+    return awx.AWXInstaller(install_dir=tmp_path / "inst", cache_dir=None, connections=4)
@@ -0,0 +1,118 @@
+"""
+Downloads contra servidores HTTP locais: faixas em paralelo, retomada a
+partir do '.part.json' e sha256 calculado durante o download.
+"""
+
+import json
+import time
+from pathlib import Path
+
+import awx
+
+
+def quiet(done, total):
+    pass
+
+
+def test_resume_segmented_download(serve, payload, installer, tmp_path):
+    data, sha256 = payload
+    server = serve({"pkg.tar.gz": data})
+    dest = tmp_path / "pkg.tar.gz"
+    url = f"{server.url}/pkg.tar.gz"
+
+    # Cada conexão cai depois de um número ímpar de bytes: as faixas param
+    # em posições desalinhadas, no meio dos blocos do arquivo
+    server.cut = 300007
+    assert not installer._download_file(url, dest, sha256, quiet)
+    state = json.loads(Path(f"{dest}.part.json").read_text())
+    assert len(state["segments"]) == 4
+    assert 0 < sum(done for _, _, done in state["segments"]) < len(data)
+
+    server.cut = None
+    assert installer._download_file(url, dest, sha256, quiet)
+    assert dest.read_bytes() == data
+    assert not Path(f"{dest}.part").exists()
+    assert not Path(f"{dest}.part.json").exists()
+    # A retomada só pede o que faltava de cada faixa
+    resumed = [spec for _, spec in server.requests[-4:]]
+    assert sorted(int(spec[6:].split("-")[0]) for spec in resumed) == sorted(
+        start + done for start, end, done in state["segments"])
+
+
+def test_resume_in_small_steps(serve, payload, installer, tmp_path):
+    data, sha256 = payload
+    server = serve({"pkg.tar.gz": data})
+    dest = tmp_path / "pkg.tar.gz"
+    url = f"{server.url}/pkg.tar.gz"
+
+    # Várias interrupções seguidas: o hash é refeito sobre o prefixo já
+    # gravado a cada retomada e precisa bater no fim
+    server.cut = 97003
+    for _ in range(20):
+        if installer._download_file(url, dest, sha256, quiet):
+            break
+    else:
+        raise AssertionError("download não terminou")
+    assert dest.read_bytes() == data
+
+
+def test_stalled_mirror_times_out_and_fails_over(serve, payload, installer, tmp_path,
+                                                 monkeypatch):
+    monkeypatch.setattr(awx, "HTTP_TIMEOUT", 0.5)
+    data, sha256 = payload
+    stalled = serve({"pkg.tar.gz": data})
+    good = serve({"pkg.tar.gz": data})
+    dest = tmp_path / "pkg.tar.gz"
+
+    # O primeiro espelho manda um pedaço de cada faixa e para de responder
+    stalled.cut = 200003
+    stalled.stall = True
+    urls = [f"{stalled.url}/pkg.tar.gz", f"{good.url}/pkg.tar.gz"]
+    start = time.monotonic()
+    assert installer._download_file(urls, dest, sha256, quiet)
+    assert time.monotonic() - start < 10
+    assert dest.read_bytes() == data
+    assert good.requests
+
+
+def test_parallel_ranges(serve, payload, installer, tmp_path):
+    data, sha256 = payload
+    server = serve({"pkg.tar.gz": data})
+    dest = tmp_path / "pkg.tar.gz"
+
+    assert installer._download_file(f"{server.url}/pkg.tar.gz", dest, sha256, quiet)
+    assert dest.read_bytes() == data
+    # Uma sondagem de 1 byte e uma faixa por conexão
+    specs = [spec for _, spec in server.requests]
+    assert specs[0] == "bytes=0-0"
+    assert len(specs) == 1 + installer.connections
+
+
+def test_without_range_falls_back_to_single_stream(serve, payload, installer, tmp_path):
+    data, sha256 = payload
+    server = serve({"pkg.tar.gz": data})
+    server.ranges = False
+    dest = tmp_path / "pkg.tar.gz"
+
+    assert installer._download_file(f"{server.url}/pkg.tar.gz", dest, sha256, quiet)
+    assert dest.read_bytes() == data
+    assert len(server.requests) == 2
+    assert not Path(f"{dest}.part.json").exists()
+
+
+def test_resume_restarts_when_file_changed(serve, payload, installer, tmp_path):
+    data, _ = payload
+    server = serve({"pkg.tar.gz": data})
+    dest = tmp_path / "pkg.tar.gz"
+    url = f"{server.url}/pkg.tar.gz"
+
+    server.cut = 300007
+    assert not installer._download_file(url, dest, None, quiet)
+    assert Path(f"{dest}.part.json").exists()
+
+    # Mesmo tamanho, outro ETag: nada do que foi baixado pode ser reaproveitado
+    changed = bytes(reversed(data))
+    server.files["pkg.tar.gz"] = changed
+    server.cut = None
+    assert installer._download_file(url, dest, None, quiet)
+    assert dest.read_bytes() == changed
@@ -0,0 +1,51 @@
+"""
+Manifest remoto: servidor que aceita a conexão e nunca responde não pode
+travar o awx; vale a cópia em cache ou o manifest.json embutido.
+"""
+
+import json
+import socket
+import time
+
+import pytest
+
+import awx
+
+
+@pytest.fixture
+def silent_url():
+    # Escuta sem nunca aceitar: a conexão fecha pelo backlog e nada chega
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(8)
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    sock.close()
+
+
+def test_manifest_timeout_falls_back_to_embedded(silent_url, tmp_path, monkeypatch):
+    monkeypatch.setattr(awx, "MANIFEST_TIMEOUT", 0.5)
+    installer = awx.AWXInstaller(silent_url, install_dir=tmp_path / "inst",
+                                 cache_dir=tmp_path / "cache")
+    start = time.monotonic()
+    manifest = installer._load_manifest()
+    assert time.monotonic() - start < 5
+    embedded = json.loads(installer._manifest_path().read_text(encoding="utf-8"))
+    assert manifest == embedded
+
+
+def test_manifest_timeout_uses_stale_cache(silent_url, tmp_path, monkeypatch):
+    monkeypatch.setattr(awx, "MANIFEST_TIMEOUT", 0.5)
+    installer = awx.AWXInstaller(silent_url, install_dir=tmp_path / "inst",
+                                 cache_dir=tmp_path / "cache")
+    manifest = {"packages": []}
+    installer._write_manifest_cache({"manifest": manifest, "etag": '"v1"', "last_modified": None,
+                                     "source": silent_url,
+                                     "index": awx._build_manifest_index(manifest)})
+    cache_path = installer._manifest_cache_path()
+    record = json.loads(cache_path.read_text(encoding="utf-8"))
+    record["checked_at"] -= 2 * awx.MANIFEST_TTL
+    cache_path.write_text(json.dumps(record), encoding="utf-8")
+
+    start = time.monotonic()
+    assert installer._load_manifest() == manifest
+    assert time.monotonic() - start < 5
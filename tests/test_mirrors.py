@@ -0,0 +1,78 @@
+"""
+Espelhos: ordem pela vazão medida, espelho fora do ar e troca de espelho
+no meio da transferência, continuando cada faixa de onde parou.
+"""
+
+import awx
+
+
+def quiet(done, total):
+    pass
+
+
+def test_failover_mid_transfer_resumes_ranges(serve, payload, installer, tmp_path):
+    data, sha256 = payload
+    first = serve({"pkg.tar.gz": data})
+    second = serve({"pkg.tar.gz": data})
+    dest = tmp_path / "pkg.tar.gz"
+
+    first.cut = 200003
+    urls = [f"{first.url}/pkg.tar.gz", f"{second.url}/pkg.tar.gz"]
+    assert installer._download_file(urls, dest, sha256, quiet)
+    assert dest.read_bytes() == data
+    # O segundo espelho só recebe o que faltava: nenhuma faixa recomeça do início
+    probe = {"total": len(data), "etag": None, "last_modified": None}
+    state = installer._new_part_state(urls[0], sha256, probe)
+    starts = {start for start, _, _ in state["segments"]}
+    ranges = [spec for _, spec in second.requests if spec != "bytes=0-0"]
+    assert ranges
+    assert all(int(spec[6:].split("-")[0]) not in starts for spec in ranges)
+
+
+def test_unavailable_mirror_is_skipped(serve, payload, installer, tmp_path):
+    data, sha256 = payload
+    down = serve({"pkg.tar.gz": data})
+    down.fail = True
+    up = serve({"pkg.tar.gz": data})
+    dest = tmp_path / "pkg.tar.gz"
+
+    urls = [f"{down.url}/pkg.tar.gz", f"{up.url}/pkg.tar.gz"]
+    assert installer._download_file(urls, dest, sha256, quiet)
+    assert dest.read_bytes() == data
+    assert len(down.requests) == 1
+
+
+def test_all_mirrors_failing_keeps_partial(serve, payload, installer, tmp_path):
+    data, sha256 = payload
+    first = serve({"pkg.tar.gz": data})
+    second = serve({"pkg.tar.gz": data})
+    first.cut = second.cut = 100003
+    dest = tmp_path / "pkg.tar.gz"
+
+    urls = [f"{first.url}/pkg.tar.gz", f"{second.url}/pkg.tar.gz"]
+    assert not installer._download_file(urls, dest, sha256, quiet)
+    assert (tmp_path / "pkg.tar.gz.part.json").exists()
+
+    first.cut = second.cut = None
+    assert installer._download_file(urls, dest, sha256, quiet)
+    assert dest.read_bytes() == data
+
+
+def test_throttled_mirror_ranks_last(serve, payload, tmp_path):
+    data, _ = payload
+    slow = serve({"pkg.tar.gz": data})
+    slow.delay = 0.01
+    fast = serve({"pkg.tar.gz": data})
+    installer = awx.AWXInstaller(slow.url, install_dir=tmp_path / "inst",
+                                 cache_dir=tmp_path / "cache", mirrors=[fast.url])
+
+    urls = installer._mirror_urls("pkg.tar.gz", probe=True)
+    assert urls == [f"{fast.url}/pkg.tar.gz", f"{slow.url}/pkg.tar.gz"]
+    installer._save_mirror_stats()
+
+    # As medições ficam no cache: a próxima execução não mede de novo
+    again = awx.AWXInstaller(slow.url, install_dir=tmp_path / "inst",
+                             cache_dir=tmp_path / "cache", mirrors=[fast.url])
+    requests = len(slow.requests) + len(fast.requests)
+    assert again._mirror_urls("pkg.tar.gz", probe=True) == urls
+    assert len(slow.requests) + len(fast.requests) == requests
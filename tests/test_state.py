@@ -0,0 +1,52 @@
+"""
+Banco de estado (<install-dir>/.awx/state.db) depois de instalações de
+verdade, com um pacote gerado pelo AWXPacker e servido localmente.
+"""
+
+import contextlib
+import io
+import json
+import time
+
+import pytest
+
+import awx
+
+VERSION = "9.9.9"
+
+
+@pytest.fixture
+def package_server(serve, tmp_path):
+    """Servidor com o pacote linux de VERSION (três componentes) e o manifest."""
+    source = tmp_path / "src"
+    layout = awx.AWXPacker.package_layout(VERSION, "linux")["components"]
+    (source / layout["install_dir"] / "include" / "wx").mkdir(parents=True)
+    (source / layout["install_dir"] / "include" / "wx" / "wx.h").write_text("#pragma once\n")
+    (source / layout["source_dir"] / "src").mkdir(parents=True)
+    (source / layout["source_dir"] / "src" / "app.cpp").write_text("int main() {}\n")
+    (source / layout["script"]).write_text("#!/bin/sh\necho build\n")
+
+    served = tmp_path / "srv"
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert awx.AWXPacker(source, served).pack([(VERSION, "linux")])
+    return serve({path.name: path.read_bytes() for path in served.iterdir()})
+
+
+def test_adding_components_keeps_installed_at(package_server, tmp_path, monkeypatch):
+    installer = awx.AWXInstaller(package_server.url, install_dir=tmp_path / "inst",
+                                 cache_dir=tmp_path / "cache")
+    key = awx._package_key("linux", VERSION, None)
+
+    assert installer.install("linux", VERSION, components=["install_dir"])
+    first = installer._installed_record(key)
+    assert set(json.loads(first["components"])) == {"install_dir"}
+
+    # O relógio anda: a segunda instalação acontece bem depois da primeira
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3600)
+    assert installer.install("linux", VERSION)
+    second = installer._installed_record(key)
+    assert set(json.loads(second["components"])) == set(awx.COMPONENT_ROLES)
+    assert second["installed_at"] == first["installed_at"]
+    assert second["last_used"] > first["last_used"]
+    assert second["files"] > first["files"]